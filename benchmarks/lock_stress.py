@@ -0,0 +1,115 @@
+"""Нагрузочный тест блокировок: читатели и писатель в разных процессах.
+
+Каждый читатель в цикле заново открывает TableStore и читает таблицу
+целиком (под разделяемой блокировкой), писатель тем временем вставляет
+записи (под монопольной) с паузой --write-interval. Для 1, 2, 4 и 8
+читателей печатается суммарное число чтений в секунду: читатели не ждут
+друг друга, поэтому оно должно расти с их числом (пока хватает ядер),
+а писатель продолжает работать.
+
+Запуск из корня репозитория:
+
+    PYTHONPATH=src python benchmarks/lock_stress.py [--rows N] [--seconds S]
+        [--readers 1 2 4 8] [--write-interval 0.02]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from primitive_db.core import create_table, insert_row, insert_rows
+from primitive_db.store import TableStore
+
+TABLE = "stress"
+
+
+def _setup(rows: int) -> None:
+    store = TableStore()
+    store.metadata = create_table({}, TABLE, ["name:str", "age:int"])
+    store.mark_metadata_dirty()
+    table_data = store.table(TABLE)
+    changes: list[dict] = []
+    batch = ([f"user{i}", str(i % 90)] for i in range(rows))
+    insert_rows(store.metadata, TABLE, batch, table_data, changes=changes)
+    store.record(TABLE, changes)
+    store.flush(sync=False)
+
+
+def _reader(deadline: float, counter) -> None:
+    reads = 0
+    while time.perf_counter() < deadline:
+        store = TableStore()
+        store.refresh_metadata()
+        if len(store.table(TABLE)) == 0:
+            raise RuntimeError("прочитана пустая таблица")
+        reads += 1
+    with counter.get_lock():
+        counter.value += reads
+
+
+def _writer(deadline: float, interval: float, counter) -> None:
+    # insert_row печатает сообщение на каждую запись
+    sys.stdout = open(os.devnull, "w")
+    store = TableStore(durability="off")
+    writes = 0
+    while time.perf_counter() < deadline:
+        store.lock_for_write(TABLE)
+        changes: list[dict] = []
+        table_data = store.table(TABLE)
+        insert_row(store.metadata, TABLE, ["writer", "1"], table_data, changes)
+        store.record(TABLE, changes)
+        store.mark_metadata_dirty()
+        store.flush()
+        writes += 1
+        time.sleep(interval)
+    with counter.get_lock():
+        counter.value += writes
+
+
+def _run(readers: int, seconds: float, interval: float) -> tuple[float, float]:
+    deadline = time.perf_counter() + seconds
+    reads = mp.Value("q", 0)
+    writes = mp.Value("q", 0)
+    procs = [mp.Process(target=_reader, args=(deadline, reads)) for _ in range(readers)]
+    procs.append(mp.Process(target=_writer, args=(deadline, interval, writes)))
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+        if proc.exitcode:
+            raise SystemExit(f"процесс завершился с кодом {proc.exitcode}")
+    return reads.value / seconds, writes.value / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--write-interval", type=float, default=0.02)
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    # fork: дочерние процессы наследуют рабочий каталог с базой
+    mp.set_start_method("fork")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(None):
+            _setup(args.rows)
+        print(f"Строк в таблице: {args.rows}, ядер: {os.cpu_count()}")
+        print("читателей | чтений/с | на читателя | записей/с")
+        for readers in args.readers:
+            reads, writes = _run(readers, args.seconds, args.write_interval)
+            print(
+                f"{readers:9} | {reads:8.0f} | {reads / readers:11.0f} | "
+                f"{writes:9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
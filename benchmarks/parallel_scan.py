@@ -0,0 +1,105 @@
+"""Полный просмотр: обычный против параллельного (parallel.py).
+
+Строится таблица в памяти (Table со строками-слотами) и её колоночный
+снимок, открытый через mmap; для каждого числа процессов замеряется
+select с условием, которое проверяется на каждой строке. Порог
+PARALLEL_THRESHOLD подбирается по размеру, с которого параллельный
+просмотр становится быстрее обычного.
+
+    PYTHONPATH=src python benchmarks/parallel_scan.py [--rows N]
+        [--workers 2 4 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Callable
+
+from primitive_db.columnar import write_columnar
+from primitive_db.lazy import LazyColumnarRows
+from primitive_db.parallel import parallel_matching_rows
+from primitive_db.parser import And, Compare
+from primitive_db.query import compile_where
+from primitive_db.table import Table
+
+COLUMNS = [
+    {"name": "ID", "type": "int"},
+    {"name": "age", "type": "int"},
+    {"name": "city", "type": "str"},
+    {"name": "active", "type": "bool"},
+]
+CITIES = ["Moscow", "Kazan", "Omsk", "Tver", "Sochi"]
+WHERE = And((Compare("age", ">=", 30), Compare("city", "=", "Omsk")))
+
+
+def _rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "ID": i + 1,
+            "age": i * 7 % 90,
+            "city": CITIES[i % len(CITIES)],
+            "active": i % 3 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def _best(func: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    table = Table(rows, [col["name"] for col in COLUMNS])
+    match = compile_where(WHERE)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.pdbc")
+        with open(path, "wb") as f:
+            write_columnar(f, COLUMNS, rows)
+        del rows
+        columnar = LazyColumnarRows(path)
+
+        print(f"Строк: {args.rows}, ядер: {os.cpu_count()}")
+        print("источник  | процессов | время, с | ускорение")
+        for name, source in (("память", table), ("columnar", columnar)):
+            serial, expected = _best(
+                lambda source=source: [row for row in source if match(row)],
+                args.repeat,
+            )
+            print(f"{name:9} | {1:9} | {serial:8.3f} | {1:9.2f}")
+            for workers in args.workers:
+                elapsed, result = _best(
+                    lambda source=source, workers=workers: parallel_matching_rows(
+                        source, WHERE, workers=workers, threshold=0
+                    ),
+                    args.repeat,
+                )
+                if [row.get("ID") for row in result] != [
+                    row.get("ID") for row in expected
+                ]:
+                    raise SystemExit("параллельный результат отличается")
+                print(
+                    f"{name:9} | {workers:9} | {elapsed:8.3f} | "
+                    f"{serial / elapsed:9.2f}"
+                )
+        columnar.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Воспроизводимые замеры CRUD на синтетических таблицах.
+
+Для каждой схемы (narrow — 2 столбца, wide — 10 столбцов int/str/bool)
+и каждого размера генерируется таблица (фиксированный seed) и через
+публичные функции core/utils замеряются: insert (insert_rows), точечный
+select по ID (1000 запросов), полный просмотр select с условием, update
+и delete ~10% строк, save и load снимка в форматах json и columnar.
+
+Каждый замер повторяется --repeat раз; в JSON пишутся все прогоны,
+а сравнение идёт по минимуму (он меньше всего зависит от шума).
+
+    PYTHONPATH=src python benchmarks/run.py --sizes 1000 100000 \\
+        --output results.json --baseline baseline.json
+
+Размеры по умолчанию — 10^3, 10^4 и 10^5 строк; большие (до 10^7)
+задаются через --sizes и требуют соответствующего объёма памяти.
+
+С --baseline печатается сравнение, и если какой-то замер медленнее
+базового больше чем на --threshold (по умолчанию 20%), код выхода 1.
+--save-baseline записывает результаты как новый базовый файл.
+Снимки пишутся без fsync: замеряется сериализация, а не диск.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+from primitive_db.constants import FORMAT_COLUMNAR, FORMAT_JSON
+from primitive_db.core import (
+    create_table,
+    delete_rows,
+    insert_rows,
+    select_rows,
+    update_rows,
+)
+from primitive_db.decorators import TIMING_OFF, set_confirm_policy, set_timing_mode
+from primitive_db.parser import Compare
+from primitive_db.table import Table
+from primitive_db.utils import load_table_data, save_table_data
+
+SHAPES = {
+    "narrow": ["num:int", "name:str"],
+    "wide": [
+        "num:int",
+        "name:str",
+        "a:int",
+        "b:int",
+        "c:int",
+        "city:str",
+        "email:str",
+        "note:str",
+        "active:bool",
+        "admin:bool",
+    ],
+}
+POINT_QUERIES = 1000
+SEED = 20240101
+CITIES = ["Moscow", "Kazan", "Omsk", "Tver", "Sochi", "Perm", "Ufa", "Samara"]
+
+
+def _generate(columns: list[str], rows: int) -> list[dict[str, Any]]:
+    rng = random.Random(SEED)
+    result = []
+    for i in range(rows):
+        row: dict[str, Any] = {}
+        for spec in columns:
+            name, kind = spec.split(":")
+            if name == "num":
+                row[name] = i % 100
+            elif kind == "int":
+                row[name] = rng.randrange(1_000_000)
+            elif kind == "bool":
+                row[name] = rng.random() < 0.5
+            elif name == "city":
+                row[name] = rng.choice(CITIES)
+            else:
+                row[name] = f"{name}-{rng.randrange(10**9):09d}"
+        result.append(row)
+    return result
+
+
+def _time(func: Callable[..., Any], setup: Callable[[], Any] | None = None) -> float:
+    """Время func(); если задан setup, func(setup()) без учёта setup."""
+    args = (setup(),) if setup is not None else ()
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _cases(shape: str, rows: int) -> dict[str, Callable[[], float]]:
+    """Замеры одной таблицы: имя -> функция, возвращающая время прогона."""
+    name = f"{shape}_{rows}"
+    metadata = create_table({}, name, SHAPES[shape])
+    table_meta = metadata[name]
+    fields = [column["name"] for column in table_meta["columns"]]
+    source = _generate(SHAPES[shape], rows)
+
+    def fresh_table() -> Table:
+        table = Table(fields=fields)
+        table_meta["next_id"] = 1
+        insert_rows(metadata, name, source, table)
+        return table
+
+    table = fresh_table()
+    rng = random.Random(SEED)
+    point_ids = [rng.randrange(1, rows + 1) for _ in range(POINT_QUERIES)]
+    # num = i % 100: условие num < 10 выбирает ~10% строк
+    tenth = Compare("num", "<", 10)
+    scan = Compare("num", "=", 42)
+
+    def insert() -> float:
+        target = Table(fields=fields)
+        table_meta["next_id"] = 1
+        return _time(lambda: insert_rows(metadata, name, source, target))
+
+    def point_select() -> float:
+        def run() -> None:
+            for row_id in point_ids:
+                select_rows(table, Compare("ID", "=", row_id))
+
+        return _time(run)
+
+    def full_scan() -> float:
+        return _time(lambda: select_rows(table, scan))
+
+    def update() -> float:
+        return _time(
+            lambda target: update_rows(target, {"name": "updated"}, tenth),
+            fresh_table,
+        )
+
+    def delete() -> float:
+        return _time(lambda target: delete_rows(target, tenth), fresh_table)
+
+    def save(fmt: str) -> Callable[[], float]:
+        meta = {**table_meta, "format": fmt}
+        return lambda: _time(lambda: save_table_data(name, table, meta, sync=False))
+
+    def load(fmt: str) -> Callable[[], float]:
+        meta = {**table_meta, "format": fmt}
+        save_table_data(name, table, meta, sync=False)
+        return lambda: _time(lambda: load_table_data(name, meta))
+
+    cases: dict[str, Callable[[], float]] = {
+        "insert": insert,
+        "select_point": point_select,
+        "select_scan": full_scan,
+        "update": update,
+        "delete": delete,
+    }
+    for fmt in (FORMAT_JSON, FORMAT_COLUMNAR):
+        cases[f"save_{fmt}"] = save(fmt)
+        cases[f"load_{fmt}"] = load(fmt)
+    return {f"{case}/{shape}/{rows}": run for case, run in cases.items()}
+
+
+def run_suite(sizes: list[int], shapes: list[str], repeat: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for shape in shapes:
+        for rows in sizes:
+            with contextlib.redirect_stdout(None):
+                cases = _cases(shape, rows)
+            for case, run in cases.items():
+                with contextlib.redirect_stdout(None):
+                    runs = [run() for _ in range(repeat)]
+                results[case] = {
+                    "min": min(runs),
+                    "median": statistics.median(runs),
+                    "runs": runs,
+                }
+                print(f"{case:36} {min(runs) * 1000:12.3f} мс", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Напечатать сравнение с базовыми замерами; вернуть регрессии."""
+    regressions = []
+    print(f"{'замер':36} {'база, мс':>12} {'сейчас, мс':>12} {'отношение':>10}")
+    for case, result in current["results"].items():
+        base = baseline.get("results", {}).get(case)
+        if base is None:
+            print(f"{case:36} {'—':>12} {result['min'] * 1000:12.3f}")
+            continue
+        ratio = result["min"] / base["min"] if base["min"] else 1.0
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions.append(case)
+        print(
+            f"{case:36} {base['min'] * 1000:12.3f} {result['min'] * 1000:12.3f} "
+            f"{ratio:10.2f}{mark}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--shapes", nargs="+", choices=tuple(SHAPES), default=list(SHAPES)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="записать результаты в JSON-файл")
+    parser.add_argument("--baseline", help="сравнить с базовыми результатами")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument(
+        "--save-baseline",
+        metavar="PATH",
+        help="записать результаты как новый базовый файл",
+    )
+    args = parser.parse_args()
+
+    set_confirm_policy(True)
+    set_timing_mode(TIMING_OFF)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            current = run_suite(args.sizes, args.shapes, args.repeat)
+        finally:
+            os.chdir(cwd)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"Регрессий: {len(regressions)} (порог {args.threshold:.0%}).")
+            sys.exit(1)
+        print("Регрессий нет.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Select/update/delete: цикл по строкам против векторного выполнения (vector.py).
+
+Строится таблица в памяти (Table со строками-слотами) и её столбцы
+(ColumnBatch). Для каждого условия замеряются select, update и delete
+обычным циклом по строкам со скомпилированным предикатом и с ID из
+столбцов. update и delete, как в engine, пишут журнал изменений, а
+векторные ещё и обновляют по нему столбцы.
+
+    PYTHONPATH=src python benchmarks/vector_scan.py [--rows N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+from typing import Any, Callable
+
+from primitive_db.core import delete_rows, select_rows, update_rows
+from primitive_db.decorators import TIMING_OFF, set_confirm_policy, set_timing_mode
+from primitive_db.parser import And, Compare, Expr, Or
+from primitive_db.table import Table
+from primitive_db.vector import ColumnBatch, numpy_available
+
+COLUMNS = [
+    {"name": "ID", "type": "int"},
+    {"name": "age", "type": "int"},
+    {"name": "city", "type": "str"},
+    {"name": "active", "type": "bool"},
+]
+CITIES = ["Moscow", "Kazan", "Omsk", "Tver", "Sochi"]
+WHERE: dict[str, Expr] = {
+    "age = 42": Compare("age", "=", 42),
+    "age < 9": Compare("age", "<", 9),
+    "city = Omsk": Compare("city", "=", "Omsk"),
+    "age >= 30 and city = Omsk": And(
+        (Compare("age", ">=", 30), Compare("city", "=", "Omsk"))
+    ),
+    "active = true or age in (1, 2)": Or(
+        (Compare("active", "=", True), Compare("age", "in", (1, 2)))
+    ),
+}
+
+
+def _rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "ID": i + 1,
+            "age": i * 7 % 90,
+            "city": CITIES[i % len(CITIES)],
+            "active": i % 3 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def _best(
+    func: Callable[[Any], Any], repeat: int, setup: Callable[[], Any] = lambda: None
+) -> tuple[float, Any]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        prepared = setup()
+        # мусор от построения копии таблицы не должен попасть в замер
+        gc.collect()
+        start = time.perf_counter()
+        result = func(prepared)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    set_confirm_policy(True)
+    set_timing_mode(TIMING_OFF)
+    rows = _rows(args.rows)
+    fields = [col["name"] for col in COLUMNS]
+    table = Table(rows, fields)
+    start = time.perf_counter()
+    batch = ColumnBatch(COLUMNS, table)
+    built = time.perf_counter() - start
+
+    def fresh() -> tuple[Table, ColumnBatch]:
+        copy = Table(rows, fields)
+        return copy, ColumnBatch(COLUMNS, copy)
+
+    backend = "NumPy" if numpy_available() else "array"
+    print(f"Строк: {args.rows}, столбцы: {backend}, построение {built:.3f} с")
+    print(f"{'условие':32} | операция | строки, с | столбцы, с | ускорение")
+    for name, where in WHERE.items():
+        assignments = {"active": False}
+
+        def vector_update(target: Any, where: Expr = where) -> int:
+            data, vectors = target
+            changes: list[dict] = []
+            _, updated = update_rows(
+                data, assignments, where, changes, vectors.select(where)
+            )
+            vectors.apply(changes)
+            return updated
+
+        def vector_delete(target: Any, where: Expr = where) -> int:
+            data, vectors = target
+            changes: list[dict] = []
+            _, deleted = delete_rows(data, where, changes, vectors.select(where))
+            vectors.apply(changes)
+            return deleted
+
+        cases = {
+            "select": (
+                lambda _, where=where: len(select_rows(table, where)),
+                lambda _, where=where: len(
+                    select_rows(table, where, batch.select(where))
+                ),
+                lambda: None,
+            ),
+            "update": (
+                lambda target, where=where: update_rows(
+                    target[0], assignments, where, []
+                )[1],
+                vector_update,
+                fresh,
+            ),
+            "delete": (
+                lambda target, where=where: delete_rows(target[0], where, [])[1],
+                vector_delete,
+                fresh,
+            ),
+        }
+        for operation, (by_rows, by_columns, setup) in cases.items():
+            serial, expected = _best(by_rows, args.repeat, setup)
+            vector, result = _best(by_columns, args.repeat, setup)
+            if result != expected:
+                raise SystemExit(f"{operation} {name}: результаты отличаются")
+            print(
+                f"{name:32} | {operation:8} | {serial:9.3f} | {vector:10.3f} | "
+                f"{serial / vector:9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
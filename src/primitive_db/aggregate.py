@@ -0,0 +1,197 @@
+"""Агрегатные запросы: count, sum, avg, min, max и group by.
+
+    select count(*), avg(age) from users where active = true group by city
+
+Результат считается за один проход по подходящим строкам: для каждой
+группы держатся только накопители, сами строки не собираются. Запрос
+по всей таблице без where и group by, которому хватает счётчиков из
+метаданных (stats.py), отвечается вовсе без просмотра.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Iterable, NamedTuple
+
+from .metrics import timed
+from .stats import table_stats
+
+FUNCTIONS = ("count", "sum", "avg", "min", "max")
+
+_QUERY_RE = re.compile(
+    r"^select\s+(?P<items>.+?)\s+from\s+(?P<table>\S+)"
+    r"(?:\s+where\s+(?P<where>.+?))?"
+    r"(?:\s+group\s+by\s+(?P<group>.+?))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ITEM_RE = re.compile(
+    rf"^(?P<func>{'|'.join(FUNCTIONS)})\s*\(\s*(?P<arg>\*|\w+)\s*\)$",
+    re.IGNORECASE,
+)
+_NAME_RE = re.compile(r"^\w+$")
+_NUMERIC = {"int"}
+
+
+class Item(NamedTuple):
+    """Элемент списка select: func=None — столбец группировки."""
+
+    func: str | None
+    column: str  # "*" для count(*)
+
+    @property
+    def label(self) -> str:
+        return self.column if self.func is None else f"{self.func}({self.column})"
+
+
+class AggregateQuery(NamedTuple):
+    table: str
+    items: tuple[Item, ...]
+    where: str | None
+    group_by: tuple[str, ...]
+
+
+def parse_aggregate(user_input: str, metadata: dict) -> AggregateQuery:
+    """Разобрать агрегатный select.
+
+    ValueError — если запрос некорректен, KeyError — если нет таблицы.
+    """
+    match = _QUERY_RE.match(user_input.strip())
+    if match is None:
+        raise ValueError("ожидается select <агрегаты> from <таблица>")
+    table_name = match.group("table")
+    if table_name not in metadata:
+        raise KeyError(table_name)
+    types = {col["name"]: col["type"] for col in metadata[table_name]["columns"]}
+
+    group_by: list[str] = []
+    if match.group("group"):
+        for name in match.group("group").split(","):
+            name = name.strip()
+            if name not in types:
+                raise ValueError(f"неизвестный столбец {name}")
+            group_by.append(name)
+
+    items: list[Item] = []
+    for part in match.group("items").split(","):
+        part = part.strip()
+        found = _ITEM_RE.match(part)
+        if found is not None:
+            func, arg = found.group("func").lower(), found.group("arg")
+            if arg == "*" and func != "count":
+                raise ValueError(f"{func}(*) не поддерживается")
+            if arg != "*" and arg not in types:
+                raise ValueError(f"неизвестный столбец {arg}")
+            if func in {"sum", "avg"} and types[arg] not in _NUMERIC:
+                raise ValueError(f"{func} применим только к столбцам int")
+            items.append(Item(func, arg))
+        elif _NAME_RE.match(part):
+            if part not in group_by:
+                raise ValueError(f"столбец {part} должен быть в group by")
+            items.append(Item(None, part))
+        else:
+            raise ValueError(part)
+
+    return AggregateQuery(
+        table_name, tuple(items), match.group("where"), tuple(group_by)
+    )
+
+
+class _Accumulator:
+    """Накопитель одной агрегатной функции в одной группе."""
+
+    __slots__ = ("func", "column", "count", "value")
+
+    def __init__(self, func: str, column: str) -> None:
+        self.func = func
+        self.column = column
+        self.count = 0
+        self.value: Any = 0 if func in {"sum", "avg"} else None
+
+    def add(self, row: Any) -> None:
+        if self.column == "*":
+            self.count += 1
+            return
+        value = row.get(self.column)
+        if value is None:
+            return
+        self.count += 1
+        func = self.func
+        if func in {"sum", "avg"}:
+            self.value += value
+        elif func == "min":
+            if self.value is None or value < self.value:
+                self.value = value
+        elif func == "max":
+            if self.value is None or value > self.value:
+                self.value = value
+
+    def result(self) -> Any:
+        if self.func == "count":
+            return self.count
+        if self.func == "avg":
+            return self.value / self.count if self.count else None
+        if self.func == "sum":
+            return self.value if self.count else None
+        return self.value
+
+
+def _sort_key(key: tuple) -> tuple:
+    return tuple((value is None, value) for value in key)
+
+
+@timed("scan.aggregate")
+def run_aggregate(query: AggregateQuery, rows: Iterable[Any]) -> list[dict[str, Any]]:
+    """Посчитать запрос одним проходом по строкам (уже отфильтрованным)."""
+    functions = [item for item in query.items if item.func is not None]
+    group_by = query.group_by
+    groups: dict[tuple, list[_Accumulator]] = {}
+
+    for row in rows:
+        key = tuple(row.get(column) for column in group_by)
+        accumulators = groups.get(key)
+        if accumulators is None:
+            accumulators = [_Accumulator(i.func, i.column) for i in functions]
+            groups[key] = accumulators
+        for accumulator in accumulators:
+            accumulator.add(row)
+
+    if not group_by and not groups:
+        groups[()] = [_Accumulator(i.func, i.column) for i in functions]
+
+    result = []
+    for key in sorted(groups, key=_sort_key):
+        values = dict(zip(group_by, key, strict=True))
+        for item, accumulator in zip(functions, groups[key], strict=True):
+            values[item.label] = accumulator.result()
+        result.append({item.label: values[item.label] for item in query.items})
+    return result
+
+
+def aggregate_from_stats(
+    query: AggregateQuery, table_meta: dict | None
+) -> list[dict[str, Any]] | None:
+    """Ответ по счётчикам таблицы без просмотра или None, если их мало."""
+    stats = table_stats(table_meta)
+    if stats is None or query.where or query.group_by:
+        return None
+    rows = stats["rows"]
+
+    row: dict[str, Any] = {}
+    for item in query.items:
+        if item.func == "count":
+            # значений None в таблицах нет: count(col) == count(*)
+            value: Any = rows
+        elif item.func in {"min", "max"}:
+            if rows and item.column not in stats[item.func]:
+                return None
+            value = stats[item.func].get(item.column)
+        else:
+            total = stats["sum"].get(item.column)
+            if rows and total is None:
+                return None
+            if not rows:
+                value = None
+            else:
+                value = total if item.func == "sum" else total / rows
+        row[item.label] = value
+    return [row]
@@ -0,0 +1,125 @@
+"""Пакетное выполнение команд: database -f script.sql / database -c "...".
+
+Команды читаются из файла (или stdin, если файл "-") либо из строки по
+одной на строку или через ";"; пустые строки и комментарии (# или --)
+пропускаются. Приветствие и справка не печатаются, подтверждения
+удаления отвечаются политикой --confirm без вопросов.
+
+Метаданные и таблицы читаются один раз и остаются в памяти на весь
+скрипт. При durability=full изменения записываются после каждой
+изменяющей команды, как в консоли (PRIMITIVE_DB_FLUSH_INTERVAL), а при
+group и off копятся и записываются в конце скрипта, по commit и при
+group — каждые PRIMITIVE_DB_GROUP_COMMIT команд. Скрипт, обёрнутый
+в begin/commit, либо применяется целиком, либо, если прервался, не
+применяется вовсе.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Iterable, Iterator
+
+from .cache import save_select_cache
+from .constants import DURABILITY_FULL, FLUSH_INTERVAL
+from .decorators import (
+    TIMING_SUMMARY,
+    set_confirm_policy,
+    set_timing_mode,
+    timing_stats,
+)
+from .engine import _execute
+from .errors import DatabaseError
+from .store import TableStore
+
+_QUOTES = "\"'"
+
+
+def _split_line(text: str) -> list[str]:
+    """Разделить строку по ";" вне кавычек."""
+    parts: list[str] = []
+    current: list[str] = []
+    quote = None
+    for ch in text:
+        if quote is not None:
+            if ch == quote:
+                quote = None
+        elif ch in _QUOTES:
+            quote = ch
+        elif ch == ";":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def split_statements(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """Команды скрипта с номерами строк, в которых они записаны."""
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith(("#", "--")):
+            continue
+        for statement in _split_line(text):
+            yield number, statement
+
+
+def _flush_interval(durability: str) -> float:
+    # full обещает, что выполненная команда уже на диске; group и off
+    # жертвуют этим ради скорости и сбрасывают изменения реже
+    return FLUSH_INTERVAL if durability == DURABILITY_FULL else math.inf
+
+
+def _print_timing_summary() -> None:
+    for name, (calls, total) in sorted(timing_stats.items()):
+        print(
+            f"Функция {name}: вызовов {calls}, всего {total:.3f} секунд, "
+            f"в среднем {total / calls * 1000:.3f} мс."
+        )
+
+
+def run_batch(
+    lines: Iterable[str],
+    confirm: bool | None = True,
+    timing: str = TIMING_SUMMARY,
+) -> int:
+    """Выполнить команды скрипта; вернуть код завершения процесса.
+
+    Ошибка, прервавшая команду (повреждённый файл, занятая блокировка,
+    некорректная строка), останавливает скрипт с кодом 1.
+    """
+    set_confirm_policy(confirm)
+    set_timing_mode(timing)
+    timing_stats.clear()
+
+    store = TableStore()
+    if store.recover():
+        print("Восстановлена транзакция, прерванная при фиксации.")
+
+    started = time.monotonic()
+    executed = 0
+    status = 0
+    try:
+        for number, command in split_statements(lines):
+            try:
+                keep_going = _execute(store, command)
+                # уровень мог смениться командой durability
+                store.flush_interval = _flush_interval(store.durability)
+                store.maybe_flush()
+            except (DatabaseError, ValueError) as exc:
+                print(f"Ошибка в строке {number}: {exc}. Выполнение прервано.")
+                status = 1
+                break
+            executed += 1
+            if not keep_going:
+                break
+    finally:
+        store.close()
+        save_select_cache(store)
+
+    if timing == TIMING_SUMMARY:
+        _print_timing_summary()
+        elapsed = time.monotonic() - started
+        print(f"Выполнено команд: {executed} за {elapsed:.3f} секунд.")
+    return status
@@ -0,0 +1,194 @@
+"""Кэш результатов select.
+
+Ключ результата — (таблица, версия содержимого, условие WHERE). Версию
+ведёт TableStore: она меняется, когда файл таблицы изменили извне, поэтому
+устаревший результат просто перестаёт находиться. Собственные изменения
+сессии вносятся в закэшированные результаты по журналу изменений.
+
+Результаты хранятся неизменяемыми снимками: кортеж строк-копий, которые
+нельзя изменить и которые не меняются вместе с живыми строками таблицы.
+
+Если задан PRIMITIVE_DB_CACHE_FILE, кэш сохраняется при выходе и
+подхватывается в следующей сессии для таблиц, файлы которых не менялись.
+"""
+
+from __future__ import annotations
+
+import json
+from types import MappingProxyType
+from typing import Any, Callable, Iterable
+
+from .constants import SELECT_CACHE_FILE
+from .decorators import create_cacher
+from .parser import Expr
+from .query import (
+    compile_where,
+    expression_columns,
+    expression_from_json,
+    expression_to_json,
+)
+from .store import TableStore
+from .utils import load_cache_file, save_cache_file
+
+
+def freeze_row(row: Any) -> MappingProxyType:
+    """Неизменяемая копия строки."""
+    return MappingProxyType(dict(row.items()))
+
+
+def freeze_rows(rows: Iterable[Any]) -> tuple[MappingProxyType, ...]:
+    return tuple(freeze_row(row) for row in rows)
+
+
+select_cache = create_cacher(freeze=freeze_rows)
+
+# Сохранённые на диске результаты, ещё не перенесённые в кэш:
+# таблица -> {"stamp": ..., "entries": [...]}.
+_persisted: dict[str, dict] = {}
+_persisted_loaded = False
+
+
+def _stamp_json(stamp: Any) -> Any:
+    return json.loads(json.dumps(stamp))
+
+
+def _warm(store: TableStore, table_name: str) -> None:
+    """Перенести в кэш сохранённые результаты таблицы, если файлы те же."""
+    global _persisted_loaded
+    if not SELECT_CACHE_FILE:
+        return
+    if not _persisted_loaded:
+        _persisted.update(load_cache_file(SELECT_CACHE_FILE).get("tables", {}))
+        _persisted_loaded = True
+
+    saved = _persisted.pop(table_name, None)
+    if saved is None:
+        return
+    if saved.get("stamp") != _stamp_json(store.data_stamp(table_name)):
+        return
+    version = store.version(table_name)
+    for entry in saved.get("entries", []):
+        where_clause = expression_from_json(entry["where"])
+        if where_clause is None:
+            continue  # select без условия не кэшируется
+        select_cache.put((table_name, version, where_clause), entry["rows"])
+
+
+def cached_select(
+    store: TableStore,
+    table_name: str,
+    where_clause: Expr | None,
+    compute: Callable[[], Any],
+):
+    """Результат select из кэша или compute(); store.reader уже вызван.
+
+    select без условия не кэшируется: его результат — сама таблица, а кэш
+    хранил бы копию всех её строк (ленивый снимок раскодировал бы целиком).
+    """
+    if where_clause is None:
+        return compute()
+    _warm(store, table_name)
+    key = (table_name, store.version(table_name), where_clause)
+    return select_cache(key, compute)
+
+
+def patch_select_cache(
+    store: TableStore,
+    table_name: str,
+    changes: list[dict],
+) -> None:
+    """Исправить закэшированные результаты select таблицы по журналу изменений.
+
+    Новые строки дописываются в конец подходящих результатов (ID растут),
+    удалённые вычёркиваются, изменённые заменяются свежими копиями. Если
+    после update строка начинает подходить под условие, результат
+    сбрасывается: её позицию дешевле получить новым запросом.
+    """
+    if not changes:
+        return
+    _persisted.pop(table_name, None)
+    table_data = store.table(table_name)
+    version = store.version(table_name)
+    inserted = [
+        table_data.get(entry["row"]["ID"])
+        for entry in changes
+        if entry["op"] == "insert"
+    ]
+    deleted = {entry["ID"] for entry in changes if entry["op"] == "delete"}
+    updated: dict[int, set[str]] = {}
+    for entry in changes:
+        if entry["op"] == "update":
+            updated.setdefault(entry["ID"], set()).update(entry["set"])
+
+    def update(key: tuple, rows: tuple):
+        if key[1] != version:
+            return None
+        where_clause = key[2]
+        match = compile_where(where_clause)
+        columns = expression_columns(where_clause)
+
+        result = []
+        seen: set[int] = set()
+        for row in rows:
+            row_id = row.get("ID")
+            if row_id in deleted:
+                continue
+            if row_id in updated:
+                seen.add(row_id)
+                live = table_data.get(row_id)
+                if live is None or not match(live):
+                    continue
+                row = freeze_row(live)
+            result.append(row)
+
+        for row_id, set_columns in updated.items():
+            if row_id in seen or not columns & set_columns:
+                continue
+            live = table_data.get(row_id)
+            if live is not None and match(live):
+                return None
+
+        result.extend(
+            freeze_row(row) for row in inserted if row is not None and match(row)
+        )
+        return tuple(result)
+
+    select_cache.patch(table_name, update)
+
+
+def invalidate_select_cache(table_name: str) -> None:
+    _persisted.pop(table_name, None)
+    select_cache.invalidate(table_name)
+
+
+def save_select_cache(store: TableStore) -> None:
+    """Сохранить актуальные результаты в PRIMITIVE_DB_CACHE_FILE."""
+    if not SELECT_CACHE_FILE:
+        return
+    tables = dict(_persisted)
+    for table_name in select_cache.tables():
+        stamp = store.data_stamp(table_name)
+        if stamp is None or store.is_dirty(table_name):
+            continue
+        version = store.version(table_name)
+        entries = [
+            {
+                "where": expression_to_json(key[2]),
+                "rows": [dict(row) for row in rows],
+            }
+            for key, rows in select_cache.entries(table_name)
+            if key[1] == version
+        ]
+        if entries:
+            tables[table_name] = {"stamp": _stamp_json(stamp), "entries": entries}
+    save_cache_file(SELECT_CACHE_FILE, {"tables": tables})
+
+
+def print_cache_info() -> None:
+    info = select_cache.info()
+    print(f"Запросов в кэше: {info['entries']} из {info['max_entries']}")
+    print(f"Строк в кэше: {info['rows']} из {info['max_rows']}")
+    print(
+        f"Попадания: {info['hits']}, промахи: {info['misses']}, "
+        f"вытеснения: {info['evictions']}, сбросы: {info['invalidations']}"
+    )
@@ -0,0 +1,91 @@
+"""Клиент сервера базы данных (database serve).
+
+    with Client(socket_path="/tmp/db.sock") as db:
+        db.execute("insert into users values (Ann, 30, true)")
+        rows = db.select("select from users where age > 20")
+        rows = db.select("select from users where ID = ?", [7])
+
+Клиент синхронный и держит одно соединение; для параллельных запросов
+каждому потоку нужен свой Client.
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+from typing import Any, Sequence
+
+from .constants import SERVER_HOST, SERVER_PORT, SERVER_SOCKET
+from .errors import DatabaseError
+
+
+class Client:
+    """Соединение с сервером; Unix-сокет, если задан socket_path, иначе TCP."""
+
+    def __init__(
+        self,
+        socket_path: str | None = SERVER_SOCKET or None,
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        timeout: float | None = None,
+    ) -> None:
+        if socket_path:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(socket_path)
+        else:
+            self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rwb")
+        self._next_id = 0
+
+    def request(
+        self, command: str, params: Sequence[Any] | None = None
+    ) -> dict[str, Any]:
+        """Выполнить команду и вернуть ответ сервера как есть.
+
+        params — значения для `?` в insert/select/update/delete: сервер
+        разбирает команду один раз и дальше только подставляет значения.
+        """
+        self._next_id += 1
+        payload: dict[str, Any] = {"id": self._next_id, "command": command}
+        if params:
+            payload["params"] = list(params)
+        self._file.write(json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Сервер закрыл соединение")
+        return json.loads(line)
+
+    def execute(
+        self, command: str, params: Sequence[Any] | None = None
+    ) -> list[str]:
+        """Выполнить команду; вернуть её вывод, при ошибке — DatabaseError."""
+        response = self.request(command, params)
+        if not response.get("ok"):
+            raise DatabaseError(response.get("error", "Ошибка сервера"))
+        return response.get("output", [])
+
+    def select(
+        self, query: str, params: Sequence[Any] | None = None
+    ) -> list[dict[str, Any]]:
+        """Записи результата select."""
+        response = self.request(query, params)
+        if not response.get("ok"):
+            raise DatabaseError(response.get("error", "Ошибка сервера"))
+        if "rows" not in response:
+            # команда выполнилась, но это не select
+            raise DatabaseError(" ".join(response.get("output", [])))
+        return response["rows"]
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
+
+    def __enter__(self) -> Client:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
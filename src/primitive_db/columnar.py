@@ -0,0 +1,200 @@
+"""Колоночный бинарный формат таблиц.
+
+Структура файла:
+
+    MAGIC (8 байт) | длина заголовка (uint32 LE) | заголовок JSON | блоки столбцов
+
+Заголовок хранит число строк и для каждого столбца его имя, тип, смещение
+и длину блока. Блоки выровнены по 8 байт:
+
+* int  — массив int64 (little-endian);
+* bool — биты, упакованные по 8 в байт (младший бит — первая строка);
+* str  — n + 1 смещений int64 и следом «куча» UTF-8 байтов всех строк.
+
+Файл читается через mmap: столбцы int доступны как memoryview без
+копирования, а строки декодируются только при обращении к ним.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, BinaryIO, Iterable, Iterator
+
+MAGIC = b"PDBCOL1\n"
+_HEADER_LEN = struct.Struct("<I")
+_ALIGN = 8
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGN)
+
+
+def _int64_bytes(values: Iterable[int]) -> bytes:
+    try:
+        arr = array("q", values)
+    except OverflowError as exc:
+        raise ValueError("Значение int не помещается в 64 бита") from exc
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _pack_bools(values: list[bool]) -> bytes:
+    packed = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value:
+            packed[i >> 3] |= 1 << (i & 7)
+    return bytes(packed)
+
+
+def _encode_column(col_type: str, values: list[Any]) -> bytes:
+    if col_type == "int":
+        return _int64_bytes(values)
+    if col_type == "bool":
+        return _pack_bools(values)
+    if col_type == "str":
+        encoded = [str(value).encode("utf-8") for value in values]
+        offsets = [0]
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        return _int64_bytes(offsets) + b"".join(encoded)
+    raise ValueError(f"Unsupported type '{col_type}'")
+
+
+def write_columnar(
+    f: BinaryIO,
+    columns: list[dict[str, str]],
+    rows: Iterable[dict[str, Any]],
+) -> None:
+    """Записать строки в колоночном формате в открытый бинарный файл."""
+    rows = list(rows)
+    blocks = [
+        _encode_column(col["type"], [row.get(col["name"]) for row in rows])
+        for col in columns
+    ]
+
+    layout = []
+    offset = 0
+    for col, block in zip(columns, blocks, strict=True):
+        layout.append(
+            {
+                "name": col["name"],
+                "type": col["type"],
+                "offset": offset,
+                "length": len(block),
+            }
+        )
+        offset += len(block) + len(_pad(len(block)))
+
+    header = json.dumps(
+        {"rows": len(rows), "columns": layout}, ensure_ascii=False
+    ).encode("utf-8")
+    prefix_len = len(MAGIC) + _HEADER_LEN.size + len(header)
+
+    f.write(MAGIC)
+    f.write(_HEADER_LEN.pack(len(header)))
+    f.write(header)
+    f.write(_pad(prefix_len))
+    for block in blocks:
+        f.write(block)
+        f.write(_pad(len(block)))
+
+
+class ColumnarFile:
+    """Колоночный файл, отображённый в память (только чтение)."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Файл {path} не является колоночной таблицей")
+
+        (header_len,) = _HEADER_LEN.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(self._mm[start : start + header_len])
+        data_start = start + header_len
+        data_start += -data_start % _ALIGN
+
+        self.rows: int = header["rows"]
+        self.columns: list[dict[str, Any]] = header["columns"]
+        self._base = data_start
+        self._by_name = {col["name"]: col for col in self.columns}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __enter__(self) -> ColumnarFile:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _block(self, name: str) -> tuple[int, int]:
+        col = self._by_name[name]
+        start = self._base + col["offset"]
+        return start, start + col["length"]
+
+    def _int64s(self, start: int, count: int) -> array:
+        arr = array("q")
+        arr.frombytes(self._mm[start : start + 8 * count])
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return arr
+
+    def column(self, name: str, lo: int = 0, hi: int | None = None) -> list[Any]:
+        """Значения столбца в строках [lo, hi) (по умолчанию все)."""
+        col = self._by_name[name]
+        start, end = self._block(name)
+        hi = self.rows if hi is None else min(hi, self.rows)
+        count = max(hi - lo, 0)
+
+        if col["type"] == "int":
+            return self._int64s(start + 8 * lo, count).tolist()
+        if col["type"] == "bool":
+            packed = self._mm[start:end]
+            return [bool(packed[i >> 3] >> (i & 7) & 1) for i in range(lo, hi)]
+
+        offsets = self._int64s(start + 8 * lo, count + 1)
+        heap = start + 8 * (self.rows + 1)
+        return [
+            self._mm[heap + offsets[i] : heap + offsets[i + 1]].decode("utf-8")
+            for i in range(count)
+        ]
+
+    def value(self, name: str, i: int) -> Any:
+        """Значение одного столбца в строке i (без декодирования остальных)."""
+        col = self._by_name[name]
+        start, _ = self._block(name)
+
+        if col["type"] == "int":
+            return self._int64s(start + 8 * i, 1)[0]
+        if col["type"] == "bool":
+            return bool(self._mm[start + (i >> 3)] >> (i & 7) & 1)
+
+        lo, hi = self._int64s(start + 8 * i, 2)
+        heap = start + 8 * (self.rows + 1)
+        return self._mm[heap + lo : heap + hi].decode("utf-8")
+
+    def row(self, i: int) -> dict[str, Any]:
+        return {col["name"]: self.value(col["name"], i) for col in self.columns}
+
+    def iter_rows(self) -> Iterator[dict[str, Any]]:
+        names = [col["name"] for col in self.columns]
+        values = [self.column(name) for name in names]
+        for i in range(self.rows):
+            yield {name: column[i] for name, column in zip(names, values, strict=True)}
+
+
+def read_columnar(path: str) -> list[dict[str, Any]]:
+    """Прочитать колоночный файл целиком в список строк."""
+    with ColumnarFile(path) as table:
+        return list(table.iter_rows())
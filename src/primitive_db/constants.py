@@ -1,3 +1,5 @@
+import os
+
 DATA_DIR = "data"
 META_FILE = "db_meta.json"
 
@@ -6,3 +8,89 @@ VALID_TYPES = {
     "str": str,
     "bool": bool,
 }
+
+# Режимы хранения таблиц: снимок JSON целиком или снимок + журнал изменений.
+STORAGE_JSON = "json"
+STORAGE_LOG = "log"
+STORAGE_MODES = {STORAGE_JSON, STORAGE_LOG}
+
+LOG_SUFFIX = ".log"
+# Размер журнала, после которого он сворачивается обратно в снимок.
+LOG_COMPACT_BYTES = 1024 * 1024
+
+# Вторичные индексы по столбцам.
+INDEX_HASH = "hash"
+INDEX_SORTED = "sorted"
+INDEX_TYPES = {INDEX_HASH, INDEX_SORTED}
+INDEX_SUFFIX = ".idx"
+
+# Интервал (в секундах) сброса изменённых таблиц на диск во время сессии.
+# 0 — сохранять после каждой изменяющей команды.
+FLUSH_INTERVAL = float(os.environ.get("PRIMITIVE_DB_FLUSH_INTERVAL", "0"))
+
+# Количество записей, которое импорт читает и добавляет за один раз.
+IMPORT_CHUNK_SIZE = 10_000
+
+# Сколько строк выводится в одной таблице при печати результата select.
+PAGE_SIZE = 50
+
+# Форматы снимка таблицы на диске.
+FORMAT_JSON = "json"
+FORMAT_COLUMNAR = "columnar"
+FORMATS = {FORMAT_JSON: ".json", FORMAT_COLUMNAR: ".pdbc"}
+
+# Снимки больше этого размера (в байтах) читаются лениво через mmap,
+# если таблица ещё не загружена в память для изменения.
+LAZY_THRESHOLD_BYTES = int(
+    os.environ.get("PRIMITIVE_DB_LAZY_THRESHOLD", str(8 * 1024 * 1024))
+)
+
+# Бюджет кэша select: число запросов и суммарное число строк в результатах.
+SELECT_CACHE_ENTRIES = int(os.environ.get("PRIMITIVE_DB_CACHE_ENTRIES", "128"))
+SELECT_CACHE_ROWS = int(os.environ.get("PRIMITIVE_DB_CACHE_ROWS", "1000000"))
+# Файл, в котором кэш select сохраняется между сессиями ("" — не сохранять).
+SELECT_CACHE_FILE = os.environ.get("PRIMITIVE_DB_CACHE_FILE", "")
+
+# Уровень надёжности записи:
+# full  — каждый сброс на диск с fsync (по умолчанию);
+# group — изменения нескольких команд сбрасываются одной записью с fsync;
+# off   — без fsync (быстрая массовая загрузка, данные могут пропасть
+#         при сбое ОС, но файлы по-прежнему заменяются атомарно).
+DURABILITY_FULL = "full"
+DURABILITY_GROUP = "group"
+DURABILITY_OFF = "off"
+DURABILITY_LEVELS = {DURABILITY_FULL, DURABILITY_GROUP, DURABILITY_OFF}
+DURABILITY = os.environ.get("PRIMITIVE_DB_DURABILITY", DURABILITY_FULL)
+
+# Сколько команд объединяется в одну группу записи в режиме group.
+GROUP_COMMIT_SIZE = int(os.environ.get("PRIMITIVE_DB_GROUP_COMMIT", "16"))
+
+# Журнал фиксируемой транзакции: пока он существует, транзакция считается
+# зафиксированной, но, возможно, не до конца записанной в файлы таблиц.
+TX_JOURNAL_FILE = "db_transaction.json"
+
+# Сколько секунд ждать блокировку таблицы или метаданных, занятую другим
+# процессом, прежде чем сообщить об ошибке.
+LOCK_TIMEOUT = float(os.environ.get("PRIMITIVE_DB_LOCK_TIMEOUT", "10"))
+LOCK_SUFFIX = ".lock"
+
+# Адрес сервера (database serve): Unix-сокет, если задан, иначе TCP.
+SERVER_SOCKET = os.environ.get("PRIMITIVE_DB_SOCKET", "")
+SERVER_HOST = os.environ.get("PRIMITIVE_DB_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("PRIMITIVE_DB_PORT", "7781"))
+
+# Сбор метрик по фазам (команда metrics) и файл профиля команды profile.
+METRICS_ENABLED = os.environ.get("PRIMITIVE_DB_METRICS", "") not in {"", "0"}
+PROFILE_FILE = os.environ.get("PRIMITIVE_DB_PROFILE_FILE", "db_profile.prof")
+
+# Параллельный полный просмотр: с какого числа строк и сколькими процессами.
+PARALLEL_THRESHOLD = int(os.environ.get("PRIMITIVE_DB_PARALLEL_THRESHOLD", "500000"))
+PARALLEL_WORKERS = int(
+    os.environ.get("PRIMITIVE_DB_PARALLEL_WORKERS", str(os.cpu_count() or 1))
+)
+
+# Сколько разобранных шаблонов команд держит кэш engine.
+STATEMENT_CACHE_SIZE = int(os.environ.get("PRIMITIVE_DB_STATEMENT_CACHE", "256"))
+
+# Векторное выполнение условий по столбцам таблицы (vector.py).
+VECTOR_ENABLED = os.environ.get("PRIMITIVE_DB_VECTOR", "") not in {"", "0"}
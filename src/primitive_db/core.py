@@ -1,15 +1,37 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
-
-from .constants import VALID_TYPES
-from .decorators import confirm_action, handle_db_errors, log_time
+from typing import Any, Collection, Dict, Iterable, Iterator, List
+
+from .constants import (
+    FORMAT_COLUMNAR,
+    FORMAT_JSON,
+    FORMATS,
+    INDEX_TYPES,
+    STORAGE_JSON,
+    STORAGE_MODES,
+    VALID_TYPES,
+)
+from .decorators import (
+    confirm_action,
+    handle_db_errors,
+    log_time,
+    report_error,
+)
+from .index import build_index
+from .metrics import phase, timed
+from .parallel import parallel_matching_rows
+from .parser import Expr
+from .query import compile_where, equality_value
+from .rows import to_dict
+from .stats import empty_stats
+from .table import Table
+from .utils import delete_index_file, save_index_data
 
 
 def _get_table(metadata: dict, table_name: str) -> dict | None:
     table = metadata.get(table_name)
     if table is None:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
         return None
 
     if isinstance(table, list):
@@ -17,7 +39,7 @@ def _get_table(metadata: dict, table_name: str) -> dict | None:
         return metadata[table_name]
 
     if not isinstance(table, dict):
-        print(f'Ошибка: Некорректные метаданные таблицы "{table_name}".')
+        report_error(f'Ошибка: Некорректные метаданные таблицы "{table_name}".')
         return None
 
     return table
@@ -26,7 +48,7 @@ def _get_table(metadata: dict, table_name: str) -> dict | None:
 def _get_columns(metadata: dict, table_name: str) -> List[Dict[str, str]] | None:
     table = metadata.get(table_name)
     if table is None:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
         return None
 
     if isinstance(table, dict):
@@ -37,26 +59,42 @@ def _get_columns(metadata: dict, table_name: str) -> List[Dict[str, str]] | None
         metadata[table_name] = {"columns": table}
         return table
 
-    print(f'Ошибка: Некорректные метаданные таблицы "{table_name}".')
+    report_error(f'Ошибка: Некорректные метаданные таблицы "{table_name}".')
     return None
 
 
 @handle_db_errors
-def create_table(metadata: dict, table_name: str, columns: List[str]) -> dict:
+def create_table(
+    metadata: dict,
+    table_name: str,
+    columns: List[str],
+    storage: str = STORAGE_JSON,
+    fmt: str = FORMAT_JSON,
+) -> dict:
     """Создать таблицу в метаданных.
 
     columns: список строк формата "name:type".
     Автоматически добавляется столбец ID:int в начало списка столбцов.
+    storage: режим хранения данных ("json" — снимок, "log" — снимок + журнал).
+    fmt: формат снимка на диске ("json" или колоночный "columnar").
     """
     if table_name in metadata:
-        print(f'Ошибка: Таблица "{table_name}" уже существует.')
+        report_error(f'Ошибка: Таблица "{table_name}" уже существует.')
+        return metadata
+
+    if storage not in STORAGE_MODES:
+        report_error(f"Некорректное значение: {storage}. Попробуйте снова.")
+        return metadata
+
+    if fmt not in FORMATS:
+        report_error(f"Некорректное значение: {fmt}. Попробуйте снова.")
         return metadata
 
     user_columns: List[Dict[str, str]] = []
 
     for col_def in columns:
         if ":" not in col_def:
-            print(f"Некорректное значение: {col_def}. Попробуйте снова.")
+            report_error(f"Некорректное значение: {col_def}. Попробуйте снова.")
             return metadata
 
         name, type_name = col_def.split(":", 1)
@@ -64,14 +102,20 @@ def create_table(metadata: dict, table_name: str, columns: List[str]) -> dict:
         type_name = type_name.strip()
 
         if type_name not in VALID_TYPES:
-            print(f"Некорректное значение: {col_def}. Попробуйте снова.")
+            report_error(f"Некорректное значение: {col_def}. Попробуйте снова.")
             return metadata
 
         user_columns.append({"name": name, "type": type_name})
 
     # Добавляем ID:int в начало
     schema: List[Dict[str, str]] = [{"name": "ID", "type": "int"}, *user_columns]
-    metadata[table_name] = {"columns": schema}
+    metadata[table_name] = {
+        "columns": schema,
+        "storage": storage,
+        "format": fmt,
+        "next_id": 1,
+        "stats": empty_stats(),
+    }
 
     cols_desc = ", ".join(f'{c["name"]}:{c["type"]}' for c in schema)
     print(f'Таблица "{table_name}" успешно создана со столбцами: {cols_desc}')
@@ -84,7 +128,7 @@ def create_table(metadata: dict, table_name: str, columns: List[str]) -> dict:
 def drop_table(metadata: dict, table_name: str) -> dict:
     """Удалить таблицу из метаданных."""
     if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
         return metadata
 
     del metadata[table_name]
@@ -92,6 +136,78 @@ def drop_table(metadata: dict, table_name: str) -> dict:
     return metadata
 
 
+@handle_db_errors
+def create_index(
+    metadata: dict,
+    table_name: str,
+    column: str,
+    kind: str,
+    table_data: List[Dict[str, Any]],
+) -> dict:
+    """Построить индекс по столбцу и зарегистрировать его в метаданных."""
+    table = _get_table(metadata, table_name)
+    if table is None:
+        return metadata
+
+    if column not in {c["name"] for c in table.get("columns", [])}:
+        report_error(f"Некорректное значение: {column}. Попробуйте снова.")
+        return metadata
+
+    if kind not in INDEX_TYPES:
+        report_error(f"Некорректное значение: {kind}. Попробуйте снова.")
+        return metadata
+
+    index = build_index(table_data, column, kind)
+    save_index_data(table_name, column, index.to_json())
+    table.setdefault("indexes", {})[column] = kind
+
+    print(f'Индекс ({kind}) по столбцу "{column}" таблицы "{table_name}" создан.')
+    return metadata
+
+
+@handle_db_errors
+def drop_index(metadata: dict, table_name: str, column: str) -> dict:
+    """Удалить индекс по столбцу."""
+    table = _get_table(metadata, table_name)
+    if table is None:
+        return metadata
+
+    if column not in table.get("indexes", {}):
+        report_error(f'Ошибка: Индекс по столбцу "{column}" не найден.')
+        return metadata
+
+    del table["indexes"][column]
+    delete_index_file(table_name, column)
+    print(f'Индекс по столбцу "{column}" таблицы "{table_name}" удалён.')
+    return metadata
+
+
+# Столбец -> тип по схеме таблицы; ключ — id списка столбцов (сам список
+# хранится рядом, чтобы id не достался другому объекту).
+_COLUMN_TYPES: dict[int, tuple[list, dict[str, str]]] = {}
+_COLUMN_TYPES_LIMIT = 256
+
+
+def column_types(metadata: dict, table_name: str) -> dict[str, str] | None:
+    """Типы столбцов таблицы (None — таблицы нет).
+
+    Словарь строится один раз на схему: список столбцов в метаданных не
+    меняется на месте, а заменяется целиком при перечитывании.
+    """
+    table = metadata.get(table_name)
+    columns = table.get("columns") if isinstance(table, dict) else None
+    if not isinstance(columns, list):
+        return None
+    cached = _COLUMN_TYPES.get(id(columns))
+    if cached is not None and cached[0] is columns:
+        return cached[1]
+    if len(_COLUMN_TYPES) >= _COLUMN_TYPES_LIMIT:
+        _COLUMN_TYPES.clear()
+    types = {col["name"]: col["type"] for col in columns}
+    _COLUMN_TYPES[id(columns)] = (columns, types)
+    return types
+
+
 @handle_db_errors
 def list_tables(metadata: dict) -> None:
     """Вывести список всех таблиц."""
@@ -161,6 +277,41 @@ def _convert_value(value: str, expected_type: str):
     raise ValueError(f"Unsupported type '{expected_type}'")
 
 
+_INT64_RANGE = (-(2**63), 2**63 - 1)
+
+
+def check_storable(table: dict, values: Dict[str, Any]) -> None:
+    """Проверить, что значения столбцов можно записать в формате таблицы.
+
+    Колоночный формат хранит int как int64: большее значение иначе
+    обнаружилось бы только при сбросе таблицы на диск.
+    """
+    if table.get("format", FORMAT_JSON) != FORMAT_COLUMNAR:
+        return
+    low, high = _INT64_RANGE
+    types = {col["name"]: col["type"] for col in table.get("columns", [])}
+    for name, value in values.items():
+        if types.get(name) == "int" and isinstance(value, int):
+            if not low <= value <= high:
+                raise ValueError(f"{name}={value} не помещается в int64")
+
+
+def _next_id(table: dict, table_data) -> int:
+    """Следующий ID: счётчик из метаданных, но не меньше max(ID) + 1.
+
+    Второе условие страхует от счётчика, не сохранённого после сбоя,
+    и от таблиц, созданных до появления next_id.
+    """
+    if isinstance(table_data, Table):
+        max_id = table_data.max_id
+    else:
+        max_id = max(
+            (row.get("ID") for row in table_data if isinstance(row.get("ID"), int)),
+            default=0,
+        )
+    return max(table.get("next_id", 1), max_id + 1)
+
+
 @log_time
 @handle_db_errors
 def insert_row(
@@ -168,116 +319,243 @@ def insert_row(
     table_name: str,
     values: List[str],
     table_data: List[Dict[str, Any]],
+    changes: List[Dict[str, Any]] | None = None,
 ) -> List[Dict[str, Any]]:
-    """Добавить запись в таблицу (values — без ID)."""
-    columns = _get_columns(metadata, table_name)
-    if columns is None:
+    """Добавить запись в таблицу (values — без ID, строки или значения типов).
+
+    ID берётся из счётчика next_id в метаданных таблицы и не переиспользуется
+    после удалений. Если передан changes, в него дописывается запись журнала.
+    """
+    table = _get_table(metadata, table_name)
+    if table is None:
         return table_data
+    columns = table.get("columns", [])
 
     non_id_columns = [c for c in columns if c["name"] != "ID"]
 
     if len(values) != len(non_id_columns):
-        print(
+        report_error(
             "Некорректное количество значений. "
             f"Ожидается {len(non_id_columns)}, получено {len(values)}. "
             "Попробуйте снова.",
         )
         return table_data
 
-    existing_ids = [
-        row.get("ID")
-        for row in table_data
-        if isinstance(row.get("ID"), int)
-    ]
-    new_id = max(existing_ids) + 1 if existing_ids else 1
-
+    new_id = _next_id(table, table_data)
     new_row: Dict[str, Any] = {"ID": new_id}
 
-    for raw_value, col in zip(values, non_id_columns, strict=False):
-        new_row[col["name"]] = _convert_value(raw_value, col["type"])
-    
+    with phase("convert.insert"):
+        for raw_value, col in zip(values, non_id_columns, strict=False):
+            new_row[col["name"]] = _coerce_value(raw_value, col["type"])
+    try:
+        check_storable(table, new_row)
+    except ValueError as exc:
+        report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return table_data
+
     table_data.append(new_row)
+    table["next_id"] = new_id + 1
+    if changes is not None:
+        changes.append({"op": "insert", "row": dict(new_row)})
     print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')
 
     return table_data
 
 
-def _row_matches(row: Dict[str, Any], where_clause: Dict[str, Any] | None) -> bool:
+def _coerce_value(value: Any, expected_type: str) -> Any:
+    """Привести значение из импортируемого файла к типу столбца."""
+    if isinstance(value, str):
+        return _convert_value(value, expected_type)
+    if expected_type == "bool" and isinstance(value, bool):
+        return value
+    if expected_type == "int" and isinstance(value, int) and not isinstance(
+        value, bool
+    ):
+        return value
+    raise ValueError(f"Expected {expected_type}, got '{value}'")
+
+
+@handle_db_errors
+def insert_rows(
+    metadata: dict,
+    table_name: str,
+    rows: Iterable[List[str] | Dict[str, Any]],
+    table_data: List[Dict[str, Any]],
+    changes: List[Dict[str, Any]] | None = None,
+) -> List[Dict[str, Any]]:
+    """Добавить пачку записей за один проход.
+
+    rows — списки значений без ID (как в insert_row) или словари
+    столбец -> значение. Сначала преобразуются все записи пачки, и только
+    затем они добавляются: ошибка в одной записи не оставляет пачку
+    добавленной наполовину.
+    """
+    table = _get_table(metadata, table_name)
+    if table is None:
+        return table_data
+
+    non_id_columns = [c for c in table.get("columns", []) if c["name"] != "ID"]
+    names = [c["name"] for c in non_id_columns]
+    new_id = _next_id(table, table_data)
+    new_rows: List[Dict[str, Any]] = []
+
+    with phase("convert.insert"):
+        for number, values in enumerate(rows, start=1):
+            if isinstance(values, dict):
+                unknown = set(values) - set(names) - {"ID"}
+                if unknown:
+                    raise ValueError(
+                        f"запись {number}: неизвестные столбцы {sorted(unknown)}"
+                    )
+                values = [values.get(name) for name in names]
+            if len(values) != len(non_id_columns) or None in values:
+                raise ValueError(
+                    f"запись {number}: ожидается {len(non_id_columns)} значений"
+                )
+
+            new_row: Dict[str, Any] = {"ID": new_id}
+            for value, col in zip(values, non_id_columns, strict=False):
+                try:
+                    new_row[col["name"]] = _coerce_value(value, col["type"])
+                except ValueError as exc:
+                    raise ValueError(f"запись {number}: {exc}") from exc
+            try:
+                check_storable(table, new_row)
+            except ValueError as exc:
+                raise ValueError(f"запись {number}: {exc}") from exc
+            new_rows.append(new_row)
+            new_id += 1
+
+    for new_row in new_rows:
+        table_data.append(new_row)
+        if changes is not None:
+            changes.append({"op": "insert", "row": dict(new_row)})
+    table["next_id"] = new_id
+
+    print(f'Добавлено записей в таблицу "{table_name}": {len(new_rows)}.')
+    return table_data
+
+
+def _candidate_rows(
+    table_data: Iterable[dict[str, Any]],
+    where_clause: dict[str, Any] | Expr | None,
+    ids: Collection[int] | None,
+) -> Iterable[dict[str, Any]]:
+    """Строки-кандидаты: по первичному ключу, по найденным ID или вся таблица."""
+    if isinstance(table_data, Table):
+        by_id, row_id = equality_value(where_clause, "ID")
+        if by_id:
+            row = table_data.get(row_id)
+            return [row] if row is not None else []
+        if ids is not None:
+            return table_data.get_many(ids)
+    if ids is None:
+        return table_data
+    wanted = ids if isinstance(ids, (set, frozenset)) else set(ids)
+    return [row for row in table_data if row.get("ID") in wanted]
+
+
+def _matching_rows(
+    table_data: Iterable[dict[str, Any]],
+    where_clause: dict[str, Any] | Expr | None,
+    ids: Collection[int] | None,
+    parallel: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """Общий цикл select/update/delete: кандидаты + скомпилированный WHERE.
+
+    parallel разрешает полный просмотр большой таблицы в пуле процессов
+    (см. parallel.py); его используют те, кому нужен весь результат сразу.
+    """
+    candidates = _candidate_rows(table_data, where_clause, ids)
     if not where_clause:
-        return True
-    for key, expected in where_clause.items():
-        if row.get(key) != expected:
-            return False
-    return True
+        return iter(candidates)
+    if parallel and candidates is table_data:
+        matched = parallel_matching_rows(table_data, where_clause)
+        if matched is not None:
+            return iter(matched)
+    return filter(compile_where(where_clause), candidates)
 
 
 @log_time
 @handle_db_errors
+@timed("scan.select")
 def select_rows(
     table_data: list[dict[str, Any]],
-    where_clause: dict[str, Any] | None = None,
+    where_clause: dict[str, Any] | Expr | None = None,
+    ids: Collection[int] | None = None,
 ) -> list[dict[str, Any]]:
     if not where_clause:
         return table_data
 
-    result: list[dict[str, Any]] = []
-    for row in table_data:
-        ok = True
-        for key, value in where_clause.items():
-            if row.get(key) != value:
-                ok = False
-                break
-        if ok:
-            result.append(row)
-    return result
+    return list(_matching_rows(table_data, where_clause, ids, parallel=True))
+
+
+def iter_rows(
+    table_data: Iterable[dict[str, Any]],
+    where_clause: dict[str, Any] | Expr | None = None,
+    ids: Collection[int] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Лениво выдавать строки, подходящие под where_clause.
+
+    Результат не собирается в список: подходит для постраничного вывода
+    и экспорта больших таблиц.
+    """
+    yield from _matching_rows(table_data, where_clause, ids)
 
 
 @confirm_action("удаление записей")
 @handle_db_errors
+@timed("scan.delete")
 def delete_rows(
     table_data: list[dict[str, Any]],
-    where_clause: dict[str, Any],
-) -> tuple[list[dict[str, Any]], int]:
-    new_data: list[dict[str, Any]] = []
-    deleted = 0
+    where_clause: dict[str, Any] | Expr,
+    changes: list[dict[str, Any]] | None = None,
+    ids: Collection[int] | None = None,
+) -> tuple[Table, int]:
+    if not isinstance(table_data, Table):
+        table_data = Table(table_data)
+
+    matched = list(_matching_rows(table_data, where_clause, ids, parallel=True))
 
-    for row in table_data:
-        ok = True
-        for k, v in where_clause.items():
-            if row.get(k) != v:
-                ok = False
-                break
-        if ok:
-            deleted += 1
-        else:
-            new_data.append(row)
+    for row in matched:
+        table_data.remove(row.get("ID"))
+        if changes is not None:
+            changes.append({"op": "delete", "ID": row.get("ID"), "row": to_dict(row)})
 
-    return new_data, deleted
+    return table_data, len(matched)
 
 
 @handle_db_errors
-def update_rows(table_data: list[dict], set_clause: dict, where_clause: dict):
+@timed("scan.update")
+def update_rows(
+    table_data: list[dict],
+    set_clause: dict,
+    where_clause: dict | Expr,
+    changes: list[dict] | None = None,
+    ids: Collection[int] | None = None,
+):
     """
     Обновляет строки по where_clause, применяя set_clause.
     Возвращает (новые_данные, количество_обновлённых).
+    Если передан changes, в него дописываются записи журнала.
+    ids — кандидаты из индекса или столбцов: остальные строки не проверяются.
     """
+    assignments = {k: v for k, v in set_clause.items() if k != "ID"}
     updated = 0
 
-    def match(row: dict) -> bool:
-        if not where_clause:
-            return True
-        for k, v in where_clause.items():
-            if row.get(k) != v:
-                return False
-        return True
-
-    for row in table_data:
-        if match(row):
-            for k, v in set_clause.items():
-                if k == "ID":
-                    continue  # ID нельзя менять
-                row[k] = v
-            updated += 1
+    for row in _matching_rows(table_data, where_clause, ids, parallel=True):
+        old = {k: row.get(k) for k in assignments}
+        row.update(assignments)  # ID нельзя менять
+        updated += 1
+        if changes is not None:
+            changes.append(
+                {
+                    "op": "update",
+                    "ID": row.get("ID"),
+                    "set": assignments,
+                    "old": old,
+                }
+            )
 
     return table_data, updated
 
@@ -288,7 +566,7 @@ def table_info(metadata: dict, table_name: str, table_data: list[dict]):
     Печатает информацию о таблице: имя, столбцы, количество записей.
     """
     if table_name not in metadata:
-        print(f'Таблица "{table_name}" не найдена.')
+        report_error(f'Таблица "{table_name}" не найдена.')
         return
 
     cols = metadata[table_name]["columns"]
@@ -298,3 +576,12 @@ def table_info(metadata: dict, table_name: str, table_data: list[dict]):
     print(f"Столбцы: {cols_str}")
     print(f"Количество записей: {len(table_data)}")
 
+    table = metadata[table_name]
+    fmt = table.get("format", FORMAT_JSON)
+    print(f"Формат: {fmt}, режим хранения: {table.get('storage', STORAGE_JSON)}")
+
+    indexes = metadata[table_name].get("indexes", {})
+    if indexes:
+        idx_str = ", ".join(f"{col} ({kind})" for col, kind in indexes.items())
+        print(f"Индексы: {idx_str}")
+
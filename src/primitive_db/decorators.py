@@ -1,6 +1,10 @@
 import time
+from collections import OrderedDict
 from typing import Any, Callable
 
+from .constants import SELECT_CACHE_ENTRIES, SELECT_CACHE_ROWS
+from .errors import CorruptedFileError
+
 
 def _wraps(original):
     def decorator(wrapper):
@@ -11,38 +15,75 @@ def _wraps(original):
     return decorator
 
 
+# Первая ошибка с прошлого take_error(): консоль сообщения только печатает,
+# а сервер по ней отвечает ok=false.
+_command_error: str | None = None
+
+
+def report_error(message: str) -> None:
+    """Напечатать сообщение об ошибке команды и запомнить его."""
+    global _command_error
+    if _command_error is None:
+        _command_error = message
+    print(message)
+
+
+def take_error() -> str | None:
+    """Вернуть запомненную ошибку и забыть её."""
+    global _command_error
+    error, _command_error = _command_error, None
+    return error
+
+
 def handle_db_errors(func):
     @_wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except CorruptedFileError as e:
+            report_error(f"Ошибка: {e}.")
         except FileNotFoundError:
-            print(
+            report_error(
                 "Ошибка: Файл данных не найден."
                 "Возможно, база данных не инициализирована."
             )
         except KeyError as e:
-            print(f"Ошибка: Таблица или столбец {e} не найден.")
+            report_error(f"Ошибка: Таблица или столбец {e} не найден.")
         except ValueError as e:
-            print(f"Ошибка валидации: {e}")
+            report_error(f"Ошибка валидации: {e}")
         except Exception as e:
-            print(f"Произошла непредвиденная ошибка: {e}")
+            report_error(f"Произошла непредвиденная ошибка: {e}")
 
         # ВАЖНО: безопасный возврат вместо None
         if func.__name__ in {"delete_rows", "update_rows"}:
             return args[0], 0
+        if func.__name__ in {"insert_row", "insert_rows"}:
+            return args[3] if len(args) > 3 else kwargs.get("table_data")
         return args[0] if args else None
 
     return wrapper
 
 
+# Ответ на подтверждения без вопроса пользователю: None — спросить через
+# input(), True/False — подтвердить или отклонить (сервер, пакетный режим).
+_confirm_policy: bool | None = None
+
+
+def set_confirm_policy(answer: bool | None) -> None:
+    global _confirm_policy
+    _confirm_policy = answer
+
+
 def confirm_action(action_name: str):
     def decorator(func):
         @_wraps(func)
         def wrapper(*args, **kwargs):
-            answer = input(
-                f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
-            ).strip().lower()
+            if _confirm_policy is None:
+                answer = input(
+                    f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
+                ).strip().lower()
+            else:
+                answer = "y" if _confirm_policy else "n"
 
             if answer != "y":
                 print("Операция отменена.")
@@ -57,34 +98,163 @@ def confirm_action(action_name: str):
     return decorator
 
 
+TIMING_PRINT = "print"
+TIMING_SUMMARY = "summary"
+TIMING_OFF = "off"
+
+# Режим log_time: печатать время каждого вызова, копить его в
+# timing_stats для итоговой сводки или не замерять вовсе.
+_timing_mode = TIMING_PRINT
+# имя функции -> [число вызовов, суммарное время в секундах]
+timing_stats: dict[str, list] = {}
+
+
+def set_timing_mode(mode: str) -> None:
+    global _timing_mode
+    _timing_mode = mode
+
+
 def log_time(func):
     @_wraps(func)
     def wrapper(*args, **kwargs):
+        if _timing_mode == TIMING_OFF:
+            return func(*args, **kwargs)
+
         start = time.monotonic()
         result = func(*args, **kwargs)
         end = time.monotonic()
 
         duration = end - start
-        print(
-            f'Функция {func.__name__} выполнилась за {duration:.3f} секунд.'
-        )
+        if _timing_mode == TIMING_SUMMARY:
+            stats = timing_stats.setdefault(func.__name__, [0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+        else:
+            print(
+                f'Функция {func.__name__} выполнилась за {duration:.3f} секунд.'
+            )
 
         return result
     return wrapper
 
 
-def create_cacher():
-    cache: dict[Any, Any] = {}
+def create_cacher(
+    max_entries: int = SELECT_CACHE_ENTRIES,
+    max_rows: int = SELECT_CACHE_ROWS,
+    freeze: Callable[[Any], Any] | None = None,
+):
+    """Кэш результатов с вытеснением давно не использованных (LRU).
 
-    def cache_result(key: Any, value_func: Callable[[], Any]):
+    Ключ — кортеж, первый элемент которого имя таблицы: записи каждой
+    таблицы сбрасываются (invalidate) или исправляются (patch) отдельно.
+    Бюджет задаётся числом записей и суммарным числом строк в результатах.
+    freeze превращает результат в неизменяемый снимок перед сохранением.
+    """
+    cache: OrderedDict[Any, tuple[Any, int]] = OrderedDict()
+    by_table: dict[Any, set] = {}
+    versions: dict[Any, int] = {}
+    stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    total = {"rows": 0}
+
+    def scope(key: Any) -> Any:
+        return key[0] if isinstance(key, tuple) and key else None
+
+    def cost(value: Any) -> int:
+        try:
+            return len(value)
+        except TypeError:
+            return 1
+
+    def discard(key: Any) -> None:
+        _, size = cache.pop(key)
+        total["rows"] -= size
+        keys = by_table.get(scope(key))
+        if keys is not None:
+            keys.discard(key)
+
+    def store(key: Any, value: Any) -> Any:
+        size = cost(value)
+        if size > max_rows:
+            return value
+        if freeze is not None:
+            value = freeze(value)
         if key in cache:
-            return cache[key]
-        value = value_func()
-        cache[key] = value
+            discard(key)
+        cache[key] = (value, size)
+        total["rows"] += size
+        by_table.setdefault(scope(key), set()).add(key)
+        while len(cache) > max_entries or total["rows"] > max_rows:
+            discard(next(iter(cache)))
+            stats["evictions"] += 1
         return value
 
+    def cache_result(key: Any, value_func: Callable[[], Any]):
+        if key in cache:
+            stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key][0]
+        stats["misses"] += 1
+        return store(key, value_func())
+
+    def put(key: Any, value: Any) -> None:
+        """Положить готовый результат (например, прочитанный с диска)."""
+        store(key, value)
+
+    def entries(table: Any) -> list[tuple[Any, Any]]:
+        return [(key, cache[key][0]) for key in by_table.get(table, ())]
+
+    def tables() -> list[Any]:
+        return [table for table, keys in by_table.items() if keys]
+
+    def invalidate(table: Any) -> None:
+        """Сбросить результаты одной таблицы и увеличить её версию."""
+        versions[table] = versions.get(table, 0) + 1
+        for key in list(by_table.pop(table, ())):
+            discard(key)
+            stats["invalidations"] += 1
+
+    def patch(table: Any, update: Callable[[Any, Any], Any]) -> None:
+        """Исправить результаты таблицы: update(key, value) -> новое значение.
+
+        Если update вернул None, результат сбрасывается.
+        """
+        versions[table] = versions.get(table, 0) + 1
+        for key in list(by_table.get(table, ())):
+            value = update(key, cache[key][0])
+            if value is None:
+                discard(key)
+                stats["invalidations"] += 1
+                continue
+            size = cost(value)
+            total["rows"] += size - cache[key][1]
+            cache[key] = (value, size)
+        while total["rows"] > max_rows and cache:
+            discard(next(iter(cache)))
+            stats["evictions"] += 1
+
+    def version(table: Any) -> int:
+        return versions.get(table, 0)
+
     def clear():
         cache.clear()
+        by_table.clear()
+        total["rows"] = 0
+
+    def info() -> dict[str, int]:
+        return {
+            "entries": len(cache),
+            "max_entries": max_entries,
+            "rows": total["rows"],
+            "max_rows": max_rows,
+            **stats,
+        }
 
     cache_result.clear = clear  # <- прикрепляем метод к функции
-    return cache_result
\ No newline at end of file
+    cache_result.invalidate = invalidate
+    cache_result.patch = patch
+    cache_result.put = put
+    cache_result.entries = entries
+    cache_result.tables = tables
+    cache_result.version = version
+    cache_result.info = info
+    return cache_result
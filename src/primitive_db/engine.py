@@ -1,29 +1,106 @@
+import re
 import shlex
+import time
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Collection, Iterable, Sequence
 
 from prettytable import PrettyTable
 
-from .constants import META_FILE
+from .aggregate import aggregate_from_stats, parse_aggregate, run_aggregate
+from .cache import (
+    cached_select,
+    invalidate_select_cache,
+    patch_select_cache,
+    print_cache_info,
+    save_select_cache,
+)
+from .constants import (
+    DURABILITY_LEVELS,
+    FORMAT_JSON,
+    FORMATS,
+    IMPORT_CHUNK_SIZE,
+    INDEX_HASH,
+    PAGE_SIZE,
+    PROFILE_FILE,
+    STATEMENT_CACHE_SIZE,
+    STORAGE_JSON,
+    STORAGE_LOG,
+)
 from .core import (
-    _convert_value,
+    _coerce_value,
+    check_storable,
+    column_types,
+    create_index,
     create_table,
     delete_rows,
+    drop_index,
     drop_table,
     insert_row,
+    insert_rows,
+    iter_rows,
     list_tables,
     select_rows,
     table_info,
     update_rows,
 )
-from .decorators import create_cacher
-from .utils import (
-    delete_table_data_file,
-    load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
+from .decorators import report_error
+from .errors import CorruptedFileError, LockTimeoutError
+from .index import table_indexes
+from .join import execute_join, parse_join
+from .metrics import (
+    enable_metrics,
+    phase,
+    print_metrics,
+    profile_call,
+    reset_metrics,
+    timed,
+    to_json,
+    to_prometheus,
+)
+from .parser import (
+    Expr,
+    Insert,
+    Select,
+    Statement,
+    Update,
+    bind_expression,
+    bind_statement,
+    parse_condition,
+    parse_statement,
+    split_paging,
+)
+from .planner import analyze_table, plan_query, print_plan
+from .store import TableStore
+from .utils import read_import_chunks, write_export
+from .vector import enable_vector, numpy_available, vector_enabled
+
+# Команды консоли (для имён метрик command.<имя>).
+_COMMANDS = {
+    "help", "cache_info", "metrics", "begin", "commit", "rollback",
+    "durability", "list_tables", "create_table", "compact", "convert",
+    "drop_table", "create_index", "drop_index", "insert", "import", "export",
+    "select", "update", "delete", "info", "analyze", "explain", "vector",
+}
+
+# Разобранные шаблоны insert/select/update/delete и условий where:
+# повторная команда (или та же с другими значениями `?`) не разбирается
+# заново, значения подставляются и приводятся к типам при выполнении.
+_prepare = lru_cache(maxsize=STATEMENT_CACHE_SIZE)(parse_statement)
+_condition = lru_cache(maxsize=STATEMENT_CACHE_SIZE)(parse_condition)
+
+# Команды, которые пишут на диск сразу и не могут быть частью транзакции.
+_NO_TRANSACTION_COMMANDS = {"compact", "convert", "durability"}
+
+_EXPLAIN_RE = re.compile(
+    r"^explain\s+select\s+from\s+(?P<table>\S+)(?:\s+where\s+(?P<where>.+?))?\s*$",
+    re.IGNORECASE,
+)
+_EXPORT_RE = re.compile(
+    r"^export\s+(?P<table>\S+)(?:\s+where\s+(?P<where>.+?))?"
+    r"\s+to\s+(?P<path>\S+)\s*$",
+    re.IGNORECASE,
 )
-
-_select_cache = create_cacher()
 
 
 def print_help() -> None:
@@ -37,6 +114,14 @@ def print_help() -> None:
         "<command> select from <имя_таблицы> where <столбец> = <значение> - прочитать"
     )
     print("<command> select from <имя_таблицы> - прочитать все записи")
+    print(
+        "<command> select from <имя_таблицы> where <условие> - условие с "
+        "=, !=, <, <=, >, >=, in (...), and, or и скобками"
+    )
+    print(
+        "<command> select from <имя_таблицы> [where ...] limit <N> [offset <M>] "
+        "- прочитать часть записей"
+    )
     print(
         "<command> update <имя_таблицы> set <столбец> = <значение> where <столбец> = "
         "<значение> - обновить записи"
@@ -45,9 +130,73 @@ def print_help() -> None:
         "<command> delete from <имя_таблицы> where <столбец> = <значение> - "
         "удалить записи"
     )
+    print(
+        "<command> select count(*), sum|avg|min|max(<столбец>) from <имя_таблицы> "
+        "[where ...] [group by <столбец>] - агрегаты"
+    )
+    print(
+        "<command> select from <таблица> join <таблица> on <a.столбец> = "
+        "<b.столбец> [where ...] - соединить таблицы"
+    )
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
+    print(
+        "<command> analyze <имя_таблицы> - собрать статистику по столбцам "
+        "для планировщика"
+    )
+    print(
+        "<command> explain select from <имя_таблицы> [where ...] "
+        "- показать план запроса, оценку и фактический результат"
+    )
+    print(
+        "<command> import <имя_таблицы> <файл.csv|файл.jsonl> "
+        "- загрузить записи из файла"
+    )
+    print(
+        "<command> export <имя_таблицы> [where ...] to <файл.csv|файл.jsonl> "
+        "- выгрузить записи в файл"
+    )
     print("\nКоманды управления таблицами:")
     print("<command> create_table <имя_таблицы> <столбец1:тип> .. - создать таблицу")
+    print(
+        "<command> create_table <имя_таблицы> <столбец1:тип> .. --storage=log "
+        "- создать таблицу с журналом изменений"
+    )
+    print(
+        "<command> create_table <имя_таблицы> <столбец1:тип> .. --format=columnar "
+        "- создать таблицу в колоночном бинарном формате"
+    )
+    print("<command> compact <имя_таблицы> - свернуть журнал таблицы в снимок")
+    print(
+        "<command> convert <имя_таблицы> <json|columnar> "
+        "- перевести таблицу в другой формат"
+    )
+    print(
+        "<command> create_index <имя_таблицы> <столбец> [hash|sorted] "
+        "- создать индекс по столбцу"
+    )
+    print("<command> drop_index <имя_таблицы> <столбец> - удалить индекс")
+    print("<command> begin - начать транзакцию")
+    print(
+        "<command> commit - зафиксировать транзакцию или записать изменения на диск"
+    )
+    print("<command> rollback - отменить транзакцию")
+    print("<command> cache_info - статистика кэша select")
+    print(
+        "<command> vector [on|off] "
+        "- векторное выполнение условий по столбцам таблицы"
+    )
+    print(
+        "<command> metrics [on|off|reset|json [файл]|prometheus [файл]] "
+        "- время выполнения по фазам"
+    )
+    print(
+        "<command> profile <команда> - выполнить команду под cProfile "
+        f"(профиль в {PROFILE_FILE})"
+    )
+    print(
+        "<command> durability [full|group|off] "
+        "- показать или задать надёжность записи"
+    )
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
     print("\nОбщие команды:")
@@ -55,267 +204,685 @@ def print_help() -> None:
     print("<command> help - справочная информация\n")
 
 
-def _print_rows(rows: list[dict]) -> None:
-    if not rows:
-        print("(пусто)")
-        return
-
-    fields = list(rows[0].keys())
-    t = PrettyTable()
-    t.field_names = fields
-    for row in rows:
-        t.add_row([row.get(f) for f in fields])
-    print(t)
-
-
-def _schema_type(metadata: dict, table_name: str, col: str) -> str | None:
-    table = metadata.get(table_name)
-    if not isinstance(table, dict):
-        return None
-    cols = table.get("columns", [])
-    if not isinstance(cols, list):
+def _split_options(tokens: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Отделить опции вида --key=value от позиционных аргументов."""
+    args: list[str] = []
+    options: dict[str, str] = {}
+    for tok in tokens:
+        if tok.startswith("--") and "=" in tok:
+            key, value = tok[2:].split("=", 1)
+            options[key.lower()] = value
+        else:
+            args.append(tok)
+    return args, options
+
+
+def _index_candidates(
+    store: TableStore,
+    table_name: str,
+    where_clause: Expr | None,
+) -> Collection[int] | None:
+    """ID строк-кандидатов по индексам или столбцам таблицы или None.
+
+    None — полный просмотр. Брать ли индекс или векторное выполнение,
+    решает планировщик (см. planner.plan_query).
+    """
+    if not where_clause:
         return None
-    for c in cols:
-        if c.get("name") == col:
-            return c.get("type")
-    return None
-
-
-def parse_clause(text: str, metadata: dict, table_name: str) -> dict | None:
-    if "=" not in text:
-        print(f"Некорректное значение: {text}. Попробуйте снова.")
+    if not vector_enabled() and not table_indexes(store.metadata, table_name):
         return None
+    return plan_query(store, table_name, where_clause).ids
 
-    col, raw = text.split("=", 1)
-    col = col.strip()
-    raw = raw.strip()
 
-    col_type = _schema_type(metadata, table_name, col)
-    if col_type is None:
-        print(f"Некорректное значение: {col}. Попробуйте снова.")
-        return None
+def _import_file(store: TableStore, table_name: str, path: str) -> int:
+    """Загрузить файл пачками; вернуть число добавленных записей."""
+    store.lock_for_write(table_name)
+    table_data = store.table(table_name)
+    imported = 0
 
     try:
-        value = _convert_value(raw, col_type)
-    except Exception:
-        print(f"Некорректное значение: {raw}. Попробуйте снова.")
-        return None
-
-    return {col: value}
-
-
-def parse_set_clause(text: str, metadata: dict, table_name: str) -> dict | None:
-    parts = [p.strip() for p in text.split(",") if p.strip()]
-    result: dict = {}
-    for p in parts:
-        one = parse_clause(p, metadata, table_name)
-        if one is None:
-            return None
-        result.update(one)
-    return result
-
-
-def parse_where_clause(text: str, metadata: dict, table_name: str) -> dict | None:
-    tokens = text.split()
-    parts: list[str] = []
-    buf: list[str] = []
-
-    for tok in tokens:
-        if tok.lower() == "and":
-            if buf:
-                parts.append(" ".join(buf).strip())
-                buf = []
-            continue
-        buf.append(tok)
-
-    if buf:
-        parts.append(" ".join(buf).strip())
-
-    result: dict = {}
-    for p in parts:
-        one = parse_clause(p, metadata, table_name)
-        if one is None:
-            return None
-        result.update(one)
-    return result
-
-
-def run() -> None:
-    print("\n***База данных***")
-    print_help()
-
-    while True:
-        metadata = load_metadata(META_FILE)
-
-        user_input = input("Введите команду: ").strip()
-        if not user_input:
-            continue
-
-        tokens = shlex.split(user_input)
-        cmd = tokens[0].lower()
-
-        if cmd == "exit":
-            break
-
-        if cmd == "help":
-            print_help()
-            continue
-
-        if cmd == "list_tables":
-            list_tables(metadata)
-            continue
-
-        if cmd == "create_table":
-            if len(tokens) < 3:
-                print(
-                    "Некорректное значение: недостаточно аргументов. "
-                    "Попробуйте снова."
-                )
-                continue
-            table_name = tokens[1]
-            columns = tokens[2:]
-            metadata = create_table(metadata, table_name, columns)
-            save_metadata(META_FILE, metadata)
-            continue
-
-        if cmd == "drop_table":
-            if len(tokens) < 2:
-                print(
-                    "Некорректное значение: отсутствует имя таблицы. "
-                    "Попробуйте снова."
-                )
-                continue
-            table_name = tokens[1]
-            metadata = drop_table(metadata, table_name)
-            save_metadata(META_FILE, metadata)
-            delete_table_data_file(table_name)
-
-            _select_cache.clear()
-
-            continue
+        for chunk in read_import_chunks(path, IMPORT_CHUNK_SIZE):
+            changes: list[dict] = []
+            insert_rows(store.metadata, table_name, chunk, table_data, changes=changes)
+            if not changes:
+                break
+            imported += len(changes)
+            store.record(table_name, changes)
+            patch_select_cache(store, table_name, changes)
+            store.mark_metadata_dirty()
+            # журнал сбрасываем по пачкам, чтобы не копить его в памяти
+            if store.storage(table_name) == STORAGE_LOG:
+                store.flush(table_name)
+    except (OSError, ValueError) as exc:
+        report_error(f"Ошибка импорта: {exc}")
+
+    store.flush(table_name)
+    return imported
+
+
+def _print_page(fields: list[str], page: list[list]) -> None:
+    t = PrettyTable()
+    t.field_names = fields
+    for values in page:
+        t.add_row(values)
+    print(t)
 
-        # insert into <table> values (...)
-        if cmd == "insert" and len(tokens) >= 4 and tokens[1].lower() == "into":
-            table_name = tokens[2]
-            lower_input = user_input.lower()
-            idx_values = lower_input.find("values")
-            if idx_values == -1:
-                print(
-                    "Некорректное значение: отсутствует ключевое слово values. "
-                    "Попробуйте снова."
-                )
-                continue
 
-            values_str = user_input[idx_values + len("values") :].strip()
-            if values_str.startswith("(") and values_str.endswith(")"):
-                values_str = values_str[1:-1].strip()
+@timed("render")
+def _print_rows(rows: Iterable[dict], page_size: int = PAGE_SIZE) -> None:
+    """Печатать строки постранично по мере их получения.
 
-            raw_values = [v.strip() for v in values_str.split(",") if v.strip()]
+    В памяти держится только текущая страница, поэтому вывод большого
+    результата начинается сразу (ленивый просмотр строк входит в render).
+    """
+    fields: list[str] | None = None
+    page: list[list] = []
 
-            table_data = load_table_data(table_name)
-            table_data = insert_row(metadata, table_name, raw_values, table_data)
-            save_table_data(table_name, table_data)
+    for row in rows:
+        if fields is None:
+            fields = list(row.keys())
+        page.append([row.get(f) for f in fields])
+        if len(page) >= page_size:
+            _print_page(fields, page)
+            page = []
+
+    if fields is None:
+        print("(пусто)")
+        return
+    if page:
+        _print_page(fields, page)
 
-            _select_cache.clear()
 
-            continue
+def _export(store: TableStore, user_input: str) -> None:
+    match = _EXPORT_RE.match(user_input)
+    if match is None:
+        report_error("Некорректное значение. Попробуйте снова.")
+        return
 
-        # select from <table> [where col = value]
-        if cmd == "select" and len(tokens) >= 3 and tokens[1].lower() == "from":
-            table_name = tokens[2]
-            table_data = load_table_data(table_name)
+    table_name = match.group("table")
+    metadata = store.metadata
+    if table_name not in metadata:
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
-            lower_input = user_input.lower()
-            idx_where = lower_input.find("where")
+    where_clause = None
+    if match.group("where"):
+        where_clause = parse_where_clause(match.group("where"), metadata, table_name)
+        if where_clause is None:
+            return
+
+    path = match.group("path").strip("\"'")
+    columns = [c["name"] for c in metadata[table_name]["columns"]]
+    rows = iter_rows(
+        store.reader(table_name),
+        where_clause,
+        _index_candidates(store, table_name, where_clause),
+    )
+    try:
+        count = write_export(path, columns, rows)
+    except (OSError, ValueError) as exc:
+        report_error(f"Ошибка экспорта: {exc}")
+        return
+    print(f'Выгружено записей из таблицы "{table_name}" в {path}: {count}.')
 
-            if idx_where == -1:
-                cache_key = (table_name, None)
-                rows = _select_cache(cache_key, lambda: select_rows(table_data))
-                _print_rows(rows)
-                continue
 
-            where_text = user_input[idx_where + len("where") :].strip()
+def _aggregate(
+    store: TableStore,
+    user_input: str,
+    show_rows: Callable[[Iterable], None],
+) -> None:
+    metadata = store.metadata
+    try:
+        query = parse_aggregate(user_input, metadata)
+    except KeyError as exc:
+        report_error(f'Ошибка: Таблица "{exc.args[0]}" не существует.')
+        return
+    except ValueError as exc:
+        report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return
 
-            # поддержка AND (несколько условий) для select
-            where_clause = parse_where_clause(where_text, metadata, table_name)
+    result = aggregate_from_stats(query, metadata[query.table])
+    if result is None:
+        where_clause = None
+        if query.where:
+            where_clause = parse_where_clause(query.where, metadata, query.table)
             if where_clause is None:
-                continue
-
-            # ключ для кэша должен быть хешируемым
-            where_key = tuple(sorted(where_clause.items()))
-            cache_key = (table_name, where_key)
-
-            rows = _select_cache(
-                cache_key,
-                lambda: select_rows(table_data, where_clause),
-            )
-            _print_rows(rows)
-            continue
-
+                return
+        rows = iter_rows(
+            store.reader(query.table),
+            where_clause,
+            _index_candidates(store, query.table, where_clause),
+        )
+        result = run_aggregate(query, rows)
+    show_rows(result)
+
+
+def _join(
+    store: TableStore,
+    user_input: str,
+    show_rows: Callable[[Iterable], None],
+) -> None:
+    try:
+        text, limit, offset = split_paging(user_input)
+        query = parse_join(text, store.metadata)
+    except KeyError as exc:
+        report_error(f'Ошибка: Таблица "{exc.args[0]}" не существует.')
+        return
+    except ValueError as exc:
+        report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return
 
-        # update <table> set col = val where col = val
-        if cmd == "update" and len(tokens) >= 2:
-            table_name = tokens[1]
-            lower_input = user_input.lower()
+    rows = execute_join(store, query)
+    offset = offset or 0
+    stop = offset + limit if limit is not None else None
+    show_rows(islice(rows, offset, stop))
 
-            idx_set = lower_input.find(" set ")
-            idx_where = lower_input.find(" where ")
 
-            if idx_set == -1 or idx_where == -1 or idx_where < idx_set:
-                print("Некорректное значение. Попробуйте снова.")
-                continue
+def _explain(store: TableStore, user_input: str) -> None:
+    """explain select from <table> [where ...]: план, оценка и факт."""
+    match = _EXPLAIN_RE.match(user_input)
+    if match is None:
+        report_error(
+            "Некорректное значение: explain select from <имя_таблицы> "
+            "[where ...]. Попробуйте снова."
+        )
+        return
+    table_name = match.group("table")
+    metadata = store.metadata
+    if table_name not in metadata:
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
-            set_text = user_input[idx_set + len(" set ") : idx_where].strip()
-            where_text = user_input[idx_where + len(" where ") :].strip()
+    where_clause = None
+    if match.group("where"):
+        where_clause = parse_where_clause(match.group("where"), metadata, table_name)
+        if where_clause is None:
+            return
+
+    # кэш select не используется: замеряется само выполнение
+    start = time.perf_counter()
+    plan = plan_query(store, table_name, where_clause)
+    planned = time.perf_counter()
+    rows = select_rows(store.reader(table_name), where_clause, plan.ids)
+    done = time.perf_counter()
+    print_plan(plan, len(rows), planned - start, done - planned)
+
+
+def _run_statement(
+    store: TableStore,
+    statement: Statement,
+    params: Sequence[Any],
+    show_rows: Callable[[Iterable], None],
+) -> None:
+    """Выполнить insert/select/update/delete по разобранному шаблону."""
+    metadata = store.metadata
+    table_name = statement.table
+    types = column_types(metadata, table_name)
+    if types is None:
+        report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+    try:
+        statement = bind_statement(statement, types, _coerce_value, params)
+    except ValueError as exc:
+        report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return
 
-            set_clause = parse_set_clause(set_text, metadata, table_name)
-            where_clause = parse_where_clause(where_text, metadata, table_name)
-            if set_clause is None or where_clause is None:
-                continue
+    if isinstance(statement, Insert):
+        store.lock_for_write(table_name)
+        table_data = store.table(table_name)
+        changes: list[dict] = []
+        insert_row(
+            metadata, table_name, list(statement.values), table_data, changes=changes
+        )
+        store.record(table_name, changes)
+        if changes:
+            store.mark_metadata_dirty()
+        patch_select_cache(store, table_name, changes)
+        return
 
-            table_data = load_table_data(table_name)
-            table_data, updated = update_rows(table_data, set_clause, where_clause)
-            save_table_data(table_name, table_data)
+    where_clause = statement.where
+    if isinstance(statement, Select):
+        table_data = store.reader(table_name)
+        limit, offset = statement.limit, statement.offset or 0
+        if limit is not None or offset:
+            rows = iter_rows(
+                table_data,
+                where_clause,
+                _index_candidates(store, table_name, where_clause),
+            )
+            stop = offset + limit if limit is not None else None
+            show_rows(islice(rows, offset, stop))
+            return
+        # дерево условия — неизменяемые кортежи, годится как ключ кэша
+        show_rows(
+            cached_select(
+                store,
+                table_name,
+                where_clause,
+                lambda: select_rows(
+                    table_data,
+                    where_clause,
+                    _index_candidates(store, table_name, where_clause),
+                ),
+            )
+        )
+        return
 
-            _select_cache.clear()
+    if isinstance(statement, Update):
+        try:
+            check_storable(metadata[table_name], dict(statement.assignments))
+        except ValueError as exc:
+            report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+            return
+
+    store.lock_for_write(table_name)
+    table_data = store.table(table_name)
+    ids = _index_candidates(store, table_name, where_clause)
+    changes = []
+    if isinstance(statement, Update):
+        table_data, updated = update_rows(
+            table_data,
+            dict(statement.assignments),
+            where_clause,
+            changes=changes,
+            ids=ids,
+        )
+    else:
+        table_data, deleted = delete_rows(
+            table_data, where_clause, changes=changes, ids=ids
+        )
+    store.record(table_name, changes)
+    patch_select_cache(store, table_name, changes)
+
+    if isinstance(statement, Update):
+        if updated > 0:
+            print(f'Записи в таблице "{table_name}" успешно обновлены.')
+        else:
+            print("Подходящие записи не найдены.")
+    elif deleted > 0:
+        print(f'Записи успешно удалены из таблицы "{table_name}".')
+    else:
+        print("Подходящие записи не найдены.")
+
+
+@timed("parse.where")
+def parse_where_clause(text: str, metadata: dict, table_name: str) -> Expr | None:
+    """Разобрать WHERE (=, !=, <, <=, >, >=, IN, AND, OR, скобки) в дерево."""
+    types = column_types(metadata, table_name) or {}
+    try:
+        return bind_expression(_condition(text), types, _coerce_value)
+    except ValueError as exc:
+        report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return None
 
-            if updated > 0:
-                print(f'Записи в таблице "{table_name}" успешно обновлены.')
-            else:
-                print("Подходящие записи не найдены.")
-            continue
 
-        # delete from <table> where col = val
-        if cmd == "delete" and len(tokens) >= 4 and tokens[1].lower() == "from":
-            table_name = tokens[2]
-            lower_input = user_input.lower()
-            idx_where = lower_input.find("where")
-            if idx_where == -1:
-                print("Некорректное значение: отсутствует where. Попробуйте снова.")
-                continue
-
-            where_text = user_input[idx_where + len("where") :].strip()
-            where_clause = parse_where_clause(where_text, metadata, table_name)
-            if where_clause is None:
-                continue
+def run() -> None:
+    print("\n***База данных***")
+    print_help()
 
-            table_data = load_table_data(table_name)
-            table_data, deleted = delete_rows(table_data, where_clause)
-            save_table_data(table_name, table_data)
+    store = TableStore()
+    if store.recover():
+        print("Восстановлена транзакция, прерванная при фиксации.")
+    try:
+        _loop(store)
+    finally:
+        store.close()
+        save_select_cache(store)
 
-            _select_cache.clear()
 
-            if deleted > 0:
-                print(f'Записи успешно удалены из таблицы "{table_name}".')
-            else:
-                print("Подходящие записи не найдены.")
-            continue
+def _loop(store: TableStore) -> None:
+    while True:
+        try:
+            store.maybe_flush()
+        except LockTimeoutError as exc:
+            print(f"Ошибка: {exc}. Изменения будут записаны позже.")
 
-        # info <table>
-        if cmd == "info" and len(tokens) >= 2:
-            table_name = tokens[1]
-            table_data = load_table_data(table_name)
-            table_info(metadata, table_name, table_data)
+        user_input = input("Введите команду: ").strip()
+        if not user_input:
             continue
 
-        print(f"Функции {cmd} нет. Попробуйте снова.")
\ No newline at end of file
+        try:
+            if not _execute(store, user_input):
+                break
+        except CorruptedFileError as exc:
+            print(f"Ошибка: {exc}. Восстановите файл из резервной копии.")
+        except LockTimeoutError as exc:
+            print(f"Ошибка: {exc}. Попробуйте снова.")
+
+
+def _execute(
+    store: TableStore,
+    user_input: str,
+    show_rows: Callable[[Iterable], None] = _print_rows,
+    params: Sequence[Any] = (),
+) -> bool:
+    """Выполнить одну команду; False — команда exit.
+
+    show_rows получает результат select (по умолчанию печатает таблицей),
+    params — значения для `?` в insert/select/update/delete.
+    """
+    with phase("parse.command"):
+        try:
+            statement = _prepare(user_input)
+        except ValueError as exc:
+            report_error(f"Некорректное значение: {exc}. Попробуйте снова.")
+            return True
+        tokens = shlex.split(user_input) if statement is None else []
+    cmd = statement.command if statement is not None else tokens[0].lower()
+
+    if cmd == "exit":
+        return False
+
+    if cmd == "profile":
+        return _profile(store, user_input, tokens, show_rows)
+
+    if params and statement is None:
+        report_error(
+            "Некорректное значение: параметры поддерживаются только в "
+            "insert/select/update/delete. Попробуйте снова."
+        )
+        return True
+
+    with phase(f"command.{cmd if cmd in _COMMANDS else 'unknown'}"):
+        return _dispatch(store, user_input, tokens, cmd, show_rows, statement, params)
+
+
+def _metrics_command(tokens: list[str]) -> None:
+    action = tokens[1].lower() if len(tokens) > 1 else "show"
+    if action in {"on", "off"}:
+        enable_metrics(action == "on")
+        state = "включён" if action == "on" else "выключен"
+        print(f"Сбор метрик {state}.")
+    elif action == "reset":
+        reset_metrics()
+        print("Метрики сброшены.")
+    elif action == "show":
+        print_metrics()
+    elif action in {"json", "prometheus"}:
+        text = to_json() if action == "json" else to_prometheus()
+        if len(tokens) < 3:
+            print(text)
+            return
+        try:
+            with open(tokens[2], "w", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as exc:
+            report_error(f"Ошибка: {exc}.")
+            return
+        print(f"Метрики записаны в {tokens[2]}.")
+    else:
+        report_error(f"Некорректное значение: {action}. Попробуйте снова.")
+
+
+def _vector_command(tokens: list[str]) -> None:
+    action = tokens[1].lower() if len(tokens) > 1 else "show"
+    if action in {"on", "off"}:
+        enable_vector(action == "on")
+    elif action != "show":
+        report_error(f"Некорректное значение: {action}. Попробуйте снова.")
+        return
+    state = "включено" if vector_enabled() else "выключено"
+    backend = "NumPy" if numpy_available() else "array"
+    print(f"Векторное выполнение {state} ({backend}).")
+
+
+def _profile(
+    store: TableStore,
+    user_input: str,
+    tokens: list[str],
+    show_rows: Callable[[Iterable], None],
+) -> bool:
+    """profile <команда>: выполнить команду под cProfile."""
+    command = user_input.split(None, 1)[1] if len(tokens) > 1 else ""
+    if not command or tokens[1].lower() in {"exit", "profile"}:
+        report_error("Некорректное значение: profile <команда>. Попробуйте снова.")
+        return True
+    _, report = profile_call(
+        PROFILE_FILE, _execute, store, command, show_rows
+    )
+    print(report.rstrip())
+    print(f"Профиль команды записан в {PROFILE_FILE}.")
+    return True
+
+
+def _dispatch(
+    store: TableStore,
+    user_input: str,
+    tokens: list[str],
+    cmd: str,
+    show_rows: Callable[[Iterable], None],
+    statement: Statement | None = None,
+    params: Sequence[Any] = (),
+) -> bool:
+    metadata = store.refresh_metadata()
+
+    if cmd == "help":
+        print_help()
+        return True
+
+    if cmd == "cache_info":
+        print_cache_info()
+        return True
+
+    if cmd == "metrics":
+        _metrics_command(tokens)
+        return True
+
+    if cmd == "vector":
+        _vector_command(tokens)
+        return True
+
+    if cmd == "begin":
+        if store.in_transaction:
+            report_error("Ошибка: Транзакция уже начата.")
+            return True
+        store.begin()
+        print("Транзакция начата.")
+        return True
+
+    if cmd == "commit":
+        in_transaction = store.in_transaction
+        store.commit()
+        if in_transaction:
+            print("Транзакция зафиксирована.")
+        else:
+            print("Изменения записаны на диск.")
+        return True
+
+    if cmd == "rollback":
+        if not store.in_transaction:
+            report_error("Ошибка: Нет активной транзакции.")
+            return True
+        for table_name in store.rollback():
+            invalidate_select_cache(table_name)
+        print("Транзакция отменена.")
+        return True
+
+    if cmd in _NO_TRANSACTION_COMMANDS and store.in_transaction:
+        report_error(f"Ошибка: Команда {cmd} недоступна внутри транзакции.")
+        return True
+
+    if cmd == "durability":
+        if len(tokens) < 2:
+            print(f"Текущий уровень надёжности записи: {store.durability}")
+            return True
+        level = tokens[1].lower()
+        if level not in DURABILITY_LEVELS:
+            report_error(f"Некорректное значение: {level}. Попробуйте снова.")
+            return True
+        store.flush()
+        store.durability = level
+        print(f"Уровень надёжности записи: {level}")
+        return True
+
+    if cmd == "list_tables":
+        list_tables(metadata)
+        return True
+
+    if cmd == "create_table":
+        tokens, options = _split_options(tokens)
+        if len(tokens) < 3:
+            report_error(
+                "Некорректное значение: недостаточно аргументов. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name = tokens[1]
+        columns = tokens[2:]
+        storage = options.get("storage", STORAGE_JSON).lower()
+        fmt = options.get("format", FORMAT_JSON).lower()
+        create_table(metadata, table_name, columns, storage, fmt)
+        store.mark_metadata_dirty()
+        return True
+
+    if cmd == "compact":
+        if len(tokens) < 2:
+            report_error(
+                "Некорректное значение: отсутствует имя таблицы. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name = tokens[1]
+        if table_name not in metadata:
+            report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        store.compact(table_name)
+        print(f'Журнал таблицы "{table_name}" свёрнут в снимок.')
+        return True
+
+    if cmd == "convert":
+        if len(tokens) < 3:
+            report_error(
+                "Некорректное значение: недостаточно аргументов. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name, fmt = tokens[1], tokens[2].lower()
+        if table_name not in metadata:
+            report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        if fmt not in FORMATS:
+            report_error(f"Некорректное значение: {fmt}. Попробуйте снова.")
+            return True
+        try:
+            store.convert(table_name, fmt)
+        except ValueError as exc:
+            # в колоночный формат не укладываются значения таблицы
+            report_error(f"Ошибка: {exc}.")
+            return True
+        print(f'Таблица "{table_name}" переведена в формат {fmt}.')
+        return True
+
+    if cmd == "drop_table":
+        if len(tokens) < 2:
+            report_error(
+                "Некорректное значение: отсутствует имя таблицы. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name = tokens[1]
+        store.lock_for_write(table_name)
+        index_columns = list(table_indexes(metadata, table_name))
+        drop_table(metadata, table_name)
+        if table_name not in metadata:
+            store.mark_metadata_dirty()
+            store.drop(table_name)
+            store.drop_files(table_name, index_columns)
+
+        invalidate_select_cache(table_name)
+
+        return True
+
+    if cmd in {"create_index", "drop_index"}:
+        if len(tokens) < 3:
+            report_error(
+                "Некорректное значение: недостаточно аргументов. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name, column = tokens[1], tokens[2]
+        store.lock_for_write(table_name)
+        if cmd == "create_index":
+            kind = tokens[3].lower() if len(tokens) > 3 else INDEX_HASH
+            table_data = store.table(table_name)
+            create_index(metadata, table_name, column, kind, table_data)
+        else:
+            drop_index(metadata, table_name, column)
+        store.forget_indexes(table_name)
+        store.mark_metadata_dirty()
+        return True
+
+    # insert/select/update/delete: разобранный шаблон команды
+    if statement is not None:
+        _run_statement(store, statement, params, show_rows)
+        return True
+
+    # import <table> <file.csv|file.jsonl>
+    if cmd == "import":
+        if len(tokens) < 3:
+            report_error(
+                "Некорректное значение: недостаточно аргументов. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name, path = tokens[1], tokens[2]
+        if table_name not in metadata:
+            report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        imported = _import_file(store, table_name, path)
+        print(f'Импорт в таблицу "{table_name}" завершён: {imported} записей.')
+        return True
+
+    # export <table> [where col = value] to <file>
+    if cmd == "export":
+        _export(store, user_input)
+        return True
+
+    # select <агрегаты> from <table> [where ...] [group by ...]
+    if cmd == "select" and len(tokens) >= 2 and tokens[1].lower() != "from":
+        _aggregate(store, user_input, show_rows)
+        return True
+
+    # select from <a> join <b> on a.col = b.col [where ...] [limit N]
+    if (
+        cmd == "select"
+        and len(tokens) >= 4
+        and tokens[1].lower() == "from"
+        and tokens[3].lower() == "join"
+    ):
+        _join(store, user_input, show_rows)
+        return True
+
+    # analyze <table>
+    if cmd == "analyze":
+        if len(tokens) < 2:
+            report_error(
+                "Некорректное значение: отсутствует имя таблицы. "
+                "Попробуйте снова."
+            )
+            return True
+        table_name = tokens[1]
+        if table_name not in metadata:
+            report_error(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        analysis = analyze_table(store, table_name)
+        print(
+            f'Статистика таблицы "{table_name}" собрана: '
+            f"{analysis['rows']} записей."
+        )
+        return True
+
+    # explain select from <table> [where ...]
+    if cmd == "explain":
+        _explain(store, user_input)
+        return True
+
+    # info <table>
+    if cmd == "info" and len(tokens) >= 2:
+        table_name = tokens[1]
+        table_data = store.reader(table_name)
+        table_info(metadata, table_name, table_data)
+        return True
+
+    report_error(f"Функции {cmd} нет. Попробуйте снова.")
+    return True
@@ -0,0 +1,21 @@
+class DatabaseError(Exception):
+    """Базовая ошибка базы данных."""
+
+
+class CorruptedFileError(DatabaseError):
+    """Файл данных или метаданных повреждён и не может быть прочитан."""
+
+    def __init__(self, path: str, reason: str = "") -> None:
+        self.path = path
+        self.reason = reason
+        message = f"Файл {path} повреждён"
+        super().__init__(f"{message}: {reason}" if reason else message)
+
+
+class LockTimeoutError(DatabaseError):
+    """Блокировку не удалось получить: файл занят другим процессом."""
+
+    def __init__(self, path: str, timeout: float) -> None:
+        self.path = path
+        self.timeout = timeout
+        super().__init__(f"{path} занят другим процессом дольше {timeout:g} с")
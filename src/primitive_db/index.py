@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Iterable
+
+from .constants import INDEX_HASH, INDEX_SORTED
+from .parser import And, Compare, Expr
+from .query import to_expression
+from .utils import load_index_data, save_index_data
+
+
+class HashIndex:
+    """Хеш-индекс: значение столбца -> множество ID строк."""
+
+    kind = INDEX_HASH
+
+    def __init__(self, column: str) -> None:
+        self.column = column
+        self._map: dict[Any, set[int]] = {}
+
+    def lookup(self, value: Any) -> set[int]:
+        return self._map.get(value, set())
+
+    def add(self, row_id: int, value: Any) -> None:
+        self._map.setdefault(value, set()).add(row_id)
+
+    def remove(self, row_id: int, value: Any) -> None:
+        ids = self._map.get(value)
+        if ids is None:
+            return
+        ids.discard(row_id)
+        if not ids:
+            del self._map[value]
+
+    def to_json(self) -> dict:
+        return {
+            "kind": self.kind,
+            "column": self.column,
+            "entries": [[value, sorted(ids)] for value, ids in self._map.items()],
+        }
+
+    def load_entries(self, entries: list) -> None:
+        self._map = {value: set(ids) for value, ids in entries}
+
+
+class SortedIndex:
+    """Упорядоченный индекс: параллельные списки значений и ID.
+
+    Пары отсортированы по (значение, ID), поэтому позиция конкретной пары
+    находится двумя бинарными поисками.
+    """
+
+    kind = INDEX_SORTED
+
+    def __init__(self, column: str) -> None:
+        self.column = column
+        self._keys: list[Any] = []
+        self._ids: list[int] = []
+
+    def lookup(self, value: Any) -> list[int]:
+        lo = bisect_left(self._keys, value)
+        hi = bisect_right(self._keys, value)
+        return self._ids[lo:hi]
+
+    def range(
+        self,
+        low: Any = None,
+        high: Any = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> list[int]:
+        """ID строк со значением в диапазоне; None — граница не задана."""
+        keys = self._keys
+        if low is None:
+            lo = 0
+        else:
+            lo = (bisect_left if low_inclusive else bisect_right)(keys, low)
+        if high is None:
+            hi = len(keys)
+        else:
+            hi = (bisect_right if high_inclusive else bisect_left)(keys, high, lo)
+        return self._ids[lo : max(lo, hi)]
+
+    def _position(self, row_id: int, value: Any) -> tuple[int, bool]:
+        lo = bisect_left(self._keys, value)
+        hi = bisect_right(self._keys, value, lo)
+        pos = bisect_left(self._ids, row_id, lo, hi)
+        return pos, pos < hi and self._ids[pos] == row_id
+
+    def add(self, row_id: int, value: Any) -> None:
+        pos, found = self._position(row_id, value)
+        if not found:
+            self._keys.insert(pos, value)
+            self._ids.insert(pos, row_id)
+
+    def remove(self, row_id: int, value: Any) -> None:
+        pos, found = self._position(row_id, value)
+        if found:
+            del self._keys[pos]
+            del self._ids[pos]
+
+    def to_json(self) -> dict:
+        return {
+            "kind": self.kind,
+            "column": self.column,
+            "entries": [list(pair) for pair in zip(self._keys, self._ids)],
+        }
+
+    def load_entries(self, entries: list) -> None:
+        pairs = sorted((value, row_id) for value, row_id in entries)
+        self._keys = [value for value, _ in pairs]
+        self._ids = [row_id for _, row_id in pairs]
+
+
+_INDEX_CLASSES = {INDEX_HASH: HashIndex, INDEX_SORTED: SortedIndex}
+
+
+def build_index(
+    table_data: Iterable[dict[str, Any]],
+    column: str,
+    kind: str = INDEX_HASH,
+) -> HashIndex | SortedIndex:
+    """Построить индекс по столбцу из строк таблицы."""
+    index = _INDEX_CLASSES[kind](column)
+    if kind == INDEX_SORTED:
+        index.load_entries(
+            [row.get(column), row.get("ID")] for row in table_data
+        )
+        return index
+
+    for row in table_data:
+        index.add(row.get("ID"), row.get(column))
+    return index
+
+
+def table_indexes(metadata: dict, table_name: str) -> dict[str, str]:
+    """Описание индексов таблицы из метаданных: столбец -> тип индекса."""
+    table = metadata.get(table_name)
+    if not isinstance(table, dict):
+        return {}
+    indexes = table.get("indexes", {})
+    return indexes if isinstance(indexes, dict) else {}
+
+
+def load_indexes(
+    metadata: dict,
+    table_name: str,
+    load_rows: Callable[[], Iterable[dict[str, Any]]],
+    stamp: list | None = None,
+) -> dict[str, HashIndex | SortedIndex]:
+    """Загрузить индексы таблицы; устаревшие и отсутствующие перестраиваются.
+
+    load_rows вызывается, только если какой-то индекс надо перестроить:
+    с годными файлами индексов таблица не читается.
+
+    stamp — отпечаток файлов таблицы (utils.index_stamp). Файл индекса
+    годится, только если записан для тех же файлов: после сбоя между
+    записью таблицы и индекса отпечатки расходятся. stamp=None — в памяти
+    есть незаписанные изменения: индекс строится, но на диск не пишется
+    (его запишет flush вместе с таблицей).
+    """
+    result: dict[str, HashIndex | SortedIndex] = {}
+    table_data = None
+
+    for column, kind in table_indexes(metadata, table_name).items():
+        data = load_index_data(table_name, column)
+        if (
+            data is None
+            or data.get("kind") != kind
+            or stamp is None
+            or data.get("table_stamp") != stamp
+        ):
+            if table_data is None:
+                table_data = load_rows()
+            index = build_index(table_data, column, kind)
+            if stamp is not None:
+                save_index_data(table_name, column, _stamped(index, stamp))
+        else:
+            index = _INDEX_CLASSES[kind](column)
+            index.load_entries(data.get("entries", []))
+        result[column] = index
+
+    return result
+
+
+def _stamped(index: HashIndex | SortedIndex, stamp: list) -> dict:
+    return {**index.to_json(), "table_stamp": stamp}
+
+
+def save_indexes(
+    table_name: str,
+    indexes: dict[str, HashIndex | SortedIndex],
+    stamp: list,
+    sync: bool = True,
+) -> None:
+    """Записать индексы, построенные по файлам таблицы с отпечатком stamp."""
+    for column, index in indexes.items():
+        save_index_data(table_name, column, _stamped(index, stamp), sync=sync)
+
+
+def apply_changes(
+    indexes: dict[str, HashIndex | SortedIndex],
+    changes: list[dict[str, Any]],
+) -> None:
+    """Обновить индексы по записям журнала изменений (см. core)."""
+    for entry in changes:
+        op = entry.get("op")
+        for column, index in indexes.items():
+            if op == "insert":
+                row = entry["row"]
+                index.add(row["ID"], row.get(column))
+            elif op == "delete":
+                index.remove(entry["ID"], entry["row"].get(column))
+            elif op == "update" and column in entry["set"]:
+                index.remove(entry["ID"], entry["old"].get(column))
+                index.add(entry["ID"], entry["set"][column])
+
+
+def _compare_ids(
+    index: HashIndex | SortedIndex,
+    term: Compare,
+) -> set[int] | None:
+    if term.op == "=":
+        return set(index.lookup(term.value))
+    if term.op == "in":
+        ids: set[int] = set()
+        for value in term.value:
+            ids.update(index.lookup(value))
+        return ids
+    if not isinstance(index, SortedIndex) or term.op == "!=":
+        return None
+    if term.op in {">", ">="}:
+        return set(index.range(low=term.value, low_inclusive=term.op == ">="))
+    return set(index.range(high=term.value, high_inclusive=term.op == "<="))
+
+
+def _expression_ids(
+    indexes: dict[str, HashIndex | SortedIndex],
+    expr: Expr,
+) -> set[int] | None:
+    if isinstance(expr, Compare):
+        index = indexes.get(expr.column)
+        return None if index is None else _compare_ids(index, expr)
+
+    if isinstance(expr, And):
+        result: set[int] | None = None
+        for item in expr.items:
+            ids = _expression_ids(indexes, item)
+            if ids is None:
+                continue
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    # OR сужается индексом, только если индекс есть у каждой ветви.
+    union: set[int] = set()
+    for item in expr.items:
+        ids = _expression_ids(indexes, item)
+        if ids is None:
+            return None
+        union |= ids
+    return union
+
+
+def candidate_ids(
+    indexes: dict[str, HashIndex | SortedIndex],
+    where_clause: dict[str, Any] | Expr | None,
+) -> set[int] | None:
+    """ID строк, которые могут подойти под WHERE, или None без индекса.
+
+    Равенство и IN используют любой индекс, диапазоны (<, <=, >, >=) —
+    только упорядоченный. Строки-кандидаты всё равно проверяются полным
+    условием, поэтому результат может быть шире точного.
+    """
+    expr = to_expression(where_clause)
+    if expr is None:
+        return None
+    return _expression_ids(indexes, expr)
@@ -0,0 +1,213 @@
+"""Соединение двух таблиц по равенству столбцов (hash join).
+
+    select from users join orders on users.ID = orders.user_id
+        where users.city = Omsk and orders.total > 100
+
+Условия WHERE, которые касаются только одной таблицы, применяются к ней
+до соединения (с использованием её индексов). Меньшая сторона
+складывается в хеш-таблицу значение -> строки, большая читается потоком
+и ищет пары в ней. Если на столбце соединения у одной из таблиц есть
+индекс, он сам служит хеш-таблицей, и строить её не нужно.
+
+В результате имена столбцов уточнены именем таблицы: users.ID, orders.ID.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from .core import _convert_value, iter_rows
+from .index import table_indexes
+from .metrics import phase
+from .parser import And, Compare, Expr, Or, parse_where_expression
+from .planner import plan_query
+from .query import compile_where, expression_columns
+from .store import TableStore
+from .vector import vector_enabled
+
+_JOIN_RE = re.compile(
+    r"^select\s+from\s+(?P<left>\S+)\s+join\s+(?P<right>\S+)"
+    r"\s+on\s+(?P<a>[^\s=]+)\s*=\s*(?P<b>[^\s=]+)"
+    r"(?:\s+where\s+(?P<where>.+?))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class JoinSide(NamedTuple):
+    table: str
+    column: str
+    where: Expr | None  # условие только на эту таблицу, имена без префикса
+
+
+class JoinQuery(NamedTuple):
+    left: JoinSide
+    right: JoinSide
+    where: Expr | None  # условие на обе таблицы, имена с префиксом
+
+
+def _columns(metadata: dict, table_name: str) -> list[dict]:
+    if table_name not in metadata:
+        raise KeyError(table_name)
+    return metadata[table_name]["columns"]
+
+
+def _owners(metadata: dict, tables: tuple[str, str]) -> dict[str, tuple[str, str]]:
+    """Имя столбца в запросе -> (таблица, столбец).
+
+    Столбец можно писать с именем таблицы (users.age) или без него, если
+    такое имя есть только в одной из таблиц.
+    """
+    owners: dict[str, tuple[str, str]] = {}
+    seen: dict[str, list[str]] = {}
+    for table_name in tables:
+        for col in _columns(metadata, table_name):
+            owners[f"{table_name}.{col['name']}"] = (table_name, col["name"])
+            seen.setdefault(col["name"], []).append(table_name)
+    for name, owner_tables in seen.items():
+        if len(owner_tables) == 1:
+            owners[name] = (owner_tables[0], name)
+    return owners
+
+
+def _resolve(owners: dict, name: str) -> tuple[str, str]:
+    if name not in owners:
+        raise ValueError(f"неизвестный или неоднозначный столбец {name}")
+    return owners[name]
+
+
+def _rename(expr: Expr, names: dict[str, str]) -> Expr:
+    if isinstance(expr, Compare):
+        return expr._replace(column=names[expr.column])
+    items = tuple(_rename(item, names) for item in expr.items)
+    return And(items) if isinstance(expr, And) else Or(items)
+
+
+def _combine(terms: list[Expr]) -> Expr | None:
+    if not terms:
+        return None
+    return terms[0] if len(terms) == 1 else And(tuple(terms))
+
+
+def parse_join(user_input: str, metadata: dict) -> JoinQuery:
+    """Разобрать select ... join ... on ...
+
+    ValueError — если запрос некорректен, KeyError — если нет таблицы.
+    """
+    match = _JOIN_RE.match(user_input.strip())
+    if match is None:
+        raise ValueError("ожидается select from <таблица> join <таблица> on a = b")
+    tables = (match.group("left"), match.group("right"))
+    if tables[0] == tables[1]:
+        raise ValueError("соединение таблицы с самой собой не поддерживается")
+    owners = _owners(metadata, tables)
+    types = {
+        (table_name, col["name"]): col["type"]
+        for table_name in tables
+        for col in _columns(metadata, table_name)
+    }
+
+    ends = [_resolve(owners, match.group("a")), _resolve(owners, match.group("b"))]
+    ends.sort(key=lambda end: tables.index(end[0]))
+    if ends[0][0] == ends[1][0]:
+        raise ValueError("on должен связывать столбцы разных таблиц")
+    if types[ends[0]] != types[ends[1]]:
+        raise ValueError("типы столбцов в on различаются")
+
+    side_terms: dict[str, list[Expr]] = {name: [] for name in tables}
+    mixed: list[Expr] = []
+    if match.group("where"):
+        columns = [
+            {"name": name, "type": types[owner]} for name, owner in owners.items()
+        ]
+        expr = parse_where_expression(match.group("where"), columns, _convert_value)
+        terms = expr.items if isinstance(expr, And) else (expr,)
+        for term in terms:
+            used = {owners[name] for name in expression_columns(term)}
+            term_tables = {table_name for table_name, _ in used}
+            if len(term_tables) == 1:
+                names = {name: owners[name][1] for name in expression_columns(term)}
+                side_terms[term_tables.pop()].append(_rename(term, names))
+            else:
+                names = {
+                    name: "{}.{}".format(*owners[name])
+                    for name in expression_columns(term)
+                }
+                mixed.append(_rename(term, names))
+
+    left, right = (
+        JoinSide(table_name, column, _combine(side_terms[table_name]))
+        for table_name, column in ends
+    )
+    return JoinQuery(left, right, _combine(mixed))
+
+
+def _filtered(store: TableStore, side: JoinSide) -> Iterator[Any]:
+    """Строки одной стороны под её условием (с кандидатами из планировщика)."""
+    ids = None
+    if side.where and (vector_enabled() or table_indexes(store.metadata, side.table)):
+        ids = plan_query(store, side.table, side.where).ids
+    return iter_rows(store.reader(side.table), side.where, ids)
+
+
+def _build(rows: Iterable[Any], column: str) -> dict[Any, list[Any]]:
+    buckets: dict[Any, list[Any]] = {}
+    for row in rows:
+        key = row.get(column)
+        if key is not None:
+            buckets.setdefault(key, []).append(row)
+    return buckets
+
+
+def execute_join(store: TableStore, query: JoinQuery) -> Iterator[dict[str, Any]]:
+    """Лениво выдавать соединённые строки (порядок — порядок потоковой стороны)."""
+    metadata = store.metadata
+    fields = {
+        side.table: [col["name"] for col in metadata[side.table]["columns"]]
+        for side in (query.left, query.right)
+    }
+
+    def indexed(side: JoinSide) -> bool:
+        return side.column in table_indexes(metadata, side.table)
+
+    # Сторона с индексом на столбце соединения не строится; если индексов
+    # нет (или они на обеих), строится меньшая по числу строк.
+    sizes = {
+        side.table: len(store.reader(side.table)) for side in (query.left, query.right)
+    }
+    if indexed(query.left) != indexed(query.right):
+        build = query.left if indexed(query.left) else query.right
+    else:
+        smaller = sizes[query.left.table] <= sizes[query.right.table]
+        build = query.left if smaller else query.right
+    probe = query.right if build is query.left else query.left
+
+    if indexed(build):
+        index = store.indexes(build.table)[build.column]
+        table = store.table(build.table)
+        match_build = compile_where(build.where)
+
+        def lookup(key: Any) -> Iterable[Any]:
+            return filter(match_build, table.get_many(index.lookup(key)))
+
+    else:
+        with phase("scan.join"):
+            buckets = _build(_filtered(store, build), build.column)
+
+        def lookup(key: Any) -> Iterable[Any]:
+            return buckets.get(key, ())
+
+    match = compile_where(query.where)
+    for probe_row in _filtered(store, probe):
+        key = probe_row.get(probe.column)
+        if key is None:
+            continue
+        for build_row in lookup(key):
+            rows = {probe.table: probe_row, build.table: build_row}
+            joined = {
+                f"{table_name}.{name}": rows[table_name].get(name)
+                for table_name in (query.left.table, query.right.table)
+                for name in fields[table_name]
+            }
+            if match(joined):
+                yield joined
@@ -0,0 +1,172 @@
+"""Ленивое чтение снимков таблиц через mmap.
+
+Файл отображается в память, и по нему строится только индекс границ
+записей (смещения начала и конца). Сами записи декодируются, когда к
+строке впервые обращаются (предикат WHERE или вывод), поэтому для
+подсчёта строк и для выборки по большой таблице не нужно держать её
+целиком в памяти как список словарей.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+from array import array
+from typing import Any, Iterator
+
+from .columnar import ColumnarFile
+
+# Начало файла в построчной раскладке (см. utils._write_snapshot)
+# и в старой раскладке json.dump(..., indent=2).
+_LINES_PREFIX = b"[\n{"
+_INDENT_PREFIX = b"[\n  {"
+
+
+class LazyRow:
+    """Строка, которая декодируется при первом обращении к значениям."""
+
+    __slots__ = ("_decode", "_data")
+
+    def __init__(self, decode) -> None:
+        self._decode = decode
+        self._data: dict[str, Any] | None = None
+
+    def _values(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = self._decode()
+        return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values().get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values()[key]
+
+    def keys(self):
+        return self._values().keys()
+
+    def items(self):
+        return self._values().items()
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self._values())
+
+
+class ColumnarRow(LazyRow):
+    """Строка колоночного файла: декодируются только запрошенные столбцы."""
+
+    __slots__ = ("_file", "_index", "_names")
+
+    def __init__(self, file: ColumnarFile, index: int, names: list[str]) -> None:
+        super().__init__(lambda: file.row(index))
+        self._file = file
+        self._index = index
+        self._names = names
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self._data is None:
+            if key not in self._names:
+                return default
+            return self._file.value(key, self._index)
+        return self._data.get(key, default)
+
+    def keys(self):
+        return list(self._names)
+
+
+class LazyJsonRows:
+    """Снимок JSON, отображённый в память, с индексом границ записей."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._starts = array("q")
+        self._ends = array("q")
+
+        if self._mm[: len(_LINES_PREFIX)] == _LINES_PREFIX:
+            self._index_lines()
+        elif self._mm[: len(_INDENT_PREFIX)] == _INDENT_PREFIX:
+            self._index_indented()
+        elif self._mm[:2] != b"[]":
+            self._mm.close()
+            raise ValueError(f"Неизвестная раскладка файла {path}")
+
+    def _index_lines(self) -> None:
+        # Каждая запись занимает ровно одну строку: внутри JSON-строк
+        # перевод строки экранируется, поэтому b"\n" всегда граница.
+        mm = self._mm
+        pos = 2
+        size = len(mm)
+        while pos < size and mm[pos : pos + 1] == b"{":
+            end = mm.find(b"\n", pos)
+            if end == -1:
+                end = size
+            stop = end - 1 if mm[end - 1 : end] == b"," else end
+            self._starts.append(pos)
+            self._ends.append(stop)
+            pos = end + 1
+
+    def _index_indented(self) -> None:
+        mm = self._mm
+        pos = mm.find(b"\n  {")
+        while pos != -1:
+            start = pos + 3
+            end = mm.find(b"\n  }", start)
+            if end == -1:
+                break
+            self._starts.append(start)
+            self._ends.append(end + 4)
+            pos = mm.find(b"\n  {", end + 4)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _decode(self, i: int) -> dict[str, Any]:
+        return json.loads(self._mm[self._starts[i] : self._ends[i]])
+
+    def row(self, i: int) -> dict[str, Any]:
+        """Запись i, сразу декодированная в dict."""
+        return self._decode(i)
+
+    def __getitem__(self, i: int) -> LazyRow:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return LazyRow(lambda: self._decode(i))
+
+    def __iter__(self) -> Iterator[LazyRow]:
+        for i in range(len(self)):
+            yield LazyRow(lambda i=i: self._decode(i))
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class LazyColumnarRows:
+    """Колоночный снимок: строки читаются из mmap по одному столбцу."""
+
+    def __init__(self, path: str) -> None:
+        self._file = ColumnarFile(path)
+        self._names = [col["name"] for col in self._file.columns]
+
+    def __len__(self) -> int:
+        return len(self._file)
+
+    @property
+    def file(self) -> ColumnarFile:
+        return self._file
+
+    def __getitem__(self, i: int) -> ColumnarRow:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return ColumnarRow(self._file, i, self._names)
+
+    def __iter__(self) -> Iterator[ColumnarRow]:
+        for i in range(len(self)):
+            yield ColumnarRow(self._file, i, self._names)
+
+    def close(self) -> None:
+        self._file.close()
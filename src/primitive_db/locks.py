@@ -0,0 +1,150 @@
+"""Блокировки таблиц и метаданных между процессами.
+
+Каждой таблице соответствует файл data/<таблица>.lock, метаданным —
+db_meta.json.lock. Читатели берут разделяемую блокировку (flock LOCK_SH)
+и не мешают друг другу, писатель берёт исключительную (LOCK_EX) и
+ждёт, пока читатели и другие писатели этой таблицы её отпустят; другие
+таблицы при этом не блокируются.
+
+Внутри процесса блокировка одного файла реентерабельна: повторный захват
+только увеличивает счётчик, а захват LOCK_EX поверх LOCK_SH повышает её.
+Без модуля fcntl (Windows) блокировки ничего не делают.
+
+Файл блокировки удалённой таблицы удаляется под исключительной
+блокировкой. Процесс, который в это время ждал её на старом файле, после
+захвата видит, что файла по этому пути уже нет, и открывает его заново.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - нет flock (Windows)
+    fcntl = None
+
+from .constants import DATA_DIR, LOCK_SUFFIX, LOCK_TIMEOUT
+from .errors import LockTimeoutError
+
+_POLL_INTERVAL = 0.005
+
+
+class FileLock:
+    """Разделяемая/исключительная блокировка файла через flock."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: int | None = None
+        self._exclusive = False
+        self._count = 0
+
+    @property
+    def held(self) -> bool:
+        return self._count > 0
+
+    @property
+    def exclusive(self) -> bool:
+        return self._count > 0 and self._exclusive
+
+    def _flock(self, exclusive: bool, timeout: float) -> None:
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._fd, mode | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeoutError(self.path, timeout) from None
+                time.sleep(_POLL_INTERVAL)
+
+    def acquire(self, exclusive: bool = False, timeout: float = LOCK_TIMEOUT) -> None:
+        if fcntl is None:
+            self._count += 1
+            return
+
+        if self._count == 0:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            while True:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._flock(exclusive, timeout)
+                except BaseException:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise
+                if self._opened_current():
+                    break
+                # файл удалили, пока ждали: захваченная блокировка ничего
+                # не защищает
+                os.close(self._fd)
+            self._exclusive = exclusive
+        elif exclusive and not self._exclusive:
+            # Повышение LOCK_SH -> LOCK_EX на том же дескрипторе.
+            self._flock(True, timeout)
+            self._exclusive = True
+        self._count += 1
+
+    def _opened_current(self) -> bool:
+        try:
+            return os.path.samestat(os.fstat(self._fd), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def remove(self) -> None:
+        """Удалить файл блокировки; вызывается под исключительной блокировкой."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def release(self) -> None:
+        if self._count == 0:
+            return
+        self._count -= 1
+        if self._count or self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        self._exclusive = False
+
+    @contextmanager
+    def hold(self, exclusive: bool = False) -> Iterator[FileLock]:
+        self.acquire(exclusive)
+        try:
+            yield self
+        finally:
+            self.release()
+
+
+_locks: dict[str, FileLock] = {}
+
+
+def _lock(path: str) -> FileLock:
+    lock = _locks.get(path)
+    if lock is None:
+        lock = _locks[path] = FileLock(path)
+    return lock
+
+
+def table_lock(table_name: str) -> FileLock:
+    """Блокировка таблицы (общая для всех TableStore процесса)."""
+    return _lock(os.path.join(DATA_DIR, f"{table_name}{LOCK_SUFFIX}"))
+
+
+def remove_table_lock(table_name: str) -> None:
+    """Удалить файл блокировки таблицы, которой больше нет."""
+    lock = table_lock(table_name)
+    with lock.hold(exclusive=True):
+        lock.remove()
+
+
+def metadata_lock(meta_file: str) -> FileLock:
+    return _lock(f"{meta_file}{LOCK_SUFFIX}")
@@ -1,9 +1,83 @@
 #!/usr/bin/env python3
 
+import argparse
+import asyncio
+import sys
+
+from .constants import SERVER_HOST, SERVER_PORT, SERVER_SOCKET
+from .decorators import TIMING_OFF, TIMING_PRINT, TIMING_SUMMARY
 from .engine import run
 
+_CONFIRM = {"yes": True, "no": False, "ask": None}
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="database")
+    script = parser.add_mutually_exclusive_group()
+    script.add_argument(
+        "-f",
+        "--file",
+        help='выполнить команды из файла ("-" — из stdin)',
+    )
+    script.add_argument("-c", "--command", help="выполнить команды из строки")
+    parser.add_argument(
+        "--confirm",
+        choices=tuple(_CONFIRM),
+        default="yes",
+        help="ответ на подтверждения в пакетном режиме (по умолчанию yes)",
+    )
+    parser.add_argument(
+        "--timing",
+        choices=(TIMING_SUMMARY, TIMING_PRINT, TIMING_OFF),
+        default=TIMING_SUMMARY,
+        help="замеры времени в пакетном режиме: сводка в конце (по умолчанию), "
+        "по каждой команде или без замеров",
+    )
+    commands = parser.add_subparsers(dest="mode")
+
+    serve = commands.add_parser("serve", help="запустить сервер базы данных")
+    serve.add_argument(
+        "--socket",
+        default=SERVER_SOCKET,
+        help="путь к Unix-сокету (по умолчанию TCP)",
+    )
+    serve.add_argument("--host", default=SERVER_HOST)
+    serve.add_argument("--port", type=int, default=SERVER_PORT)
+    serve.add_argument(
+        "--confirm",
+        choices=("yes", "no"),
+        default="yes",
+        help="ответ на подтверждения удаления (по умолчанию yes)",
+    )
+    return parser.parse_args(argv)
+
+
+def _run_script(args: argparse.Namespace) -> int:
+    from .batch import run_batch
+
+    confirm = _CONFIRM[args.confirm]
+    if args.command is not None:
+        return run_batch(args.command.splitlines(), confirm, args.timing)
+    if args.file == "-":
+        return run_batch(sys.stdin, confirm, args.timing)
+    with open(args.file, encoding="utf-8") as script:
+        return run_batch(script, confirm, args.timing)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    if args.mode == "serve":
+        from .server import serve
 
-def main() -> None:
+        try:
+            asyncio.run(
+                serve(args.socket, args.host, args.port, args.confirm == "yes")
+            )
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.file is not None or args.command is not None:
+        sys.exit(_run_script(args))
     run()
 
 
@@ -0,0 +1,199 @@
+"""Метрики времени выполнения по фазам.
+
+Фаза — именованный участок работы: разбор команды (parse.*), чтение
+файлов (load.*), просмотр строк (scan.*), преобразование значений
+(convert.*), вывод (render), запись на диск (save.*) и команда целиком
+(command.<имя>). Время каждой фазы попадает в гистограмму: счётчики по
+корзинам (для Prometheus) и последние замеры (для перцентилей).
+
+Сбор включается переменной PRIMITIVE_DB_METRICS=1 или командой
+`metrics on`; выключенный сбор стоит одну проверку флага на вызов.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Callable
+
+from .constants import METRICS_ENABLED
+
+# Верхние границы корзин в секундах (последняя корзина — +Inf).
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Сколько последних замеров фазы хранится для перцентилей.
+SAMPLES = 4096
+PERCENTILES = (50, 90, 99)
+
+_enabled = METRICS_ENABLED
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "samples")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=SAMPLES)
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        rank = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[rank]
+
+
+_histograms: dict[str, Histogram] = {}
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def enable_metrics(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def reset_metrics() -> None:
+    _histograms.clear()
+
+
+def observe(name: str, seconds: float) -> None:
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = Histogram()
+    histogram.observe(seconds)
+
+
+class phase:
+    """Контекстный менеджер: `with phase("load.table"): ...`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start: float | None = None
+
+    def __enter__(self) -> phase:
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start)
+
+
+def timed(name: str):
+    """Декоратор: время каждого вызова функции — фаза name."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    """Сводка по фазам: число вызовов, сумма, максимум, перцентили (с)."""
+    result = {}
+    for name in sorted(_histograms):
+        histogram = _histograms[name]
+        entry = {
+            "count": histogram.count,
+            "sum": histogram.total,
+            "max": histogram.max,
+        }
+        for p in PERCENTILES:
+            entry[f"p{p}"] = histogram.percentile(p)
+        result[name] = entry
+    return result
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), ensure_ascii=False, indent=2)
+
+
+def to_prometheus() -> str:
+    """Гистограммы в текстовом формате Prometheus."""
+    metric = "primitive_db_phase_seconds"
+    lines = [
+        f"# HELP {metric} Время фаз выполнения команд.",
+        f"# TYPE {metric} histogram",
+    ]
+    for name in sorted(_histograms):
+        histogram = _histograms[name]
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts, strict=True):
+            cumulative += count
+            lines.append(
+                f'{metric}_bucket{{phase="{name}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{metric}_sum{{phase="{name}"}} {histogram.total}')
+        lines.append(f'{metric}_count{{phase="{name}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+
+def print_metrics() -> None:
+    data = snapshot()
+    if not data:
+        state = "включён" if _enabled else "выключен (metrics on)"
+        print(f"Замеров нет. Сбор метрик {state}.")
+        return
+    header = ["фаза", "вызовов", "всего, мс"]
+    header += [f"p{p}, мс" for p in PERCENTILES] + ["max, мс"]
+    print(" | ".join(header))
+    for name, entry in data.items():
+        values = [entry["sum"]] + [entry[f"p{p}"] for p in PERCENTILES]
+        values.append(entry["max"])
+        cells = [name, str(entry["count"])]
+        cells += [f"{value * 1000:.3f}" for value in values]
+        print(" | ".join(cells))
+
+
+def profile_call(path: str, func: Callable, *args: Any) -> tuple[Any, str]:
+    """Выполнить func под cProfile и сохранить статистику в path.
+
+    Файл — формат pstats: его открывают snakeviz, а flameprof
+    и gprof2dot строят по нему flame graph. Возвращает результат func
+    и текст с самыми затратными функциями.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args)
+    profiler.dump_stats(path)
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(15)
+    return result, report.getvalue()
@@ -0,0 +1,107 @@
+"""Параллельный полный просмотр больших таблиц.
+
+Строки делятся на диапазоны, и условие WHERE проверяется в пуле
+процессов. Процессы создаются через fork, поэтому таблица в памяти
+(или отображённый через mmap снимок) достаётся им без копирования и
+сериализации: в процесс передаются только границы диапазона, а обратно
+возвращаются номера подходящих строк. Результат собирается в исходном
+порядке.
+
+Параллельный просмотр включается, когда строк не меньше
+PARALLEL_THRESHOLD, процессов больше одного, есть fork и в процессе нет
+других потоков (fork из многопоточного процесса небезопасен — например,
+в режиме сервера). Иначе вызывающий выполняет обычный просмотр.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Sequence
+
+from .constants import PARALLEL_THRESHOLD, PARALLEL_WORKERS
+from .lazy import LazyColumnarRows, LazyJsonRows
+from .parser import Expr
+from .query import compile_where, expression_columns
+from .table import Table
+
+# Сколько диапазонов приходится на один процесс: мелкие диапазоны
+# выравнивают нагрузку, если подходящие строки распределены неравномерно.
+_CHUNKS_PER_WORKER = 4
+
+# Что просматривают процессы пула: задаётся перед fork и наследуется.
+_source: Any = None
+_where: dict[str, Any] | Expr | None = None
+
+
+def _scan_range(bounds: tuple[int, int]) -> list[int]:
+    """Номера подходящих строк в диапазоне [lo, hi) (выполняется в пуле)."""
+    lo, hi = bounds
+    match = compile_where(_where)
+    source = _source
+
+    if isinstance(source, LazyColumnarRows):
+        file = source.file
+        available = {col["name"] for col in file.columns}
+        names = sorted(expression_columns(_where) & available)
+        columns = [file.column(name, lo, hi) for name in names]
+        if not columns:
+            return [i for i in range(lo, hi) if match({})]
+        return [
+            lo + offset
+            for offset, values in enumerate(zip(*columns, strict=True))
+            if match(dict(zip(names, values, strict=True)))
+        ]
+
+    if isinstance(source, LazyJsonRows):
+        return [i for i in range(lo, hi) if match(source.row(i))]
+
+    return [i for i in range(lo, hi) if match(source[i])]
+
+
+def parallel_available(
+    rows: int,
+    workers: int = PARALLEL_WORKERS,
+    threshold: int = PARALLEL_THRESHOLD,
+) -> bool:
+    """Будет ли полный просмотр rows строк выполнен параллельно."""
+    return (
+        workers > 1
+        and rows >= threshold
+        and "fork" in mp.get_all_start_methods()
+        and threading.active_count() == 1
+    )
+
+
+def _ranges(rows: int, parts: int) -> list[tuple[int, int]]:
+    step = -(-rows // parts)
+    return [(lo, min(lo + step, rows)) for lo in range(0, rows, step)]
+
+
+def parallel_matching_rows(
+    table_data: Table | LazyJsonRows | LazyColumnarRows | Sequence[Any],
+    where_clause: dict[str, Any] | Expr,
+    workers: int = PARALLEL_WORKERS,
+    threshold: int = PARALLEL_THRESHOLD,
+) -> list[Any] | None:
+    """Подходящие строки в исходном порядке или None (просматривать обычно)."""
+    global _source, _where
+    rows = len(table_data)
+    if not parallel_available(rows, workers, threshold):
+        return None
+
+    if isinstance(table_data, Table):
+        source = table_data.rows()
+    elif isinstance(table_data, (LazyJsonRows, LazyColumnarRows, list, tuple)):
+        source = table_data
+    else:
+        return None
+
+    _source, _where = source, where_clause
+    try:
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork")) as pool:
+            chunks = pool.map(_scan_range, _ranges(rows, workers * _CHUNKS_PER_WORKER))
+            return [source[i] for chunk in chunks for i in chunk]
+    finally:
+        _source, _where = None, None
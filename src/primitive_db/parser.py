@@ -1,66 +1,495 @@
 from __future__ import annotations
 
 import re
-from typing import Any
+from typing import Any, NamedTuple, Sequence
 
+# --- WHERE expressions ---------------------------------------------------
 
-def parse_clause(query: str, keyword: str) -> str | None:
-    """
-    Extract clause (SET / WHERE) from query.
-    """
-    pattern = rf"\b{keyword}\b(.+)$"
-    match = re.search(pattern, query, re.IGNORECASE)
-    return match.group(1).strip() if match else None
+COMPARISON_OPS = ("=", "!=", "<", "<=", ">", ">=")
 
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[^\s()<>=!,"']+)
+    )
+    """,
+    re.VERBOSE,
+)
+_KEYWORDS = {"and", "or", "in"}
+# Words that end an unquoted value in a WHERE condition.
+_CONDITION_STOPS = ("and", "or")
+_NEXT_WORD_RE = re.compile(r"\s+(\w+)(?=[\s(]|$)")
+_ESCAPE_RE = re.compile(r"\\([\\\"'])")
 
-def parse_set_clause(
-    set_clause: str,
-    columns: list[dict],
-    convert_value,
-) -> list[tuple[str, Any]]:
+
+class Param(NamedTuple):
+    """`?` placeholder in a statement template: index into bound values."""
+
+    index: int
+
+
+class Compare(NamedTuple):
+    """`column op value`; for op == "in" value is a tuple of values.
+
+    In an unbound template (parse_condition, parse_statement) values are
+    raw strings as typed in the command or Param placeholders.
     """
-    Parse SET clause into list of (column, value).
+
+    column: str
+    op: str
+    value: Any
+
+
+class And(NamedTuple):
+    items: tuple
+
+
+class Or(NamedTuple):
+    items: tuple
+
+
+Expr = Compare | And | Or
+
+
+# --- statements ----------------------------------------------------------
+
+_STATEMENT_COMMANDS = {"insert", "select", "update", "delete"}
+# Words that end an unquoted value in update ... set.
+_SET_STOPS = ("where",)
+_PAGING_WORDS = ("limit", "offset")
+
+
+class Insert(NamedTuple):
+    command = "insert"
+
+    table: str
+    values: tuple
+
+
+class Select(NamedTuple):
+    command = "select"
+
+    table: str
+    where: Expr | None
+    limit: Any = None
+    offset: Any = None
+
+
+class Update(NamedTuple):
+    command = "update"
+
+    table: str
+    assignments: tuple[tuple[str, Any], ...]
+    where: Expr
+
+
+class Delete(NamedTuple):
+    command = "delete"
+
+    table: str
+    where: Expr
+
+
+Statement = Insert | Select | Update | Delete
+
+
+
+class _Parser:
+    """Recursive descent over the command text, tokenized on demand.
+
+    or_expr := and_expr (OR and_expr)*, and_expr := atom (AND atom)*,
+    atom := '(' or_expr ')' | condition. Values are read as raw text (see
+    raw_value) and left unconverted; `?` becomes Param numbered in the
+    order of appearance.
     """
-    column_types = {col["name"]: col["type"] for col in columns}
-    assignments = []
 
-    for part in set_clause.split(","):
-        column, raw_value = part.split("=", 1)
-        column = column.strip()
+    def __init__(self, text: str) -> None:
+        self.text = text.rstrip()
+        self.pos = 0
+        self.params = 0
 
-        if column not in column_types:
-            raise ValueError(f"Unknown column '{column}'")
+    def _next(self) -> tuple[str, str, int] | None:
+        """Token at self.pos as (kind, text, end position)."""
+        if self.pos >= len(self.text):
+            return None
+        match = _TOKEN_RE.match(self.text, self.pos)
+        if match is None or match.end() == self.pos:
+            raise ValueError(
+                f"Unexpected character '{self.text[self.pos :].strip()[:1]}'"
+            )
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        elif kind == "op" and value == "<>":
+            value = "!="
+        return kind, value, match.end()
 
-        value = convert_value(raw_value.strip(), column_types[column])
-        assignments.append((column, value))
+    def peek(self) -> tuple[str, str] | None:
+        token = self._next()
+        return token[:2] if token is not None else None
 
-    return assignments
+    def take(self, kind: str, value: str | None = None) -> str:
+        token = self._next()
+        if token is None or token[0] != kind or value not in (None, token[1]):
+            found = token[1] if token else "end of clause"
+            raise ValueError(f"Expected {value or kind}, got '{found}'")
+        self.pos = token[2]
+        return token[1]
 
+    def accept(self, kind: str, value: str | None = None) -> bool:
+        token = self._next()
+        if token is not None and token[0] == kind and value in (None, token[1]):
+            self.pos = token[2]
+            return True
+        return False
 
-def parse_where_clause(
-    where_clause: str,
-    columns: list[dict],
-    convert_value,
-) -> list[tuple[str, str, Any]]:
+    def accept_word(self, word: str) -> bool:
+        token = self._next()
+        if token is not None and token[0] == "word" and token[1].lower() == word:
+            self.pos = token[2]
+            return True
+        return False
+
+    def expect_word(self, word: str) -> None:
+        if not self.accept_word(word):
+            token = self.peek()
+            found = token[1] if token else "end of clause"
+            raise ValueError(f"Expected {word}, got '{found}'")
+
+    def end(self) -> None:
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()[1]}'")
+
+    def condition(self) -> Expr:
+        if self.peek() is None:
+            raise ValueError("Empty WHERE condition")
+        return self.or_expr()
+
+    def or_expr(self) -> Expr:
+        items = [self.and_expr()]
+        while self.accept("keyword", "or"):
+            items.append(self.and_expr())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def and_expr(self) -> Expr:
+        items = [self.atom()]
+        while self.accept("keyword", "and"):
+            items.append(self.atom())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def atom(self) -> Expr:
+        if self.accept("punct", "("):
+            expr = self.or_expr()
+            self.take("punct", ")")
+            return expr
+
+        column = self.take("word")
+        if self.accept("keyword", "in"):
+            self.take("punct", "(")
+            values = [self.raw_value(column, ",)")]
+            while self.accept("punct", ","):
+                values.append(self.raw_value(column, ",)"))
+            self.take("punct", ")")
+            return Compare(column, "in", tuple(values))
+
+        op = self.take("op")
+        return Compare(column, op, self.raw_value(column, ")", _CONDITION_STOPS))
+
+    def raw_value(
+        self, column: str, stop_chars: str, stop_words: Sequence[str] = ()
+    ) -> str | Param:
+        """Read a value as typed, up to a stop character or word.
+
+        A quoted value ends at its closing quote; inside it a backslash
+        escapes a quote or a backslash. An unquoted one may hold
+        spaces and operator characters (`John Smith`, `x<y`, `f(x)`): it
+        ends at a stop character outside its own parentheses or before
+        a stop word.
+        """
+        text = self.text
+        start = self.pos
+        while start < len(text) and text[start].isspace():
+            start += 1
+        if start < len(text) and text[start] in "\"'":
+            token = self.take("string")
+            quote = token[0]
+            body = _ESCAPE_RE.sub(r"\1", token[1:-1])
+            return quote + body + quote
+        depth = 0
+        end = start
+        while end < len(text):
+            char = text[end]
+            if char in stop_chars and not (char == ")" and depth):
+                break
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char.isspace() and stop_words:
+                word = _NEXT_WORD_RE.match(text, end)
+                if word is not None and word.group(1).lower() in stop_words:
+                    break
+            end += 1
+        raw = text[start:end].strip()
+        if not raw:
+            token = self.peek()
+            found = token[1] if token else "end of clause"
+            raise ValueError(f"Expected value for '{column}', got '{found}'")
+        self.pos = end
+        if raw == "?":
+            self.params += 1
+            return Param(self.params - 1)
+        return raw
+
+    # --- statements ---------------------------------------------------
+
+    def statement(self) -> Statement | None:
+        command = self.take("word").lower()
+        if command == "insert":
+            return self.insert()
+        if command == "select":
+            return self.select()
+        if command == "update":
+            return self.update()
+        return self.delete()
+
+    def insert(self) -> Insert:
+        self.expect_word("into")
+        table = self.take("word")
+        self.expect_word("values")
+        parens = self.accept("punct", "(")
+        values: list[str | Param] = []
+        stops = ",)" if parens else ","
+        if not (parens and self.accept("punct", ")")):
+            values.append(self.raw_value("values", stops))
+            while self.accept("punct", ","):
+                values.append(self.raw_value("values", stops))
+            if parens:
+                self.take("punct", ")")
+        self.end()
+        return Insert(table, tuple(values))
+
+    def select(self) -> Select | None:
+        # select <aggregates> ... and select ... join ... are parsed elsewhere
+        if not self.accept_word("from"):
+            return None
+        table = self.take("word")
+        token = self.peek()
+        if token is not None and token[0] == "word" and token[1].lower() == "join":
+            return None
+
+        start = self.paging_start()
+        text = self.text
+        if start is not None:
+            self.text = text[:start]
+        where = self.condition() if self.accept_word("where") else None
+        self.end()
+        limit = offset = None
+        if start is not None:
+            self.text, self.pos = text, start
+            limit, offset = self.paging()
+        return Select(table, where, limit, offset)
+
+    def paging_start(self) -> int | None:
+        """Position of a trailing `limit N [offset M]` or `offset M` clause.
+
+        The rest of the text is walked token by token, so `limit` inside
+        a quoted value is never taken for the clause.
+        """
+        start, pos, params = self.pos, self.pos, self.params
+        found = None
+        while found is None and pos < len(self.text):
+            self.pos = pos
+            try:
+                kind, value, end = self._next()
+            except ValueError:
+                # a stray quote inside an unquoted value
+                pos += 1
+                continue
+            if kind == "word" and value.lower() in _PAGING_WORDS:
+                try:
+                    self.paging()
+                    if self.peek() is None:
+                        found = pos
+                except ValueError:
+                    pass
+                self.params = params
+            pos = end
+        self.pos = start
+        return found
+
+    def paging(self) -> tuple[Any, Any]:
+        limit = offset = None
+        if self.accept_word("limit"):
+            limit = self._paging_value()
+            if self.accept_word("offset"):
+                offset = self._paging_value()
+        else:
+            self.expect_word("offset")
+            offset = self._paging_value()
+        self.end()
+        return limit, offset
+
+    def _paging_value(self) -> str | Param:
+        raw = self.take("word")
+        if raw != "?":
+            return raw
+        self.params += 1
+        return Param(self.params - 1)
+
+    def update(self) -> Update:
+        table = self.take("word")
+        self.expect_word("set")
+        assignments = []
+        while True:
+            column = self.take("word")
+            self.take("op", "=")
+            assignments.append((column, self.raw_value(column, ",", _SET_STOPS)))
+            if not self.accept("punct", ","):
+                break
+        self.expect_word("where")
+        where = self.condition()
+        self.end()
+        return Update(table, tuple(assignments), where)
+
+    def delete(self) -> Delete:
+        self.expect_word("from")
+        table = self.take("word")
+        self.expect_word("where")
+        where = self.condition()
+        self.end()
+        return Delete(table, where)
+
+
+def parse_condition(where_clause: str) -> Expr:
+    """Parse a WHERE clause into an unbound tree (raw values, Param)."""
+    parser = _Parser(where_clause)
+    expr = parser.condition()
+    parser.end()
+    return expr
+
+
+def parse_statement(text: str) -> Statement | None:
+    """Parse insert/select/update/delete into an unbound statement template.
+
+    Values stay raw or Param (`?`) until bind_statement. Returns None for
+    other commands, including aggregate selects and joins.
     """
-    Parse WHERE clause with AND conditions.
+    head = text.split(None, 1)
+    if not head or head[0].lower() not in _STATEMENT_COMMANDS:
+        return None
+    return _Parser(text).statement()
+
+
+def split_paging(text: str) -> tuple[str, int | None, int | None]:
+    """Cut a trailing limit/offset clause off a command.
+
+    Returns the rest of the text and the counts; ValueError if a count is
+    not a non-negative integer.
     """
-    column_types = {col["name"]: col["type"] for col in columns}
-    conditions = []
+    parser = _Parser(text)
+    start = parser.paging_start()
+    if start is None:
+        return parser.text, None, None
+    parser.pos = start
+    limit, offset = parser.paging()
+    return parser.text[:start], _count(limit, ()), _count(offset, ())
 
-    parts = re.split(r"\s+and\s+", where_clause, flags=re.IGNORECASE)
 
-    for part in parts:
-        if "=" not in part:
-            raise ValueError("Invalid WHERE condition")
+def _bound(raw: Any, params: Sequence[Any]) -> Any:
+    if not isinstance(raw, Param):
+        return raw
+    if raw.index >= len(params):
+        raise ValueError(f"No value for parameter {raw.index + 1}")
+    return params[raw.index]
 
-        column, raw_value = part.split("=", 1)
-        column = column.strip()
 
-        if column not in column_types:
-            raise ValueError(f"Unknown column '{column}'")
+def bind_expression(
+    expr: Expr,
+    column_types: dict[str, str],
+    convert_value,
+    params: Sequence[Any] = (),
+) -> Expr:
+    """Check columns and convert raw values and parameters to column types."""
+    if not isinstance(expr, Compare):
+        items = tuple(
+            bind_expression(item, column_types, convert_value, params)
+            for item in expr.items
+        )
+        return And(items) if isinstance(expr, And) else Or(items)
 
-        value = convert_value(raw_value.strip(), column_types[column])
-        conditions.append((column, "=", value))
+    column = expr.column
+    if column not in column_types:
+        raise ValueError(f"Unknown column '{column}'")
+    kind = column_types[column]
+    if expr.op == "in":
+        value: Any = tuple(
+            convert_value(_bound(raw, params), kind) for raw in expr.value
+        )
+    else:
+        value = convert_value(_bound(expr.value, params), kind)
+    return Compare(column, expr.op, value)
+
+
+def _count(raw: Any, params: Sequence[Any]) -> int | None:
+    if raw is None:
+        return None
+    value = _bound(raw, params)
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        count = -1
+    if count < 0 or isinstance(value, bool):
+        raise ValueError("limit/offset")
+    return count
+
+
+def bind_statement(
+    statement: Statement,
+    column_types: dict[str, str],
+    convert_value,
+    params: Sequence[Any] = (),
+) -> Statement:
+    """Bind `?` parameters; convert where/set values to column types.
 
-    return conditions
+    Insert values are only substituted: insert_row converts them itself.
+    """
+    if isinstance(statement, Insert):
+        values = tuple(_bound(raw, params) for raw in statement.values)
+        return statement._replace(values=values)
+
+    where = statement.where
+    if where is not None:
+        where = bind_expression(where, column_types, convert_value, params)
+    if isinstance(statement, Select):
+        return Select(
+            statement.table,
+            where,
+            _count(statement.limit, params),
+            _count(statement.offset, params),
+        )
+    if isinstance(statement, Update):
+        assignments = []
+        for column, raw in statement.assignments:
+            if column not in column_types:
+                raise ValueError(f"Unknown column '{column}'")
+            value = convert_value(_bound(raw, params), column_types[column])
+            assignments.append((column, value))
+        return Update(statement.table, tuple(assignments), where)
+    return statement._replace(where=where)
+
+
+def parse_where_expression(
+    where_clause: str,
+    columns: list[dict],
+    convert_value,
+) -> Expr:
+    """
+    Parse WHERE clause with =, !=, <, <=, >, >=, IN, AND, OR and parentheses.
+    """
+    column_types = {col["name"]: col["type"] for col in columns}
+    return bind_expression(parse_condition(where_clause), column_types, convert_value)
@@ -0,0 +1,250 @@
+"""Планировщик запросов к одной таблице и статистика для него.
+
+Способы выполнения: поиск по ID (таблица в памяти, условие ID = ...),
+поиск по индексу, векторное выполнение по столбцам, параллельный и обычный
+полный просмотр. Поиск по ID и параллельный просмотр core выбирает сам,
+планировщик лишь предсказывает их; его решение — откуда брать кандидатов:
+из индекса или из столбцов таблицы (vector.py, если режим включён). Если
+по статистике условие выбирает больше INDEX_MAX_FRACTION строк таблицы,
+обход индекса и выборка строк по ID дороже полного просмотра, и индекс
+не используется.
+
+Статистика по столбцам (оценка числа различных значений, min и max)
+собирается командой analyze и хранится в метаданных таблицы под ключом
+"analyze". Без неё индекс используется всегда, как раньше, а оценки
+числа строк берутся по умолчанию.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Any, Collection, Iterable, NamedTuple
+
+from .index import candidate_ids, table_indexes
+from .parallel import parallel_available
+from .parser import And, Expr, Or
+from .query import equality_value, expression_columns, to_expression
+from .stats import compute_stats
+from .store import TableStore
+from .table import Table
+from .vector import vector_enabled
+
+METHOD_ID = "id"
+METHOD_INDEX = "index"
+METHOD_VECTOR = "vector"
+METHOD_PARALLEL = "parallel"
+METHOD_SCAN = "scan"
+METHOD_NAMES = {
+    METHOD_ID: "поиск по ID",
+    METHOD_INDEX: "поиск по индексу",
+    METHOD_VECTOR: "векторное выполнение по столбцам",
+    METHOD_PARALLEL: "параллельный полный просмотр",
+    METHOD_SCAN: "полный просмотр",
+}
+
+# Доля строк, начиная с которой полный просмотр дешевле индекса
+# (замер на таблице в памяти: диапазон по упорядоченному индексу и
+# просмотр сравниваются примерно на половине строк).
+INDEX_MAX_FRACTION = 0.5
+# Доли строк под условием, если статистики по столбцу нет.
+DEFAULT_EQUALITY = 0.1
+DEFAULT_RANGE = 1 / 3
+
+# Сколько минимальных хешей хранит оценка числа различных значений.
+_KMV_SIZE = 1024
+_MASK = (1 << 64) - 1
+
+
+class Plan(NamedTuple):
+    table: str
+    method: str
+    rows: int  # строк в таблице
+    estimate: float  # ожидаемое число подходящих строк
+    ids: Collection[int] | None = None  # кандидаты из индекса или столбцов
+    index_columns: tuple[str, ...] = ()
+    analyzed: bool = False
+
+
+# --- статистика -------------------------------------------------------
+
+
+def _hash(value: Any) -> int:
+    # hash() целых чисел — само число: перемешиваем, чтобы хеши
+    # последовательных ID равномерно легли на [0, 2^64).
+    h = (hash(value) * 0x9E3779B97F4A7C15) & _MASK
+    return h ^ (h >> 31)
+
+
+class _Distinct:
+    """Оценка числа различных значений по k минимальным хешам (KMV).
+
+    Пока различных значений меньше _KMV_SIZE, счёт точный; дальше память
+    не растёт, а погрешность около 3%.
+    """
+
+    __slots__ = ("heap", "members")
+
+    def __init__(self) -> None:
+        self.heap: list[int] = []  # хеши со знаком минус: вершина — наибольший
+        self.members: set[int] = set()
+
+    def add(self, value: Any) -> None:
+        h = _hash(value)
+        if h in self.members:
+            return
+        if len(self.heap) < _KMV_SIZE:
+            heapq.heappush(self.heap, -h)
+            self.members.add(h)
+        elif h < -self.heap[0]:
+            self.members.discard(-heapq.heapreplace(self.heap, -h))
+            self.members.add(h)
+
+    def estimate(self) -> int:
+        if len(self.heap) < _KMV_SIZE:
+            return len(self.heap)
+        return round((_KMV_SIZE - 1) * (_MASK + 1) / (-self.heap[0] + 1))
+
+
+def analyze_rows(rows: Iterable[Any], columns: list[dict]) -> dict[str, Any]:
+    """Статистика по столбцам за один проход по строкам."""
+    names = [col["name"] for col in columns]
+    distinct = {name: _Distinct() for name in names}
+    low: dict[str, Any] = {}
+    high: dict[str, Any] = {}
+    count = 0
+    for row in rows:
+        count += 1
+        for name in names:
+            value = row.get(name)
+            if value is None:
+                continue
+            distinct[name].add(value)
+            if name not in low or value < low[name]:
+                low[name] = value
+            if name not in high or value > high[name]:
+                high[name] = value
+    return {
+        "rows": count,
+        "columns": {
+            name: {
+                "distinct": distinct[name].estimate(),
+                "min": low.get(name),
+                "max": high.get(name),
+            }
+            for name in names
+        },
+    }
+
+
+def analyze_table(store: TableStore, table_name: str) -> dict[str, Any]:
+    """Собрать статистику таблицы в метаданные и пересчитать её счётчики."""
+    store.lock_for_write(table_name)
+    table_meta = store.metadata[table_name]
+    table_data = store.table(table_name)
+    table_meta["analyze"] = analyze_rows(table_data, table_meta["columns"])
+    table_meta["stats"] = compute_stats(table_meta, table_data)
+    store.mark_metadata_dirty()
+    return table_meta["analyze"]
+
+
+# --- оценка и выбор плана ---------------------------------------------
+
+
+def _range_fraction(op: str, value: Any, stats: dict) -> float:
+    low, high = stats.get("min"), stats.get("max")
+    numbers = (low, high, value)
+    if not all(type(v) is int for v in numbers) or high <= low:
+        return DEFAULT_RANGE
+    below = (value - low) / (high - low)
+    fraction = below if op in {"<", "<="} else 1 - below
+    return min(1.0, max(0.0, fraction))
+
+
+def selectivity(expr: Expr, columns: dict[str, dict]) -> float:
+    """Ожидаемая доля строк под условием (столбцы считаются независимыми)."""
+    if isinstance(expr, And):
+        result = 1.0
+        for item in expr.items:
+            result *= selectivity(item, columns)
+        return result
+    if isinstance(expr, Or):
+        miss = 1.0
+        for item in expr.items:
+            miss *= 1 - selectivity(item, columns)
+        return 1 - miss
+
+    stats = columns.get(expr.column) or {}
+    distinct = stats.get("distinct")
+    equal = 1 / distinct if distinct else DEFAULT_EQUALITY
+    if expr.op == "=":
+        return equal
+    if expr.op == "!=":
+        return 1 - equal
+    if expr.op == "in":
+        return min(1.0, equal * len(expr.value))
+    return _range_fraction(expr.op, expr.value, stats)
+
+
+def plan_query(
+    store: TableStore,
+    table_name: str,
+    where_clause: dict[str, Any] | Expr | None,
+) -> Plan:
+    """Выбрать способ выполнения select/update/delete по таблице."""
+    table_meta = store.table_meta(table_name)
+    if table_meta is None:
+        return Plan(table_name, METHOD_SCAN, 0, 0)
+    analysis = table_meta.get("analyze")
+    columns = analysis.get("columns", {}) if isinstance(analysis, dict) else {}
+    reader = store.reader(table_name)
+    rows = len(reader)
+
+    expr = to_expression(where_clause)
+    if expr is None:
+        return Plan(table_name, METHOD_SCAN, rows, rows, analyzed=bool(columns))
+    estimate = rows * selectivity(expr, columns)
+
+    by_id, _ = equality_value(expr, "ID")
+    if by_id:
+        # ID уникален: индекс не сузит выборку, а ленивое чтение
+        # просматривается без загрузки таблицы и индексов
+        estimate = min(estimate, 1)
+        method = METHOD_ID if isinstance(reader, Table) else METHOD_SCAN
+        return Plan(table_name, method, rows, estimate, analyzed=bool(columns))
+
+    indexed = table_indexes(store.metadata, table_name)
+    worth_it = not columns or estimate <= rows * INDEX_MAX_FRACTION
+    if indexed and worth_it:
+        ids = candidate_ids(store.indexes(table_name), expr)
+        if ids is not None:
+            used = tuple(sorted(expression_columns(expr) & set(indexed)))
+            return Plan(
+                table_name, METHOD_INDEX, rows, estimate, ids, used, bool(columns)
+            )
+
+    if vector_enabled() and isinstance(reader, Table):
+        ids = store.vectors(table_name).select(expr)
+        return Plan(table_name, METHOD_VECTOR, rows, estimate, ids, (), bool(columns))
+
+    method = METHOD_PARALLEL if parallel_available(rows) else METHOD_SCAN
+    return Plan(table_name, method, rows, estimate, analyzed=bool(columns))
+
+
+def print_plan(plan: Plan, actual: int, planning: float, execution: float) -> None:
+    """Напечатать план с оценкой и фактическим результатом (explain)."""
+    name = METHOD_NAMES[plan.method]
+    if plan.index_columns:
+        name += f" ({', '.join(plan.index_columns)})"
+    print(f"План: {name}")
+    print(f"Таблица: {plan.table}, строк: {plan.rows}")
+    source = "по статистике analyze" if plan.analyzed else "без статистики analyze"
+    print(f"Оценка: {round(plan.estimate)} строк ({source})")
+    if plan.method == METHOD_INDEX:
+        print(f"Кандидатов из индекса: {len(plan.ids)}")
+    elif plan.method == METHOD_VECTOR:
+        print(f"Выбрано по столбцам: {len(plan.ids)}")
+    print(f"Фактически: {actual} строк")
+    print(
+        f"Время: планирование {planning * 1000:.3f} мс, "
+        f"выполнение {execution * 1000:.3f} мс"
+    )
@@ -0,0 +1,131 @@
+"""Компиляция условий WHERE в предикаты.
+
+Условие (дерево из parser.Compare/And/Or) один раз превращается в
+исходный текст Python-функции, где имена столбцов и константы уже
+подставлены, и компилируется. Проверка строки — один вызов функции без
+разбора условия на каждой строке. Скомпилированные предикаты кэшируются
+по самому дереву условия, а код функции — по её тексту: константы в текст
+не входят, поэтому условия одной формы с разными значениями (шаблоны
+с `?`) компилируются один раз.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from types import CodeType
+from typing import Any, Callable
+
+from .parser import And, Compare, Expr, Or
+
+Predicate = Callable[[Any], bool]
+
+# Сравнения порядка с None (нет значения в строке) считаются ложными.
+_ORDER_OPS = {"<", "<=", ">", ">="}
+_PY_OPS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def to_expression(where_clause: dict | Expr | None) -> Expr | None:
+    """Привести условие к дереву: словарь {столбец: значение} — это AND из =."""
+    if where_clause is None or isinstance(where_clause, (Compare, And, Or)):
+        return where_clause
+    items = tuple(Compare(col, "=", value) for col, value in where_clause.items())
+    if not items:
+        return None
+    return items[0] if len(items) == 1 else And(items)
+
+
+def _source(expr: Expr, consts: list[Any], temps: list[str]) -> str:
+    if isinstance(expr, And):
+        return "(" + " and ".join(_source(e, consts, temps) for e in expr.items) + ")"
+    if isinstance(expr, Or):
+        return "(" + " or ".join(_source(e, consts, temps) for e in expr.items) + ")"
+
+    name = f"_c{len(consts)}"
+    getter = f"get({expr.column!r})"
+    if expr.op == "in":
+        consts.append(frozenset(expr.value))
+        return f"({getter} in {name})"
+
+    consts.append(expr.value)
+    op = _PY_OPS[expr.op]
+    if expr.op not in _ORDER_OPS:
+        return f"({getter} {op} {name})"
+
+    temp = f"_v{len(temps)}"
+    temps.append(temp)
+    return f"(({temp} := {getter}) is not None and {temp} {op} {name})"
+
+
+@lru_cache(maxsize=256)
+def _code(body: str) -> CodeType:
+    source = f"def predicate(row):\n    get = row.get\n    return {body}\n"
+    return compile(source, "<where>", "exec")
+
+
+@lru_cache(maxsize=256)
+def _compile(expr: Expr) -> Predicate:
+    consts: list[Any] = []
+    body = _source(expr, consts, [])
+    namespace = {f"_c{i}": value for i, value in enumerate(consts)}
+    exec(_code(body), namespace)
+    return namespace["predicate"]
+
+
+def _always(row: Any) -> bool:
+    return True
+
+
+def compile_where(where_clause: dict | Expr | None) -> Predicate:
+    """Предикат строки для условия WHERE (словарь, дерево или None)."""
+    expr = to_expression(where_clause)
+    if expr is None:
+        return _always
+    return _compile(expr)
+
+
+def equality_value(where_clause: dict | Expr | None, column: str) -> tuple[bool, Any]:
+    """(True, значение), если условие требует column = значение для всех строк.
+
+    Годится только равенство на верхнем уровне или внутри верхнего AND:
+    тогда остальные строки заведомо не подходят.
+    """
+    expr = to_expression(where_clause)
+    terms = expr.items if isinstance(expr, And) else (expr,)
+    for term in terms:
+        if isinstance(term, Compare) and term.column == column and term.op == "=":
+            return True, term.value
+    return False, None
+
+
+def expression_columns(where_clause: dict | Expr | None) -> set[str]:
+    """Столбцы, от которых зависит условие."""
+    expr = to_expression(where_clause)
+    if expr is None:
+        return set()
+    if isinstance(expr, Compare):
+        return {expr.column}
+    columns: set[str] = set()
+    for item in expr.items:
+        columns |= expression_columns(item)
+    return columns
+
+
+def expression_to_json(expr: Expr | None) -> list | None:
+    """Дерево условия в виде JSON-совместимых списков (для кэша на диске)."""
+    if expr is None:
+        return None
+    if isinstance(expr, Compare):
+        value = list(expr.value) if expr.op == "in" else expr.value
+        return ["cmp", expr.column, expr.op, value]
+    kind = "and" if isinstance(expr, And) else "or"
+    return [kind, [expression_to_json(item) for item in expr.items]]
+
+
+def expression_from_json(data: list | None) -> Expr | None:
+    if data is None:
+        return None
+    if data[0] == "cmp":
+        _, column, op, value = data
+        return Compare(column, op, tuple(value) if op == "in" else value)
+    items = tuple(expression_from_json(item) for item in data[1])
+    return And(items) if data[0] == "and" else Or(items)
@@ -0,0 +1,109 @@
+"""Компактное представление строк таблицы.
+
+Для каждой схемы генерируется класс со __slots__: значения хранятся в
+слотах c0, c1, ..., а общая для всех строк карта «столбец -> слот» живёт
+в классе. Такая строка занимает в несколько раз меньше памяти, чем dict
+с повторяющимися именами столбцов, и поддерживает тот же минимальный
+интерфейс (get, [], keys, items, update), которым пользуется core.
+В dict строки превращаются только на границах: при записи на диск,
+экспорте и выдаче клиенту.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Iterable, Iterator
+
+
+class RowBase:
+    """Общие методы строк со слотами; конкретные классы создаёт row_class()."""
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _slots: tuple[str, ...] = ()
+    _slot_of: dict[str, str] = {}
+
+    def __init__(self, *values: Any) -> None:
+        for slot, value in zip(self._slots, values, strict=True):
+            setattr(self, slot, value)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> RowBase:
+        return cls(*[data.get(name) for name in cls._fields])
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self._slot_of.get(key)
+        if slot is None:
+            return default
+        return getattr(self, slot)
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, self._slot_of[key])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, self._slot_of[key], value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._slot_of
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RowBase):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def keys(self) -> tuple[str, ...]:
+        return self._fields
+
+    def values(self) -> list[Any]:
+        return [getattr(self, slot) for slot in self._slots]
+
+    def items(self) -> list[tuple[str, Any]]:
+        return list(zip(self._fields, self.values(), strict=True))
+
+    def update(self, changes: dict[str, Any]) -> None:
+        # Сначала проверяем все столбцы, чтобы не обновить строку частично.
+        slots = [self._slot_of[key] for key in changes]
+        for slot, value in zip(slots, changes.values(), strict=True):
+            setattr(self, slot, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"Row({self.to_dict()!r})"
+
+
+@lru_cache(maxsize=None)
+def row_class(fields: tuple[str, ...]) -> type[RowBase]:
+    """Класс строки со слотами для заданного порядка столбцов."""
+    slots = tuple(f"c{i}" for i in range(len(fields)))
+    return type(
+        "Row",
+        (RowBase,),
+        {
+            "__slots__": slots,
+            "_fields": fields,
+            "_slots": slots,
+            "_slot_of": dict(zip(fields, slots, strict=True)),
+        },
+    )
+
+
+def to_dict(row: Any) -> dict[str, Any]:
+    """Строка любого представления в виде dict (для вывода наружу)."""
+    return row if isinstance(row, dict) else dict(row.items())
+
+
+def as_dicts(rows: Iterable[Any]) -> Iterator[dict[str, Any]]:
+    for row in rows:
+        yield to_dict(row)
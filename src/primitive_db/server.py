@@ -0,0 +1,190 @@
+"""Сервер базы данных: одна «тёплая» сессия для многих клиентов.
+
+`database serve` держит TableStore (метаданные, таблицы, индексы, кэш
+select) в памяти и принимает команды той же грамматики, что и консоль,
+через Unix-сокет или TCP на localhost. Протокол — JSON-строки:
+
+    -> {"id": 1, "command": "select from users where age > 30"}
+    <- {"id": 1, "ok": true, "output": [...], "rows": [{...}, ...]}
+
+output — строки, которые команда напечатала бы в консоли; rows есть только
+у select и содержит записи результата. Если команда не выполнена (ошибка
+разбора, проверки значений, нет таблицы и т. п.), ok=false и error — текст
+ошибки. Команда exit закрывает соединение.
+
+Команды выполняются в рабочем потоке, поэтому цикл событий продолжает
+принимать клиентов, пока идёт долгий запрос, но строго по одной: сессия,
+кэш select и перехват stdout общие, и даже чтения не выполняются
+параллельно — долгий полный просмотр задерживает команды всех клиентов.
+Транзакция принадлежит клиенту, который выполнил begin: команды остальных
+клиентов ждут её commit/rollback, а при разрыве соединения она
+откатывается.
+Подтверждения удаления на сервере не запрашиваются (см. --confirm), время
+выполнения команд не печатается.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+from contextlib import redirect_stdout
+from typing import Any, Iterable
+
+from .cache import invalidate_select_cache, save_select_cache
+from .constants import SERVER_HOST, SERVER_PORT
+from .decorators import (
+    TIMING_OFF,
+    set_confirm_policy,
+    set_timing_mode,
+    take_error,
+)
+from .engine import _execute
+from .errors import DatabaseError
+from .rows import to_dict
+from .store import TableStore
+
+
+class Server:
+    """Общая сессия и обработка подключений."""
+
+    def __init__(self, store: TableStore) -> None:
+        self.store = store
+        # Держится на время команды, а на время транзакции — её владельцем.
+        # Чтения тоже берут его: TableStore, кэш select и redirect_stdout
+        # не рассчитаны на одновременные команды из нескольких потоков.
+        self._lock = asyncio.Lock()
+
+    def _run_command(self, command: str, params: list) -> dict[str, Any]:
+        output = io.StringIO()
+        response: dict[str, Any] = {"ok": True}
+
+        def collect(rows: Iterable) -> None:
+            response["rows"] = [to_dict(row) for row in rows]
+
+        take_error()
+        with redirect_stdout(output):
+            try:
+                if not _execute(self.store, command, collect, params):
+                    response["closed"] = True
+                self.store.maybe_flush()
+                error = take_error()
+                if error is not None:
+                    # команда отклонена: сообщение уже напечатано в output
+                    response.update(ok=False, error=error)
+            except DatabaseError as exc:
+                response.update(ok=False, error=str(exc))
+            except Exception as exc:
+                response.update(
+                    ok=False, error=f"Произошла непредвиденная ошибка: {exc}"
+                )
+        response["output"] = output.getvalue().splitlines()
+        return response
+
+    def _rollback(self) -> None:
+        for table_name in self.store.rollback():
+            invalidate_select_cache(table_name)
+        self.store.maybe_flush()
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, response: dict[str, Any]
+    ) -> None:
+        writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        owns_transaction = False
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    command = str(request["command"]).strip()
+                    params = request.get("params") or []
+                    if not isinstance(params, list):
+                        raise TypeError(params)
+                except (ValueError, TypeError, KeyError):
+                    await self._respond(
+                        writer, {"ok": False, "error": "Некорректный запрос"}
+                    )
+                    continue
+                request_id = request.get("id")
+
+                if not command:
+                    await self._respond(writer, {"id": request_id, "ok": True})
+                    continue
+
+                if not owns_transaction:
+                    await self._lock.acquire()
+                try:
+                    response = await asyncio.to_thread(
+                        self._run_command, command, params
+                    )
+                finally:
+                    owns_transaction = self.store.in_transaction
+                    if not owns_transaction:
+                        self._lock.release()
+
+                await self._respond(writer, {"id": request_id, **response})
+                if response.get("closed"):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if owns_transaction:
+                try:
+                    await asyncio.to_thread(self._rollback)
+                finally:
+                    self._lock.release()
+            writer.close()
+
+    async def flush_periodically(self) -> None:
+        """Сбрасывать изменения по flush_interval, даже если команд нет."""
+        while True:
+            await asyncio.sleep(self.store.flush_interval)
+            if self._lock.locked():
+                continue
+            async with self._lock:
+                await asyncio.to_thread(self.store.maybe_flush)
+
+
+async def serve(
+    socket_path: str | None = None,
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    confirm: bool = True,
+) -> None:
+    """Запустить сервер и обслуживать клиентов до отмены (Ctrl+C)."""
+    set_confirm_policy(confirm)
+    # время выполнения печатается в stdout и попало бы в output ответа
+    set_timing_mode(TIMING_OFF)
+    store = TableStore()
+    if store.recover():
+        print("Восстановлена транзакция, прерванная при фиксации.")
+    server = Server(store)
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        listener = await asyncio.start_unix_server(server.handle, path=socket_path)
+        address = socket_path
+    else:
+        listener = await asyncio.start_server(server.handle, host=host, port=port)
+        address = f"{host}:{port}"
+
+    flusher = None
+    if store.flush_interval > 0:
+        flusher = asyncio.create_task(server.flush_periodically())
+    print(f"Сервер базы данных слушает {address}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if flusher is not None:
+            flusher.cancel()
+        store.close()
+        save_select_cache(store)
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
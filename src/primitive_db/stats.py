@@ -0,0 +1,119 @@
+"""Текущие счётчики таблицы в метаданных: число строк, min/max, суммы.
+
+metadata[таблица]["stats"] = {"rows": N, "min": {...}, "max": {...},
+"sum": {...}} обновляется по журналу изменений каждой записи, поэтому
+count(*), min, max, sum и avg по всей таблице отвечаются без просмотра.
+
+Сумма (для int-столбцов) всегда точна. Минимум и максимум при вставке
+только расширяются; если удалили или изменили строку с крайним
+значением, новый крайний без просмотра неизвестен, и столбец
+вычёркивается из min/max: такие запросы считаются просмотром. У пустой
+таблицы min/max пусты, но точны.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+_EXTREMES = ("min", "max")
+
+
+def empty_stats() -> dict[str, Any]:
+    return {"rows": 0, "min": {}, "max": {}, "sum": {}}
+
+
+def table_stats(table_meta: dict | None) -> dict[str, Any] | None:
+    """Счётчики таблицы или None, если их нет (таблица создана до них)."""
+    if not isinstance(table_meta, dict):
+        return None
+    stats = table_meta.get("stats")
+    return stats if isinstance(stats, dict) else None
+
+
+def compute_stats(table_meta: dict, rows: Iterable[Any]) -> dict[str, Any]:
+    """Счётчики заново по всем строкам: min/max снова точны (analyze)."""
+    meta = {**table_meta, "stats": empty_stats()}
+    apply_changes(meta, ({"op": "insert", "row": row} for row in rows))
+    return meta["stats"]
+
+
+def _int_columns(table_meta: dict) -> list[str]:
+    return [c["name"] for c in table_meta.get("columns", []) if c["type"] == "int"]
+
+
+def _extend(stats: dict, column: str, value: Any) -> None:
+    if value is None:
+        return
+    low = stats["min"]
+    high = stats["max"]
+    if column in low and value < low[column]:
+        low[column] = value
+    if column in high and value > high[column]:
+        high[column] = value
+
+
+def _replace(stats: dict, column: str, old: Any, new: Any) -> None:
+    """Значение столбца в одной строке изменилось с old на new."""
+    low = stats["min"]
+    high = stats["max"]
+    if column in low:
+        if new is not None and new < low[column]:
+            low[column] = new
+        elif old == low[column]:
+            del low[column]
+    if column in high:
+        if new is not None and new > high[column]:
+            high[column] = new
+        elif old == high[column]:
+            del high[column]
+
+
+def _forget_if_extreme(stats: dict, column: str, value: Any) -> None:
+    for kind in _EXTREMES:
+        if stats[kind].get(column) == value:
+            del stats[kind][column]
+
+
+def apply_changes(table_meta: dict, changes: Iterable[dict]) -> bool:
+    """Обновить счётчики по записям журнала; False — счётчиков нет."""
+    stats = table_stats(table_meta)
+    if stats is None:
+        return False
+    sums = stats["sum"]
+    int_columns = _int_columns(table_meta)
+
+    for entry in changes:
+        op = entry["op"]
+        if op == "insert":
+            row = entry["row"]
+            if stats["rows"] == 0:
+                stats["min"] = dict(row)
+                stats["max"] = dict(row)
+                stats["sum"] = sums = {col: 0 for col in int_columns}
+            else:
+                for column, value in row.items():
+                    _extend(stats, column, value)
+            for column in int_columns:
+                sums[column] = sums.get(column, 0) + (row.get(column) or 0)
+            stats["rows"] += 1
+        elif op == "delete":
+            row = entry["row"]
+            stats["rows"] -= 1
+            if stats["rows"] <= 0:
+                stats.update(empty_stats())
+                sums = stats["sum"]
+                continue
+            for column, value in row.items():
+                _forget_if_extreme(stats, column, value)
+            for column in int_columns:
+                sums[column] = sums.get(column, 0) - (row.get(column) or 0)
+        elif op == "update":
+            for column, new in entry["set"].items():
+                old = entry["old"].get(column)
+                if new == old:
+                    continue
+                _replace(stats, column, old, new)
+                if column in int_columns:
+                    sums[column] = sums.get(column, 0) + (new or 0) - (old or 0)
+    return True
+
@@ -0,0 +1,580 @@
+from __future__ import annotations
+
+import copy
+import time
+from typing import Any
+
+from .constants import (
+    DURABILITY,
+    DURABILITY_GROUP,
+    DURABILITY_OFF,
+    FLUSH_INTERVAL,
+    GROUP_COMMIT_SIZE,
+    META_FILE,
+    STORAGE_JSON,
+    STORAGE_LOG,
+    TX_JOURNAL_FILE,
+)
+from .index import (
+    HashIndex,
+    SortedIndex,
+    apply_changes,
+    load_indexes,
+    save_indexes,
+    table_indexes,
+)
+from .lazy import LazyColumnarRows, LazyJsonRows
+from .locks import FileLock, metadata_lock, remove_table_lock, table_lock
+from .stats import apply_changes as apply_stats
+from .table import Table
+from .utils import (
+    apply_log_entries,
+    compact_table,
+    delete_index_file,
+    delete_snapshot,
+    delete_table_data_file,
+    delete_table_log,
+    delete_tx_journal,
+    file_stamp,
+    index_stamp,
+    load_metadata,
+    load_table_data,
+    load_tx_journal,
+    open_lazy_rows,
+    persist_table,
+    replace_snapshot,
+    save_metadata,
+    save_tx_journal,
+    table_format,
+    table_stamp,
+)
+from .vector import ColumnBatch
+
+
+def _fields(table_meta: dict | None) -> list[str] | None:
+    """Имена столбцов схемы для компактных строк (None — обычные dict)."""
+    if table_meta is None or not table_meta.get("columns"):
+        return None
+    return [col["name"] for col in table_meta["columns"]]
+
+
+_MISSING = object()
+
+
+def _delete_files(table_name: str, index_columns: list[str]) -> None:
+    delete_table_data_file(table_name)
+    for column in index_columns:
+        delete_index_file(table_name, column)
+
+
+class TableStore:
+    """Таблицы и метаданные, загруженные на время сессии.
+
+    Каждая таблица читается с диска один раз и дальше живёт в памяти.
+    Изменения копятся в памяти (таблица помечается «грязной») и
+    записываются при flush(): по явной команде, при выходе или по
+    истечении flush_interval. Если файл таблицы или метаданных изменили
+    извне (другой mtime/размер), чистая копия перечитывается.
+
+    durability задаёт надёжность записи: full — сброс с fsync по
+    расписанию flush_interval; group — изменения group_size команд
+    сбрасываются вместе, одной записью с fsync; off — без fsync.
+
+    Между begin() и commit() ничего не пишется на диск: изменения всех
+    таблиц и метаданных фиксируются разом через журнал транзакции,
+    rollback() возвращает состояние на момент begin().
+
+    Несколько процессов могут работать с одним каталогом: чтение файлов
+    идёт под разделяемой блокировкой, а перед изменением таблицы
+    lock_for_write() берёт её исключительную блокировку и перечитывает
+    таблицу; блокировка держится до записи изменений на диск. Метаданные
+    записываются под своей блокировкой и сливаются с версией на диске
+    по таблицам, чтобы не затереть изменения других процессов.
+    """
+
+    def __init__(
+        self,
+        meta_file: str = META_FILE,
+        flush_interval: float = FLUSH_INTERVAL,
+        durability: str = DURABILITY,
+        group_size: int = GROUP_COMMIT_SIZE,
+        tx_file: str = TX_JOURNAL_FILE,
+    ) -> None:
+        self.meta_file = meta_file
+        self.tx_file = tx_file
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.group_size = group_size
+        self._group_commands = 0
+        self.metadata: dict = {}
+        # Метаданные в том виде, в каком их последний раз видели на диске:
+        # всё, чем self.metadata от них отличается, — изменения этой сессии.
+        self._meta_base: dict = {}
+        self._meta_stamp: tuple[int, int] | None = None
+        self._meta_dirty = False
+        self._meta_loaded = False
+        self._tables: dict[str, Table] = {}
+        self._stamps: dict[str, tuple] = {}
+        self._indexes: dict[str, dict[str, HashIndex | SortedIndex]] = {}
+        self._vectors: dict[str, ColumnBatch] = {}
+        self._pending: dict[str, list[dict[str, Any]]] = {}
+        self._readers: dict[str, tuple[tuple, LazyJsonRows | LazyColumnarRows]] = {}
+        self._seen: dict[str, tuple] = {}
+        self._versions: dict[str, int] = {}
+        self._last_flush = time.monotonic()
+        # Состояние открытой транзакции (None — транзакции нет).
+        self._tx_metadata: dict | None = None
+        self._tx_changes: dict[str, list[dict[str, Any]]] = {}
+        self._tx_dropped: dict[str, list[str]] = {}
+        self._write_locks: dict[str, FileLock] = {}
+
+    # --- чтение -------------------------------------------------------
+
+    def refresh_metadata(self) -> dict:
+        """Перечитать db_meta.json, если он изменился на диске.
+
+        Несохранённые изменения этой сессии при этом сохраняются.
+        """
+        stamp = file_stamp(self.meta_file)
+        if not self._meta_loaded or stamp != self._meta_stamp:
+            with metadata_lock(self.meta_file).hold():
+                stamp = file_stamp(self.meta_file)
+                disk = load_metadata(self.meta_file)
+            self._replace_metadata(self._merge_metadata(disk))
+            self._meta_base = copy.deepcopy(disk)
+            self._meta_stamp = stamp
+            self._meta_loaded = True
+        return self.metadata
+
+    def _replace_metadata(self, metadata: dict) -> None:
+        # Тот же объект словаря: на него ссылается engine в текущей команде.
+        self.metadata.clear()
+        self.metadata.update(metadata)
+
+    def _merge_metadata(self, disk: dict) -> dict:
+        """Метаданные с диска плюс таблицы, изменённые в этой сессии."""
+        merged = dict(disk)
+        for name in set(self._meta_base) | set(self.metadata):
+            ours = self.metadata.get(name, _MISSING)
+            if ours == self._meta_base.get(name, _MISSING):
+                continue
+            if ours is _MISSING:
+                merged.pop(name, None)
+            else:
+                merged[name] = ours
+        return merged
+
+    def table(self, table_name: str) -> Table:
+        """Таблица из памяти; перечитывается, только если файл изменили извне."""
+        if table_name in self._pending:
+            return self._tables[table_name]
+
+        table_meta = self.table_meta(table_name)
+        stamp = table_stamp(table_name, table_meta)
+        if table_name not in self._tables or self._stamps.get(table_name) != stamp:
+            self._drop_reader(table_name)
+            with table_lock(table_name).hold():
+                stamp = table_stamp(table_name, table_meta)
+                data = load_table_data(table_name, table_meta)
+            self._tables[table_name] = Table(data, _fields(table_meta))
+            self._stamps[table_name] = stamp
+            self._observe(table_name, stamp)
+            self._indexes.pop(table_name, None)
+            self._vectors.pop(table_name, None)
+        return self._tables[table_name]
+
+    def reader(self, table_name: str) -> Table | LazyJsonRows | LazyColumnarRows:
+        """Строки таблицы только для чтения.
+
+        Если таблица уже в памяти, возвращается она. Иначе большой снимок
+        открывается лениво через mmap (строки декодируются по обращению),
+        а маленький загружается как обычно.
+        """
+        if table_name in self._tables:
+            return self.table(table_name)
+
+        table_meta = self.table_meta(table_name)
+        stamp = table_stamp(table_name, table_meta)
+        cached = self._readers.get(table_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        self._drop_reader(table_name)
+        # индексы могли быть загружены для прежней версии файла
+        self._indexes.pop(table_name, None)
+
+        with table_lock(table_name).hold():
+            stamp = table_stamp(table_name, table_meta)
+            lazy = open_lazy_rows(table_name, table_meta)
+        if lazy is None:
+            return self.table(table_name)
+        self._readers[table_name] = (stamp, lazy)
+        self._observe(table_name, stamp)
+        return lazy
+
+    def _observe(self, table_name: str, stamp: tuple) -> None:
+        # Данные прочитаны с диска: если файл не тот, что видели раньше,
+        # его изменили извне — версия содержимого меняется.
+        seen = self._seen.get(table_name)
+        if seen is not None and seen != stamp:
+            self._versions[table_name] = self._versions.get(table_name, 0) + 1
+        self._seen[table_name] = stamp
+
+    def _wrote(self, table_name: str, stamp: tuple) -> None:
+        # Файл переписали мы сами: содержимое уже учтено, версия прежняя.
+        self._stamps[table_name] = stamp
+        self._seen[table_name] = stamp
+
+    def version(self, table_name: str) -> int:
+        """Номер версии содержимого таблицы, растёт при изменениях извне."""
+        return self._versions.get(table_name, 0)
+
+    def data_stamp(self, table_name: str) -> tuple | None:
+        """Отметка (mtime, размер) файлов, с которых прочитаны данные таблицы."""
+        return self._seen.get(table_name)
+
+    def _drop_reader(self, table_name: str) -> None:
+        # mmap не закрываем явно: на старый снимок могут ссылаться строки
+        # из кэша select, отображение освободится вместе с ними.
+        self._readers.pop(table_name, None)
+
+    def table_meta(self, table_name: str) -> dict | None:
+        table = self.metadata.get(table_name)
+        return table if isinstance(table, dict) else None
+
+    def storage(self, table_name: str) -> str:
+        table = self.table_meta(table_name)
+        if table is not None:
+            return table.get("storage", STORAGE_JSON)
+        return STORAGE_JSON
+
+    def indexes(self, table_name: str) -> dict[str, HashIndex | SortedIndex]:
+        if table_name not in self._indexes:
+            # Таблица читается, только если индекс придётся перестроить:
+            # с годными файлами индексов ленивое чтение сохраняется.
+            stamp = None
+            if table_name not in self._pending:
+                stamp = index_stamp(table_name, self.table_meta(table_name))
+            self._indexes[table_name] = load_indexes(
+                self.metadata, table_name, lambda: self.table(table_name), stamp
+            )
+        return self._indexes[table_name]
+
+    def forget_indexes(self, table_name: str) -> None:
+        self._indexes.pop(table_name, None)
+
+    def vectors(self, table_name: str) -> ColumnBatch:
+        """Таблица по столбцам для векторного выполнения (см. vector.py)."""
+        table = self.table(table_name)
+        batch = self._vectors.get(table_name)
+        if batch is None or len(batch) != len(table):
+            columns = self.metadata[table_name]["columns"]
+            batch = self._vectors[table_name] = ColumnBatch(columns, table)
+        return batch
+
+    def is_dirty(self, table_name: str | None = None) -> bool:
+        if table_name is None:
+            return bool(self._pending) or self._meta_dirty
+        return table_name in self._pending
+
+    # --- изменения ----------------------------------------------------
+
+    def lock_for_write(self, table_name: str) -> None:
+        """Захватить таблицу для изменения и перечитать её свежую версию.
+
+        Исключительная блокировка держится, пока изменения таблицы не
+        записаны на диск (flush или commit транзакции): другие процессы,
+        меняющие эту таблицу, ждут, а остальные таблицы свободны.
+        """
+        if table_name in self._write_locks:
+            return
+        self.refresh_metadata()
+        if table_name not in self.metadata:
+            return
+        lock = table_lock(table_name)
+        lock.acquire(exclusive=True)
+        self._write_locks[table_name] = lock
+        # пока ждали блокировку, таблицу могли изменить
+        self.refresh_metadata()
+        self.table(table_name)
+
+    def _release_write_locks(self, names: list[str] | None = None) -> None:
+        if self.in_transaction:
+            return
+        for name in list(self._write_locks) if names is None else names:
+            if name in self._pending:
+                continue
+            lock = self._write_locks.pop(name, None)
+            if lock is None:
+                continue
+            if name not in self.metadata:
+                # таблицу удалили: файл блокировки больше не нужен
+                remove_table_lock(name)
+            lock.release()
+
+    def record(self, table_name: str, changes: list[dict[str, Any]]) -> None:
+        """Учесть изменения таблицы: пометить грязной, обновить индексы и счётчики."""
+        if not changes:
+            return
+        if table_indexes(self.metadata, table_name):
+            apply_changes(self.indexes(table_name), changes)
+        if apply_stats(self.metadata.get(table_name), changes):
+            self._meta_dirty = True
+        batch = self._vectors.get(table_name)
+        if batch is not None and not batch.apply(changes):
+            self._vectors.pop(table_name)
+        pending = self._pending.setdefault(table_name, [])
+        # Снимок JSON переписывается целиком: сами записи журнала нужны
+        # только таблицам в режиме журнала.
+        if self.storage(table_name) == STORAGE_LOG:
+            pending.extend(changes)
+        if self.in_transaction:
+            self._tx_changes.setdefault(table_name, []).extend(changes)
+
+    def mark_metadata_dirty(self) -> None:
+        self._meta_dirty = True
+
+    def drop(self, table_name: str) -> None:
+        """Забыть таблицу (после drop_table): несохранённые изменения теряются."""
+        self._tables.pop(table_name, None)
+        self._stamps.pop(table_name, None)
+        self._indexes.pop(table_name, None)
+        self._vectors.pop(table_name, None)
+        self._pending.pop(table_name, None)
+        self._drop_reader(table_name)
+        self._seen.pop(table_name, None)
+        self._versions[table_name] = self._versions.get(table_name, 0) + 1
+        self._tx_changes.pop(table_name, None)
+
+    def drop_files(self, table_name: str, index_columns: list[str]) -> None:
+        """Удалить файлы таблицы и её индексов (в транзакции — при commit)."""
+        if self.in_transaction:
+            self._tx_dropped[table_name] = list(index_columns)
+            return
+        with table_lock(table_name).hold(exclusive=True):
+            _delete_files(table_name, index_columns)
+
+    # --- транзакции ---------------------------------------------------
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._tx_metadata is not None
+
+    def begin(self) -> None:
+        """Начать транзакцию: накопленное до неё сначала записывается."""
+        self.flush()
+        self._tx_metadata = copy.deepcopy(self.metadata)
+        self._tx_changes = {}
+        self._tx_dropped = {}
+
+    def commit(self) -> None:
+        """Зафиксировать транзакцию (или просто сбросить изменения без неё).
+
+        Сначала с fsync пишется журнал транзакции: изменения всех таблиц
+        и новые метаданные. После этого транзакция считается
+        зафиксированной; файлы таблиц и метаданные обновляются обычным
+        flush, и журнал удаляется. Если сбой случится между этими шагами,
+        recover() при следующем запуске доиграет журнал.
+        """
+        if not self.in_transaction:
+            self.flush()
+            return
+
+        tables = {
+            name: changes
+            for name, changes in self._tx_changes.items()
+            if name in self.metadata
+        }
+        dropped = dict(self._tx_dropped)
+        self._tx_metadata = None
+        self._tx_changes = {}
+        self._tx_dropped = {}
+
+        if not tables and not dropped and not self._meta_dirty:
+            return
+        save_tx_journal(
+            self.tx_file,
+            {"metadata": self.metadata, "tables": tables, "dropped": dropped},
+        )
+        self.flush(sync=True)
+        for name, columns in dropped.items():
+            _delete_files(name, columns)
+        delete_tx_journal(self.tx_file)
+        self._release_write_locks()
+
+    def rollback(self) -> list[str]:
+        """Отменить транзакцию; вернуть имена таблиц, которые она меняла."""
+        if not self.in_transaction:
+            return []
+        touched = set(self._pending) | set(self._tx_changes) | set(self._tx_dropped)
+        created = set(self.metadata) - set(self._tx_metadata)
+        for name in touched:
+            self.drop(name)
+        # Индексы могли поменяться и у таблиц без записей (create_index).
+        self._indexes.clear()
+        self._vectors.clear()
+        self.metadata = self._tx_metadata
+        self._meta_dirty = False
+        self._tx_metadata = None
+        self._tx_changes = {}
+        self._tx_dropped = {}
+        self._release_write_locks()
+        # файлы блокировок таблиц, созданных в транзакции (хотя бы чтением)
+        for name in created:
+            remove_table_lock(name)
+        return sorted(touched)
+
+    def recover(self) -> bool:
+        """Доиграть журнал транзакции, оставшийся после сбоя во время commit."""
+        with metadata_lock(self.meta_file).hold(exclusive=True):
+            return self._recover()
+
+    def _recover(self) -> bool:
+        journal = load_tx_journal(self.tx_file)
+        if journal is None:
+            return False
+
+        metadata = journal.get("metadata", {})
+        for name, entries in journal.get("tables", {}).items():
+            table_meta = metadata.get(name)
+            if not isinstance(table_meta, dict):
+                continue
+            # Записи журнала применяются по ID, поэтому повторное применение
+            # к уже частично записанной таблице даёт то же состояние.
+            with table_lock(name).hold(exclusive=True):
+                data = apply_log_entries(load_table_data(name, table_meta), entries)
+                replace_snapshot(name, data, table_meta)
+                delete_table_log(name)
+                # индексы перестроятся при следующей загрузке
+                for column in table_indexes(metadata, name):
+                    delete_index_file(name, column)
+
+        for name, columns in journal.get("dropped", {}).items():
+            with table_lock(name).hold(exclusive=True):
+                _delete_files(name, columns)
+            remove_table_lock(name)
+
+        save_metadata(self.meta_file, metadata, sync=True)
+        delete_tx_journal(self.tx_file)
+        self._meta_loaded = False
+        self._tables.clear()
+        self._indexes.clear()
+        self._vectors.clear()
+        return True
+
+    # --- запись -------------------------------------------------------
+
+    def flush(self, table_name: str | None = None, sync: bool | None = None) -> None:
+        """Записать грязные таблицы (или одну таблицу) и метаданные.
+
+        Каждый файл заменяется атомарно; fsync выполняется, если уровень
+        надёжности не off (или если явно передан sync=True). Внутри
+        транзакции ничего не пишется до commit().
+        """
+        if self.in_transaction:
+            return
+        if sync is None:
+            sync = self.durability != DURABILITY_OFF
+        names = list(self._pending) if table_name is None else [table_name]
+
+        for name in names:
+            changes = self._pending.pop(name, None)
+            if changes is None:
+                continue
+            table_meta = self.table_meta(name)
+            with table_lock(name).hold(exclusive=True):
+                persist_table(name, self._tables[name], changes, table_meta, sync=sync)
+                # индекс пишется после таблицы с отпечатком её файлов: если
+                # сбой случится между ними, индекс не совпадёт и перестроится
+                if name in self._indexes:
+                    stamp = index_stamp(name, table_meta)
+                    save_indexes(name, self._indexes[name], stamp, sync=sync)
+                self._wrote(name, table_stamp(name, table_meta))
+
+        if self._meta_dirty:
+            self._save_metadata(sync)
+
+        if table_name is None:
+            self._last_flush = time.monotonic()
+            self._group_commands = 0
+            self._release_write_locks()
+        else:
+            self._release_write_locks([table_name])
+
+    def _save_metadata(self, sync: bool) -> None:
+        # Под блокировкой: перечитать диск, наложить свои изменения, записать.
+        with metadata_lock(self.meta_file).hold(exclusive=True):
+            merged = self._merge_metadata(load_metadata(self.meta_file))
+            save_metadata(self.meta_file, merged, sync=sync)
+            self._meta_stamp = file_stamp(self.meta_file)
+        self._replace_metadata(merged)
+        self._meta_base = copy.deepcopy(merged)
+        self._meta_dirty = False
+        self._meta_loaded = True
+
+    def compact(self, table_name: str) -> None:
+        """Свернуть журнал таблицы в снимок."""
+        self.flush(table_name, sync=True)
+        with table_lock(table_name).hold(exclusive=True):
+            table_meta = self.table_meta(table_name)
+            compact_table(table_name, self.table(table_name), table_meta)
+            self._wrote(table_name, table_stamp(table_name, table_meta))
+            self._restamp_indexes(table_name, table_meta)
+
+    def convert(self, table_name: str, fmt: str) -> None:
+        """Перевести снимок таблицы в другой формат (json/columnar).
+
+        Порядок записи безопасен при сбое: новый снимок пишется атомарно,
+        затем метаданные переключаются на него, и только после этого
+        удаляются журнал и старый снимок.
+        """
+        self.flush(sync=True)
+        with table_lock(table_name).hold(exclusive=True):
+            self.refresh_metadata()
+            table_meta = self.table_meta(table_name)
+            old_fmt = table_format(table_meta)
+            data = self.table(table_name)
+
+            new_meta = {**table_meta, "format": fmt}
+            replace_snapshot(table_name, data, new_meta)
+            self.metadata[table_name] = new_meta
+            self.mark_metadata_dirty()
+            self.flush(sync=True)
+
+            delete_table_log(table_name)
+            if old_fmt != fmt:
+                delete_snapshot(table_name, old_fmt)
+            self._wrote(table_name, table_stamp(table_name, new_meta))
+            self._restamp_indexes(table_name, new_meta)
+
+    def _restamp_indexes(self, table_name: str, table_meta: dict | None) -> None:
+        # Таблица переписана без изменения строк: загруженные индексы
+        # по-прежнему верны, им нужен только отпечаток новых файлов.
+        if table_name in self._indexes:
+            stamp = index_stamp(table_name, table_meta)
+            save_indexes(table_name, self._indexes[table_name], stamp)
+
+    def maybe_flush(self) -> None:
+        """Сбросить изменения по расписанию (вызывается после каждой команды).
+
+        В режиме group изменения копятся, пока не наберётся group_size
+        команд или не истечёт flush_interval (если он задан).
+        """
+        if not self.is_dirty():
+            self._release_write_locks()
+            return
+        elapsed = time.monotonic() - self._last_flush
+        if self.durability == DURABILITY_GROUP:
+            self._group_commands += 1
+            if self._group_commands < self.group_size and (
+                self.flush_interval <= 0 or elapsed < self.flush_interval
+            ):
+                return
+        elif elapsed < self.flush_interval:
+            return
+        self.flush()
+
+    def close(self) -> None:
+        """Завершить сессию: незафиксированная транзакция отменяется."""
+        self.rollback()
+        self.flush()
+        self._readers.clear()
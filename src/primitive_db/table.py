@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator
+
+from .rows import RowBase, row_class
+
+
+class Table:
+    """Строки таблицы в порядке вставки с доступом по первичному ключу ID.
+
+    Строки хранятся в словаре ID -> строка: поиск, обновление и удаление
+    по ID выполняются за O(1), а порядок обхода совпадает с порядком вставки.
+
+    Если передан список столбцов схемы, строки-словари при добавлении
+    превращаются в компактные строки со __slots__ (см. rows.row_class).
+    """
+
+    __slots__ = ("_rows", "_row_type", "max_id")
+
+    def __init__(
+        self,
+        rows: Iterable[dict[str, Any]] = (),
+        fields: Iterable[str] | None = None,
+    ) -> None:
+        self._rows: dict[Any, dict[str, Any] | RowBase] = {}
+        self._row_type = row_class(tuple(fields)) if fields is not None else None
+        self.max_id = 0
+        for row in rows:
+            self.append(row)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return iter(self._rows.values())
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, row_id: object) -> bool:
+        return row_id in self._rows
+
+    def get(self, row_id: Any) -> dict[str, Any] | None:
+        return self._rows.get(row_id)
+
+    def get_many(self, ids: Iterable[Any]) -> list[dict[str, Any]]:
+        """Строки с указанными ID в порядке возрастания ID."""
+        rows = self._rows
+        return [rows[row_id] for row_id in sorted(ids) if row_id in rows]
+
+    def append(self, row: dict[str, Any] | RowBase) -> None:
+        if self._row_type is not None and isinstance(row, dict):
+            row = self._row_type.from_dict(row)
+        row_id = row.get("ID")
+        self._rows[row_id] = row
+        if isinstance(row_id, int) and row_id > self.max_id:
+            self.max_id = row_id
+
+    def remove(self, row_id: Any) -> dict[str, Any] | None:
+        return self._rows.pop(row_id, None)
+
+    def rows(self) -> list[dict[str, Any]]:
+        return list(self._rows.values())
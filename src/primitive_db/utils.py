@@ -1,54 +1,547 @@
+import csv
 import json
 import os
+import struct
+from typing import Iterable, Iterator
 
-from .constants import DATA_DIR
+from .columnar import read_columnar, write_columnar
+from .constants import (
+    DATA_DIR,
+    FORMAT_COLUMNAR,
+    FORMAT_JSON,
+    FORMATS,
+    INDEX_SUFFIX,
+    LAZY_THRESHOLD_BYTES,
+    LOG_COMPACT_BYTES,
+    LOG_SUFFIX,
+    STORAGE_JSON,
+    STORAGE_LOG,
+)
+from .errors import CorruptedFileError
+from .lazy import LazyColumnarRows, LazyJsonRows
+from .metrics import timed
+from .rows import to_dict
 
 ENCODING = "utf-8"
 JSON_INDENT = 2
 JSON_ENSURE_ASCII = False
 
-def _table_path(table_name: str) -> str:
+def _table_path(table_name: str, fmt: str = FORMAT_JSON) -> str:
     os.makedirs(DATA_DIR, exist_ok=True)
-    return os.path.join(DATA_DIR, f"{table_name}.json")
+    return os.path.join(DATA_DIR, f"{table_name}{FORMATS[fmt]}")
 
+
+def _table_option(table_meta: dict | None, key: str, default: str) -> str:
+    if isinstance(table_meta, dict):
+        return table_meta.get(key, default)
+    return default
+
+
+def table_format(table_meta: dict | None) -> str:
+    """Формат снимка таблицы по её записи в метаданных."""
+    return _table_option(table_meta, "format", FORMAT_JSON)
+
+
+def _log_path(table_name: str) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, f"{table_name}{LOG_SUFFIX}")
+
+
+def _index_path(table_name: str, column: str) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, f"{table_name}.{column}{INDEX_SUFFIX}")
+
+
+def file_stamp(path: str) -> tuple[int, int] | None:
+    """Отпечаток файла (mtime, размер) для обнаружения внешних изменений."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def table_stamp(table_name: str, table_meta: dict | None = None) -> tuple:
+    path = _table_path(table_name, table_format(table_meta))
+    return file_stamp(path), file_stamp(_log_path(table_name))
+
+
+def _file_identity(path: str) -> list[int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def index_stamp(table_name: str, table_meta: dict | None = None) -> list:
+    """Отпечаток файлов таблицы, по которым построен индекс (хранится в .idx).
+
+    Кроме mtime и размера в него входит номер inode: снимок заменяется
+    через rename, поэтому перезапись того же размера в пределах точности
+    mtime всё равно даёт другой отпечаток.
+    """
+    path = _table_path(table_name, table_format(table_meta))
+    return [_file_identity(path), _file_identity(_log_path(table_name))]
+
+
+def _fsync_dir(path: str) -> None:
+    """Сохранить на диск запись каталога (результат rename)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path: str, write, binary: bool = False, sync: bool = True) -> None:
+    """Записать файл через временный файл и rename.
+
+    При сбое на диске остаётся либо старая, либо новая версия файла
+    целиком. sync=False пропускает fsync (быстрее, но запись может не
+    пережить сбой ОС).
+    """
+    tmp_path = f"{path}.tmp"
+    if binary:
+        f = open(tmp_path, "wb")
+    else:
+        f = open(tmp_path, "w", encoding=ENCODING)
+    try:
+        with f:
+            write(f)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if sync:
+        _fsync_dir(path)
+
+
+@timed("load.metadata")
 def load_metadata(filepath: str) -> dict:
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+            data = json.load(f)
     except FileNotFoundError:
         return {}
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise CorruptedFileError(filepath, str(exc)) from exc
+    if not isinstance(data, dict):
+        raise CorruptedFileError(filepath, "ожидался JSON-объект")
+    return data
+
+
+@timed("save.metadata")
+def save_metadata(filepath: str, data: dict, sync: bool = True) -> None:
+    _atomic_write(
+        filepath,
+        lambda f: json.dump(data, f, ensure_ascii=False, indent=2),
+        sync=sync,
+    )
+
+
+def load_cache_file(filepath: str) -> dict:
+    """Сохранённый кэш select; повреждённый или отсутствующий файл — пустой кэш."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
         return {}
+    return data if isinstance(data, dict) else {}
 
 
-def save_metadata(filepath: str, data: dict) -> None:
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def save_cache_file(filepath: str, data: dict) -> None:
+    _atomic_write(
+        filepath,
+        lambda f: json.dump(data, f, ensure_ascii=JSON_ENSURE_ASCII),
+        sync=False,
+    )
 
 
-def load_table_data(table_name: str) -> list[dict[str, object]]:
-    os.makedirs(DATA_DIR, exist_ok=True)
-    path = _table_path(table_name)
+def _load_snapshot(table_name: str, fmt: str) -> list[dict[str, object]]:
+    path = _table_path(table_name, fmt)
+
+    if fmt == FORMAT_COLUMNAR:
+        try:
+            return read_columnar(path)
+        except FileNotFoundError:
+            return []
+        except (ValueError, KeyError, struct.error) as exc:
+            raise CorruptedFileError(path, str(exc)) from exc
 
     try:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
-            return data if isinstance(data, list) else []
     except FileNotFoundError:
         return []
-    except json.JSONDecodeError:
-        return []
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise CorruptedFileError(path, str(exc)) from exc
+    if not isinstance(data, list):
+        raise CorruptedFileError(path, "ожидался JSON-массив")
+    return data
+
+
+def _write_snapshot(
+    path: str,
+    data: Iterable[dict[str, object]],
+    table_meta: dict | None,
+    sync: bool = True,
+) -> None:
+    """Атомарно записать снимок таблицы в формате из метаданных."""
+    if table_format(table_meta) == FORMAT_COLUMNAR:
+        _atomic_write(
+            path,
+            lambda f: write_columnar(f, table_meta["columns"], data),
+            binary=True,
+            sync=sync,
+        )
+        return
+
+    # Одна запись на строку: файл остаётся JSON-массивом, но границы
+    # записей находятся без разбора (см. lazy.LazyJsonRows).
+    def write(f) -> None:
+        separator = "[\n"
+        for row in data:
+            f.write(separator)
+            f.write(json.dumps(to_dict(row), ensure_ascii=JSON_ENSURE_ASCII))
+            separator = ",\n"
+        f.write("[]\n" if separator == "[\n" else "\n]\n")
+
+    _atomic_write(path, write, sync=sync)
+
+
+def _apply_log_entry(rows: dict, entry: dict) -> None:
+    op = entry.get("op")
+    if op == "insert":
+        row = entry["row"]
+        rows[row["ID"]] = row
+    elif op == "update":
+        row = rows.get(entry["ID"])
+        if row is not None:
+            row.update(entry["set"])
+    elif op == "delete":
+        rows.pop(entry["ID"], None)
+
+
+def apply_log_entries(
+    data: Iterable[dict[str, object]],
+    entries: Iterable[dict],
+) -> list[dict[str, object]]:
+    """Применить записи журнала изменений к строкам таблицы (по ID)."""
+    rows = {row.get("ID"): row for row in data}
+    for entry in entries:
+        _apply_log_entry(rows, entry)
+    return list(rows.values())
+
+
+def _replay_log(table_name: str, data: list[dict[str, object]]) -> list:
+    """Применить журнал изменений к снимку таблицы.
+
+    Оборванная последняя запись (сбой посреди дозаписи) отбрасывается:
+    всё, что было записано до неё, остаётся целым.
+    """
+    try:
+        f = open(_log_path(table_name), "rb")
+    except FileNotFoundError:
+        return data
+
+    rows = {row.get("ID"): row for row in data}
+    with f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError:
+                break
+            _apply_log_entry(rows, entry)
+
+    return list(rows.values())
 
 
-def save_table_data(table_name: str, data: list[dict[str, object]]) -> None:
+@timed("load.table")
+def load_table_data(
+    table_name: str,
+    table_meta: dict | None = None,
+) -> list[dict[str, object]]:
     os.makedirs(DATA_DIR, exist_ok=True)
-    path = _table_path(table_name)
+    snapshot = _load_snapshot(table_name, table_format(table_meta))
+    return _replay_log(table_name, snapshot)
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
+@timed("load.lazy")
+def open_lazy_rows(
+    table_name: str,
+    table_meta: dict | None = None,
+) -> LazyJsonRows | LazyColumnarRows | None:
+    """Открыть большой снимок таблицы для ленивого чтения через mmap.
 
-def delete_table_data_file(table_name: str) -> None:
-    path = _table_path(table_name)
+    Возвращает None, если ленивое чтение не подходит: снимок меньше
+    LAZY_THRESHOLD_BYTES, его нет, раскладка неизвестна или у таблицы есть
+    журнал изменений (его записи нужно применить к полной таблице).
+    """
+    fmt = table_format(table_meta)
+    path = _table_path(table_name, fmt)
+    stamp = file_stamp(path)
+    if stamp is None or stamp[1] < LAZY_THRESHOLD_BYTES:
+        return None
+    if file_stamp(_log_path(table_name)) is not None:
+        return None
+
+    try:
+        if fmt == FORMAT_COLUMNAR:
+            return LazyColumnarRows(path)
+        return LazyJsonRows(path)
+    except ValueError:
+        return None
+
+
+@timed("save.snapshot")
+def save_table_data(
+    table_name: str,
+    data: Iterable[dict[str, object]],
+    table_meta: dict | None = None,
+    sync: bool = True,
+) -> None:
+    """Атомарно заменить снимок таблицы (временный файл + fsync + rename)."""
+    path = _table_path(table_name, table_format(table_meta))
+    _write_snapshot(path, data, table_meta, sync=sync)
+
+
+def replace_snapshot(
+    table_name: str,
+    data: Iterable[dict[str, object]],
+    table_meta: dict | None = None,
+) -> None:
+    """Атомарно заменить снимок таблицы с fsync при любом уровне надёжности.
+
+    Используется там, где следом удаляются журнал или старый снимок.
+    """
+    save_table_data(table_name, data, table_meta, sync=True)
+
+
+def delete_table_log(table_name: str) -> None:
+    log_path = _log_path(table_name)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+
+def delete_snapshot(table_name: str, fmt: str) -> None:
+    path = _table_path(table_name, fmt)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _truncate_torn_tail(f) -> None:
+    """Отрезать недописанную строку в конце журнала перед новой дозаписью."""
+    size = f.seek(0, os.SEEK_END)
+    pos = size
+    block = 4096
+
+    while pos > 0:
+        start = max(0, pos - block)
+        f.seek(start)
+        chunk = f.read(pos - start)
+        if pos == size and chunk.endswith(b"\n"):
+            return
+        idx = chunk.rfind(b"\n")
+        if idx != -1:
+            f.truncate(start + idx + 1)
+            return
+        pos = start
+
+    f.truncate(0)
+
+
+@timed("save.log")
+def append_table_log(
+    table_name: str,
+    entries: list[dict],
+    sync: bool = True,
+) -> None:
+    """Дописать изменения в журнал таблицы (по одной JSON-строке на запись)."""
+    if not entries:
+        return
+
+    payload = "".join(
+        json.dumps(entry, ensure_ascii=JSON_ENSURE_ASCII) + "\n"
+        for entry in entries
+    ).encode(ENCODING)
+
+    with open(_log_path(table_name), "a+b") as f:
+        _truncate_torn_tail(f)
+        f.write(payload)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def compact_table(
+    table_name: str,
+    data: Iterable[dict[str, object]] | None = None,
+    table_meta: dict | None = None,
+) -> None:
+    """Свернуть журнал в снимок таблицы и удалить журнал.
+
+    Снимок подменяется атомарно; если сбой случится до удаления журнала,
+    повторное применение записей по ID даёт то же состояние.
+    """
+    if data is None:
+        data = load_table_data(table_name, table_meta)
+
+    replace_snapshot(table_name, data, table_meta)
+    delete_table_log(table_name)
+
+
+def persist_table(
+    table_name: str,
+    data: Iterable[dict[str, object]],
+    changes: list[dict],
+    table_meta: dict | None = None,
+    sync: bool = True,
+) -> None:
+    """Сохранить изменения таблицы в соответствии с режимом хранения."""
+    if _table_option(table_meta, "storage", STORAGE_JSON) != STORAGE_LOG:
+        save_table_data(table_name, data, table_meta, sync=sync)
+        return
+
+    append_table_log(table_name, changes, sync=sync)
+    log_path = _log_path(table_name)
+    if os.path.exists(log_path) and os.path.getsize(log_path) >= LOG_COMPACT_BYTES:
+        compact_table(table_name, data, table_meta)
+
+
+def save_tx_journal(path: str, data: dict) -> None:
+    """Записать журнал фиксируемой транзакции (всегда с fsync)."""
+    _atomic_write(
+        path,
+        lambda f: json.dump(data, f, ensure_ascii=JSON_ENSURE_ASCII),
+        sync=True,
+    )
+
+
+def load_tx_journal(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise CorruptedFileError(path, str(exc)) from exc
+    if not isinstance(data, dict):
+        raise CorruptedFileError(path, "ожидался JSON-объект")
+    return data
+
+
+def delete_tx_journal(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+        _fsync_dir(path)
+
+
+@timed("load.index")
+def load_index_data(table_name: str, column: str) -> dict | None:
+    try:
+        with open(_index_path(table_name, column), "r", encoding="utf-8") as f:
+            data = json.load(f)
+            return data if isinstance(data, dict) else None
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        return None
+
+
+@timed("save.index")
+def save_index_data(
+    table_name: str,
+    column: str,
+    data: dict,
+    sync: bool = True,
+) -> None:
+    _atomic_write(
+        _index_path(table_name, column),
+        lambda f: json.dump(data, f, ensure_ascii=False),
+        sync=sync,
+    )
+
+
+def delete_index_file(table_name: str, column: str) -> None:
+    path = _index_path(table_name, column)
     if os.path.exists(path):
-        os.remove(path)
\ No newline at end of file
+        os.remove(path)
+
+
+def _iter_import_records(path: str) -> Iterator[dict]:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            yield from csv.DictReader(f)
+        elif ext in {".jsonl", ".ndjson"}:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise ValueError(f"строка {number}: {exc.msg}") from exc
+                if not isinstance(record, dict):
+                    raise ValueError(f"строка {number}: ожидается объект")
+                yield record
+        else:
+            raise ValueError(f"Неподдерживаемый формат файла: {path}")
+
+
+def read_import_chunks(path: str, chunk_size: int) -> Iterator[list[dict]]:
+    """Читать записи из CSV (с заголовком) или JSONL пачками по chunk_size.
+
+    Файл читается потоково: в памяти одновременно не больше одной пачки.
+    """
+    chunk: list[dict] = []
+    for record in _iter_import_records(path):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_export(
+    path: str,
+    columns: list[str],
+    rows: Iterable[dict[str, object]],
+) -> int:
+    """Потоково записать строки в CSV или JSONL; вернуть их количество."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in {".csv", ".jsonl", ".ndjson"}:
+        raise ValueError(f"Неподдерживаемый формат файла: {path}")
+
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([row.get(col) for col in columns])
+                count += 1
+        else:
+            for row in rows:
+                record = {col: row.get(col) for col in columns}
+                f.write(json.dumps(record, ensure_ascii=JSON_ENSURE_ASCII) + "\n")
+                count += 1
+    return count
+
+
+def delete_table_data_file(table_name: str) -> None:
+    for fmt in FORMATS:
+        delete_snapshot(table_name, fmt)
+    delete_table_log(table_name)
@@ -0,0 +1,356 @@
+"""Векторное выполнение условий WHERE по столбцам таблицы.
+
+Таблица в памяти дополнительно хранится по столбцам (ColumnBatch):
+int — массив array('q'), bool — байтовая карта 0/1, str — коды строк
+в array('q') и словарь различных значений. Условие вычисляется не по
+строкам, а по столбцу целиком: каждое сравнение даёт карту выбора
+(по байту на строку), карты условий AND/OR объединяются побитовыми
+операциями над целыми числами, а номера выбранных строк достаются через
+itertools.compress. Для строк сравнение выполняется один раз на каждое
+различное значение, а по столбцу сравниваются только коды.
+
+Если установлен NumPy, столбцы читаются как массивы NumPy без
+копирования, и сравнения выполняются в нём. Столбцы, которые не
+укладываются в массив (например, int вне int64), хранятся списком и
+проверяются значение за значением.
+
+Режим включается переменной PRIMITIVE_DB_VECTOR=1 или командой
+`vector on`; столбцы поддерживаются по журналу изменений, как индексы.
+"""
+
+from __future__ import annotations
+
+import operator
+from array import array
+from itertools import compress
+from typing import Any, Callable, Iterable
+
+from .constants import VECTOR_ENABLED
+from .parser import And, Compare, Expr
+from .query import to_expression
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+_enabled = VECTOR_ENABLED
+
+# Сравнение «значение op константа» через метод константы: map(метод,
+# столбец) проходит столбец без байткода Python на каждое значение.
+_REFLECTED = {
+    "=": "__eq__",
+    "!=": "__ne__",
+    "<": "__gt__",
+    "<=": "__ge__",
+    ">": "__lt__",
+    ">=": "__le__",
+}
+_OPERATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+_INT64 = (-(2**63), 2**63 - 1)
+_INVERT = bytes([1, 0]) + bytes(254)
+
+
+def vector_enabled() -> bool:
+    return _enabled
+
+
+def enable_vector(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+class _Stale(Exception):
+    """Изменение не укладывается в столбец: столбцы надо построить заново."""
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int and _INT64[0] <= value <= _INT64[1]
+
+
+def _result(selection: bytes | bytearray) -> Any:
+    # карта выбора — байты 0/1; с NumPy — массив bool поверх тех же байтов
+    return np.frombuffer(selection, dtype=np.bool_) if np is not None else selection
+
+
+class IntColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable[int] = ()) -> None:
+        self.values = array("q", values)
+
+    def append(self, value: Any) -> None:
+        if not _is_int(value):
+            raise _Stale
+        self.values.append(value)
+
+    def set(self, position: int, value: Any) -> None:
+        if not _is_int(value):
+            raise _Stale
+        self.values[position] = value
+
+    def compare(self, op: str, value: Any) -> Any:
+        if op == "in":
+            wanted = frozenset(value)
+            if np is not None and all(map(_is_int, wanted)):
+                view = np.frombuffer(self.values, dtype=np.int64)
+                return np.isin(view, list(wanted))
+            return _result(bytearray(map(wanted.__contains__, self.values)))
+        if not _is_int(value):
+            return _list_compare(self.values, op, value)
+        if np is not None:
+            view = np.frombuffer(self.values, dtype=np.int64)
+            return _OPERATORS[op](view, value)
+        return bytearray(map(getattr(value, _REFLECTED[op]), self.values))
+
+
+class BoolColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable[bool] = ()) -> None:
+        self.values = bytearray(values)
+
+    def append(self, value: Any) -> None:
+        if type(value) is not bool:
+            raise _Stale
+        self.values.append(value)
+
+    def set(self, position: int, value: Any) -> None:
+        if type(value) is not bool:
+            raise _Stale
+        self.values[position] = value
+
+    def compare(self, op: str, value: Any) -> Any:
+        if op in {"=", "!="} and type(value) is bool:
+            selection = self.values
+            if value is (op == "!="):
+                selection = selection.translate(_INVERT)
+            return _result(selection)
+        if op == "in" and all(type(v) is bool for v in value):
+            if True in value and False in value:
+                selection = bytearray(b"\x01" * len(self.values))
+            elif True in value:
+                selection = self.values
+            elif False in value:
+                selection = self.values.translate(_INVERT)
+            else:
+                selection = bytearray(len(self.values))
+            return _result(selection)
+        return _list_compare([bool(v) for v in self.values], op, value)
+
+
+class StrColumn:
+    """Коды строк и словарь значений: одинаковые строки хранятся один раз."""
+
+    __slots__ = ("codes", "strings", "lookup")
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self.codes = array("q")
+        self.strings: list[str] = []
+        self.lookup: dict[str, int] = {}
+        for value in values:
+            self.append(value)
+
+    def _code(self, value: Any) -> int:
+        if type(value) is not str:
+            raise _Stale
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def append(self, value: Any) -> None:
+        self.codes.append(self._code(value))
+
+    def set(self, position: int, value: Any) -> None:
+        self.codes[position] = self._code(value)
+
+    def compare(self, op: str, value: Any) -> Any:
+        if op == "in":
+            wanted = {self.lookup[v] for v in value if v in self.lookup}
+        elif op == "=" and value in self.lookup:
+            wanted = {self.lookup[value]}
+        else:
+            # условие проверяется по одному разу на каждое различное значение
+            test = _OPERATORS[op]
+            wanted = {
+                code
+                for code, string in enumerate(self.strings)
+                if _safe(test, string, value)
+            }
+        if np is not None:
+            return np.isin(np.frombuffer(self.codes, dtype=np.int64), list(wanted))
+        if len(wanted) == 1:
+            (code,) = wanted
+            return bytearray(map(code.__eq__, self.codes))
+        return bytearray(map(frozenset(wanted).__contains__, self.codes))
+
+
+class ListColumn:
+    """Столбец, который не уложился в массив: значения как есть."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable[Any] = ()) -> None:
+        self.values = list(values)
+
+    def append(self, value: Any) -> None:
+        self.values.append(value)
+
+    def set(self, position: int, value: Any) -> None:
+        self.values[position] = value
+
+    def compare(self, op: str, value: Any) -> Any:
+        return _list_compare(self.values, op, value)
+
+
+def _safe(test: Callable[[Any, Any], Any], left: Any, right: Any) -> bool:
+    # как в скомпилированном предикате: порядок с None или с другим
+    # типом не выполняется, а ошибка сравнения — это «не подходит»
+    if left is None:
+        return test is operator.ne and right is not None
+    try:
+        return bool(test(left, right))
+    except TypeError:
+        return False
+
+
+def _list_compare(values: Iterable[Any], op: str, value: Any) -> Any:
+    if op == "in":
+        wanted = frozenset(value)
+        selection = bytearray(v in wanted for v in values)
+    elif op in {"=", "!="}:
+        test = _OPERATORS[op]
+        selection = bytearray(bool(test(v, value)) for v in values)
+    else:
+        test = _OPERATORS[op]
+        selection = bytearray(_safe(test, v, value) for v in values)
+    return _result(selection)
+
+
+_COLUMN_CLASSES = {"int": IntColumn, "bool": BoolColumn, "str": StrColumn}
+
+
+def _build_column(kind: str, values: list[Any]) -> Any:
+    column_class = _COLUMN_CLASSES.get(kind, ListColumn)
+    try:
+        column = column_class()
+        for value in values:
+            column.append(value)
+        return column
+    except _Stale:
+        return ListColumn(values)
+
+
+def _and(left: Any, right: Any) -> Any:
+    if np is not None:
+        return left & right
+    size = len(left)
+    merged = int.from_bytes(left, "little") & int.from_bytes(right, "little")
+    return merged.to_bytes(size, "little")
+
+
+def _or(left: Any, right: Any) -> Any:
+    if np is not None:
+        return left | right
+    size = len(left)
+    merged = int.from_bytes(left, "little") | int.from_bytes(right, "little")
+    return merged.to_bytes(size, "little")
+
+
+class ColumnBatch:
+    """Строки таблицы по столбцам в порядке таблицы.
+
+    Удалённые строки не вырезаются из столбцов, а снимаются в карте alive;
+    когда их становится больше половины, столбцы строятся заново.
+    """
+
+    def __init__(self, columns: list[dict], rows: Iterable[Any]) -> None:
+        rows = list(rows)
+        self.ids = array("q", (row.get("ID") for row in rows))
+        self.alive = bytearray(b"\x01" * len(rows))
+        self.positions = {row_id: i for i, row_id in enumerate(self.ids)}
+        self.deleted = 0
+        self.columns = {
+            name: _build_column(kind, [row.get(name) for row in rows])
+            for name, kind in ((col["name"], col["type"]) for col in columns)
+            if name != "ID"
+        }
+        # столбец ID — тот же массив, что и self.ids
+        id_column = self.columns["ID"] = IntColumn()
+        id_column.values = self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.deleted
+
+    def apply(self, changes: Iterable[dict[str, Any]]) -> bool:
+        """Учесть записи журнала; False — столбцы надо построить заново."""
+        try:
+            for entry in changes:
+                op = entry.get("op")
+                if op == "insert":
+                    self._insert(entry["row"])
+                elif op == "delete":
+                    position = self.positions.pop(entry["ID"], None)
+                    if position is None:
+                        raise _Stale
+                    self.alive[position] = 0
+                    self.deleted += 1
+                elif op == "update":
+                    position = self.positions.get(entry["ID"])
+                    if position is None:
+                        raise _Stale
+                    for column, value in entry["set"].items():
+                        if column == "ID":
+                            raise _Stale
+                        if column in self.columns:
+                            self.columns[column].set(position, value)
+        except _Stale:
+            return False
+        return self.deleted * 2 <= len(self.ids)
+
+    def _insert(self, row: dict[str, Any]) -> None:
+        row_id = row.get("ID")
+        if not _is_int(row_id) or row_id in self.positions:
+            raise _Stale
+        for name, column in self.columns.items():
+            if name != "ID":
+                column.append(row.get(name))
+        self.positions[row_id] = len(self.ids)
+        self.ids.append(row_id)
+        self.alive.append(1)
+
+    def _select(self, expr: Expr) -> Any:
+        if isinstance(expr, Compare):
+            column = self.columns.get(expr.column)
+            if column is None:
+                # столбца нет в схеме: значение в каждой строке — None
+                return _list_compare([None] * len(self.ids), expr.op, expr.value)
+            return column.compare(expr.op, expr.value)
+        combine = _and if isinstance(expr, And) else _or
+        selection = self._select(expr.items[0])
+        for item in expr.items[1:]:
+            selection = combine(selection, self._select(item))
+        return selection
+
+    def select(self, where_clause: dict[str, Any] | Expr | None) -> list[int]:
+        """ID строк под условием в порядке таблицы."""
+        expr = to_expression(where_clause)
+        if expr is None:
+            return [row_id for row_id in self.positions]
+        selection = _and(self._select(expr), _result(self.alive))
+        if np is not None:
+            return np.frombuffer(self.ids, dtype=np.int64)[selection].tolist()
+        return list(compress(self.ids, selection))